@@ -0,0 +1,213 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+from app.settings import settings
+
+# Bulk imports (POST /assets/bulk, POST /holdings/bulk, PUT /strategies/bulk). The body is a
+# JSON array of objects or a CSV with a header row, sent raw like /backtest:
+#   curl --data-binary @holdings.csv -H 'Content-Type: text/csv' localhost:8000/holdings/bulk
+# Rows are parsed and validated while the body is still arriving and written in chunks of
+# BULK_CHUNK_ROWS, one transaction each. A bad row is reported and skipped; it does not
+# abort the upload.
+
+_MAX_ERRORS = 1000  # per-row errors listed in the response (all of them are counted)
+
+class _JsonArray:
+    # incremental parser for one top-level JSON array: feed() text as it arrives and get
+    # back the values completed so far
+    def __init__(self):
+        self._dec = json.JSONDecoder()
+        self._buf = ""
+        self._state = "start"  # start -> first -> (item -> after)* -> done
+        self._error: ValueError | None = None
+
+    def feed(self, text: str, final: bool = False) -> list:
+        # values completed before a syntax error are returned first, the error comes with the
+        # next call: what is kept must not depend on how the body was split into chunks
+        if self._error is not None:
+            raise self._error
+        out: list = []
+        try:
+            self._parse(text, final, out)
+        except ValueError as e:
+            if not out:
+                raise
+            self._error = e
+        return out
+
+    def _parse(self, text: str, final: bool, out: list) -> None:
+        buf = self._buf = self._buf + text
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buf):
+                break
+            ch = buf[pos]
+            if self._state == "start":
+                if ch != "[":
+                    raise ValueError("expected a JSON array of objects")
+                self._state, pos = "first", pos + 1
+            elif self._state == "done":
+                raise ValueError("unexpected data after the closing ]")
+            elif ch == "]" and self._state in ("first", "after"):
+                self._state, pos = "done", pos + 1
+            elif self._state == "after":
+                if ch != ",":
+                    raise ValueError(f"expected ',' or ']' at offset {pos}")
+                self._state, pos = "item", pos + 1
+            else:
+                try:
+                    value, end = self._dec.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    if final:
+                        raise ValueError(f"invalid JSON: {e.msg}")
+                    break  # value not complete yet
+                if end >= len(buf) and not final:
+                    break  # a number at the very end may still be cut
+                out.append(value)
+                self._state, pos = "after", end
+        self._buf = buf[pos:]
+        if final and self._state != "done":
+            raise ValueError("unterminated JSON array")
+
+class _CsvRecords:
+    # complete CSV records from text chunks (a quoted field may span lines and chunks)
+    def __init__(self):
+        self._rest = ""
+        self._pending = ""
+        self._header: list[str] | None = None
+        self._error: ValueError | None = None
+
+    def feed(self, text: str, final: bool = False) -> list[dict]:
+        # as _JsonArray.feed: complete records first, a trailing error on the next call
+        if self._error is not None:
+            raise self._error
+        lines = (self._rest + text).split("\n")
+        self._rest = "" if final else lines.pop()
+        out = []
+        for line in lines:
+            self._pending += line + "\n"
+            if self._pending.count('"') % 2:
+                continue  # inside a quoted field
+            record, self._pending = self._pending, ""
+            fields = next(csv.reader([record]), [])
+            if not any(f.strip() for f in fields):
+                continue
+            if self._header is None:
+                self._header = [f.strip() for f in fields]
+                continue
+            # empty cells are missing values: the schema default (or None) applies
+            out.append({k: v for k, v in zip(self._header, fields) if v != ""})
+        if final and self._pending.strip():
+            self._error = ValueError("unterminated quoted field in CSV")
+            if not out:
+                raise self._error
+        return out
+
+async def read_rows(request: Request) -> AsyncIterator[object]:
+    # one raw row (dict from JSON or CSV) at a time, as the body streams in
+    size = request.headers.get("content-length")
+    if size is not None and size.isdigit() and int(size) > settings.bulk_max_bytes:
+        raise HTTPException(status_code=413, detail="upload too large")
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parser: _JsonArray | _CsvRecords | None = None
+    if "csv" in request.headers.get("content-type", ""):
+        parser = _CsvRecords()
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.bulk_max_bytes:
+                raise HTTPException(status_code=413, detail="upload too large")
+            text = decoder.decode(chunk)
+            if parser is None:
+                head = text.lstrip()
+                if not head:
+                    continue
+                parser = _JsonArray() if head[0] in "[{" else _CsvRecords()
+            for row in parser.feed(text):
+                yield row
+        if parser is None:
+            raise HTTPException(status_code=400, detail="empty body (send a JSON array or CSV)")
+        for row in parser.feed(decoder.decode(b"", final=True), final=True):
+            yield row
+        parser.feed("", final=True)  # raises an error held back with the last rows
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"unreadable upload after {received} bytes: {e}")
+
+def _describe(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors())
+
+async def import_rows(
+    request: Request,
+    schema: type[BaseModel],
+    write: Callable[[list[dict]], Awaitable[list[int]]],
+    key: str | None = "symbol",
+) -> dict:
+    # validates each row against `schema` and hands valid ones to `write` in chunks. A chunk
+    # is flushed early when `key` repeats in it, so the later row wins as with one-by-one
+    # requests. Rows are numbered from 1 in upload order (CSV header not counted).
+    written, failed = 0, 0
+    errors: list[dict] = []
+    chunk: list[dict] = []
+    numbers: list[int] = []
+    keys: set[str] = set()
+
+    def error(row: int, msg: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < _MAX_ERRORS:
+            errors.append({"row": row, "error": msg})
+
+    async def flush() -> None:
+        nonlocal written
+        if not chunk:
+            return
+        try:
+            written += len(await write(chunk))
+        except Exception as e:
+            # the chunk's transaction was rolled back: none of its rows is stored
+            for n in numbers:
+                error(n, f"not written: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}")
+        chunk.clear()
+        numbers.clear()
+        keys.clear()
+
+    n = 0
+    aborted = None
+    try:
+        async for raw in read_rows(request):
+            n += 1
+            if not isinstance(raw, dict):
+                error(n, "expected an object")
+                continue
+            try:
+                row = schema.model_validate(raw).model_dump()
+            except ValidationError as e:
+                error(n, _describe(e))
+                continue
+            k = row[key].upper().strip() if key else None
+            if k is not None and k in keys:
+                await flush()
+            chunk.append(row)
+            numbers.append(n)
+            if k is not None:
+                keys.add(k)
+            if len(chunk) >= settings.bulk_chunk_rows:
+                await flush()
+    except HTTPException as e:
+        # broken or oversized body: fail outright unless earlier rows were already accepted
+        if not written and not chunk:
+            raise
+        aborted = e.detail
+    await flush()
+    out = {"rows": n, "written": written, "failed": failed, "errors": errors}
+    if aborted:
+        out["aborted"] = aborted
+    return out
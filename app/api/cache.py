@@ -0,0 +1,93 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+
+from app.settings import settings
+from app.observability import metrics
+
+# Read-through cache for the configuration GETs (assets, holdings, strategies). Every
+# resource has a version counter that its POST/PUT routes bump after committing; an entry
+# is served while its version is current and it is younger than API_CACHE_TTL_SEC (the TTL
+# bounds staleness from writers outside this process: other API replicas, the worker
+# creating default strategies). ETags hash the body, so they are strong, equal across
+# replicas and survive a reload that produced the same content.
+
+RESOURCES = ("assets", "holdings", "strategies")
+
+@dataclass
+class _Entry:
+    version: int
+    stored_at: float
+    body: bytes
+    etag: str
+    headers: dict[str, str]  # e.g. the next-page Link
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    # weak comparison, as RFC 9110 asks for If-None-Match
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+class ResponseCache:
+    def __init__(self, ttl_sec: float | None = None, max_entries: int | None = None):
+        self.ttl_sec = settings.api_cache_ttl_sec if ttl_sec is None else ttl_sec
+        self.max_entries = max_entries or settings.api_cache_max_entries
+        self.versions: dict[str, int] = {r: 0 for r in RESOURCES}
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def invalidate(self, resource: str) -> None:
+        self.versions[resource] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _fresh(self, resource: str, key: str) -> _Entry | None:
+        if self.ttl_sec <= 0:
+            return None
+        e = self._entries.get((resource, key))
+        if e is None:
+            return None
+        if e.version != self.versions[resource] or time.monotonic() - e.stored_at > self.ttl_sec:
+            del self._entries[(resource, key)]
+            return None
+        self._entries.move_to_end((resource, key))
+        return e
+
+    async def respond(
+        self, request: Request, resource: str, key: str,
+        load: Callable[[], Awaitable[tuple[bytes, dict[str, str]]]],
+    ) -> Response:
+        # load() renders the JSON body (and extra headers) from the DB; it only runs on a miss
+        e = self._fresh(resource, key)
+        if e is not None:
+            metrics.api_cache.inc(resource, "hit")
+        else:
+            metrics.api_cache.inc(resource, "miss")
+            # version read before loading: a write that commits meanwhile leaves this entry stale
+            version = self.versions[resource]
+            body, extra = await load()
+            e = _Entry(version=version, stored_at=time.monotonic(), body=body, etag=_etag(body), headers=extra)
+            if self.ttl_sec > 0:
+                self._entries[(resource, key)] = e
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        # no-cache: clients may keep the body but revalidate every time (cheap 304s)
+        headers = {"ETag": e.etag, "Cache-Control": "no-cache", **e.headers}
+        if _matches(request.headers.get("if-none-match"), e.etag):
+            metrics.api_not_modified.inc(resource)
+            return Response(status_code=304, headers=headers)
+        return Response(e.body, media_type="application/json", headers=headers)
+
+cache = ResponseCache()
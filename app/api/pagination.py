@@ -0,0 +1,50 @@
+import json
+from typing import AsyncIterator, Callable
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.settings import settings
+from app.persistence.db import AsyncSessionLocal
+from app.persistence.repo import AsyncRepo
+
+# Listings come three ways:
+#   GET /holdings                              the whole table as one JSON array (as before)
+#   GET /holdings?limit=500[&after_id=1234]    one keyset page by id; Link: rel="next" while more
+#   GET /holdings -H 'Accept: application/x-ndjson'   every row, one JSON object per line,
+#                                              streamed from a server-side cursor
+NDJSON = "application/x-ndjson"
+
+class Page:
+    # query params of a keyset page; after_id alone means a page of API_PAGE_MAX rows
+    def __init__(
+        self,
+        after_id: int | None = Query(None, ge=0, description="return rows with id > after_id"),
+        limit: int | None = Query(None, ge=1, description="page size (capped at API_PAGE_MAX)"),
+    ):
+        self.after_id = after_id
+        self.limit = None if limit is None and after_id is None else min(limit or settings.api_page_max, settings.api_page_max)
+
+    @property
+    def key(self) -> str:
+        return f"{self.after_id}:{self.limit}"
+
+    def next_link(self, request: Request, ids: list[int]) -> dict[str, str]:
+        # a full page may be followed by more rows: point at the next one
+        if self.limit is None or len(ids) < self.limit:
+            return {}
+        # relative: the entry is cached and may be served to a client using another host name
+        url = request.url.include_query_params(after_id=ids[-1], limit=self.limit)
+        return {"Link": f'<{url.path}?{url.query}>; rel="next"'}
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+def ndjson_response(stream: Callable[[AsyncRepo], AsyncIterator[list]]) -> StreamingResponse:
+    # own session: the request's one (a yield dependency) may be closed before the body is sent
+    async def body() -> AsyncIterator[bytes]:
+        async with AsyncSessionLocal() as db:
+            async for rows in stream(AsyncRepo(db)):
+                yield b"".join(json.dumps(r._asdict(), separators=(",", ":")).encode() + b"\n" for r in rows)
+
+    return StreamingResponse(body(), media_type=NDJSON)
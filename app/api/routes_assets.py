@@ -1,42 +1,24 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.persistence.db import SessionLocal
-from app.persistence.repo import Repo
-from app.domain.schemas import AssetIn, AssetOut
+from app.api.bulk import import_rows
+from app.api.cache import cache
+from app.api.pagination import Page, ndjson_response, wants_ndjson
+from app.settings import settings
+from app.persistence.db import AsyncSessionLocal
+from app.persistence.repo import AsyncRepo
+from app.domain.schemas import AssetIn, AssetOut, BulkResult
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_assets_json = TypeAdapter(list[AssetOut])
 
-@router.get("", response_model=list[AssetOut])
-def list_assets(db: Session = Depends(get_db)):
-    repo = Repo(db)
-    # list all (enabled + disabled)
-    from sqlalchemy import select
-    from app.domain.models import Asset
-    rows = db.execute(select(Asset)).scalars().all()
-    return [
-        AssetOut(
-            id=a.id,
-            symbol=a.symbol,
-            enabled=a.enabled,
-            binance_symbol=a.binance_symbol,
-            coinbase_product_id=a.coinbase_product_id,
-            coingecko_id=a.coingecko_id,
-        )
-        for a in rows
-    ]
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-@router.post("", response_model=AssetOut)
-def upsert_asset(body: AssetIn, db: Session = Depends(get_db)):
-    repo = Repo(db)
-    a = repo.upsert_asset(body.model_dump())
+def _asset_out(a) -> AssetOut:
     return AssetOut(
         id=a.id,
         symbol=a.symbol,
@@ -45,3 +27,32 @@ def upsert_asset(body: AssetIn, db: Session = Depends(get_db)):
         coinbase_product_id=a.coinbase_product_id,
         coingecko_id=a.coingecko_id,
     )
+
+@router.get("", response_model=list[AssetOut])
+async def list_assets(request: Request, page: Page = Depends(), db: AsyncSession = Depends(get_db)):
+    # list all (enabled + disabled); see app/api/pagination.py for pages and NDJSON
+    if wants_ndjson(request):
+        return ndjson_response(lambda repo: repo.stream_assets(page.after_id, settings.api_stream_chunk))
+
+    async def load() -> tuple[bytes, dict[str, str]]:
+        rows = await AsyncRepo(db).list_assets(page.after_id, page.limit)
+        body = _assets_json.dump_json([_asset_out(a) for a in rows])
+        return body, page.next_link(request, [a.id for a in rows])
+
+    return await cache.respond(request, "assets", page.key, load)
+
+@router.post("", response_model=AssetOut)
+async def upsert_asset(body: AssetIn, db: AsyncSession = Depends(get_db)):
+    repo = AsyncRepo(db)
+    a = await repo.upsert_asset(body.model_dump())
+    cache.invalidate("assets")
+    return _asset_out(a)
+
+@router.post("/bulk", response_model=BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_assets(request: Request, db: AsyncSession = Depends(get_db)):
+    # JSON array or CSV of AssetIn rows (see app/api/bulk.py)
+    repo = AsyncRepo(db)
+    try:
+        return await import_rows(request, AssetIn, repo.bulk_upsert_assets)
+    finally:
+        cache.invalidate("assets")
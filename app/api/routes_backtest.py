@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.settings import settings
+from app.domain.schemas import StrategyIn
+from app.engine.replay import load_candles, replay, strategy_from
+
+router = APIRouter()
+
+# body: raw CSV (symbol,ts,close) or .npz candles; strategy params as query string, e.g.
+#   curl --data-binary @candles.npz 'localhost:8000/backtest?base_tp=0.12&sl_pct=0.05'
+@router.post("")
+async def run_backtest(
+    request: Request,
+    strategy: StrategyIn = Depends(),
+    symbols: str | None = None,
+    reenter: bool = True,
+    messages: bool = False,
+    limit: int = 1000,
+):
+    size = request.headers.get("content-length")
+    if size is not None and size.isdigit() and int(size) > settings.backtest_max_bytes:
+        raise HTTPException(status_code=413, detail="candle file too large")
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > settings.backtest_max_bytes:
+            raise HTTPException(status_code=413, detail="candle file too large")
+    if not data:
+        raise HTTPException(status_code=400, detail="empty body (send CSV or .npz candles)")
+
+    def run() -> dict:
+        candles = load_candles(bytes(data))
+        if symbols:
+            candles = candles.only(s.strip() for s in symbols.split(","))
+        res = replay(candles, strategy_from(strategy.model_dump()), reenter=reenter, messages=messages)
+        return res.to_dict(limit=max(0, min(limit, 100_000)))
+
+    # CPU bound (numpy): keep it off the event loop
+    try:
+        return await run_in_threadpool(run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
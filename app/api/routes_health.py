@@ -1,7 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from app.observability import metrics
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # this process only: with several uvicorn workers each one has its own counters
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,26 +1,52 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.persistence.db import SessionLocal
-from app.persistence.repo import Repo
-from app.domain.schemas import HoldingIn, HoldingOut
+from fastapi import APIRouter, Depends, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.bulk import import_rows
+from app.api.cache import cache
+from app.api.pagination import Page, ndjson_response, wants_ndjson
+from app.settings import settings
+from app.persistence.db import AsyncSessionLocal
+from app.persistence.repo import AsyncRepo
+from app.domain.schemas import BulkResult, HoldingIn, HoldingOut
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
+_holdings_json = TypeAdapter(list[HoldingOut])
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @router.get("", response_model=list[HoldingOut])
-def list_holdings(symbol: str | None = None, db: Session = Depends(get_db)):
-    repo = Repo(db)
-    hs = repo.list_holdings(symbol)
-    return [HoldingOut(id=h.id, symbol=h.symbol, entry=h.entry, invested_amount=h.invested_amount) for h in hs]
+async def list_holdings(
+    request: Request, symbol: str | None = None, page: Page = Depends(), db: AsyncSession = Depends(get_db),
+):
+    # see app/api/pagination.py for pages and NDJSON
+    if wants_ndjson(request):
+        return ndjson_response(lambda repo: repo.stream_holdings(symbol, page.after_id, settings.api_stream_chunk))
+
+    async def load() -> tuple[bytes, dict[str, str]]:
+        hs = await AsyncRepo(db).list_holdings(symbol, page.after_id, page.limit)
+        body = _holdings_json.dump_json(
+            [HoldingOut(id=h.id, symbol=h.symbol, entry=h.entry, invested_amount=h.invested_amount) for h in hs]
+        )
+        return body, page.next_link(request, [h.id for h in hs])
+
+    key = f"{symbol.upper().strip() if symbol else ''}:{page.key}"
+    return await cache.respond(request, "holdings", key, load)
 
 @router.post("", response_model=HoldingOut)
-def create_holding(body: HoldingIn, db: Session = Depends(get_db)):
-    repo = Repo(db)
-    h = repo.create_holding(body.model_dump())
+async def create_holding(body: HoldingIn, db: AsyncSession = Depends(get_db)):
+    repo = AsyncRepo(db)
+    h = await repo.create_holding(body.model_dump())
+    cache.invalidate("holdings")
     return HoldingOut(id=h.id, symbol=h.symbol, entry=h.entry, invested_amount=h.invested_amount)
+
+@router.post("/bulk", response_model=BulkResult, response_model_exclude_none=True)
+async def bulk_create_holdings(request: Request, db: AsyncSession = Depends(get_db)):
+    # JSON array or CSV of HoldingIn rows (see app/api/bulk.py); engine_state rows come along
+    repo = AsyncRepo(db)
+    try:
+        return await import_rows(request, HoldingIn, repo.bulk_create_holdings, key=None)
+    finally:
+        cache.invalidate("holdings")
@@ -1,23 +1,19 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.persistence.db import SessionLocal
-from app.persistence.repo import Repo
-from app.domain.schemas import StrategyIn, StrategyOut
+from app.api.bulk import import_rows
+from app.api.cache import cache
+from app.persistence.db import AsyncSessionLocal
+from app.persistence.repo import AsyncRepo
+from app.domain.schemas import BulkResult, StrategyBulkIn, StrategyIn, StrategyOut
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-@router.get("/{symbol}", response_model=StrategyOut)
-def get_strategy(symbol: str, db: Session = Depends(get_db)):
-    repo = Repo(db)
-    s = repo.get_or_create_strategy(symbol)
+def _strategy_out(s) -> StrategyOut:
     return StrategyOut(
         id=s.id,
         symbol=s.symbol,
@@ -29,17 +25,32 @@ def get_strategy(symbol: str, db: Session = Depends(get_db)):
         confirm_regime=s.confirm_regime,
     )
 
+@router.get("/{symbol}", response_model=StrategyOut)
+async def get_strategy(symbol: str, request: Request, db: AsyncSession = Depends(get_db)):
+    sym = symbol.upper().strip()
+
+    async def load() -> tuple[bytes, dict[str, str]]:
+        # read-only: a symbol without a row shows the defaults (id null); the worker creates
+        # the row on its next tick and PUT creates it too
+        s = await AsyncRepo(db).get_strategy(sym)
+        out = _strategy_out(s) if s else StrategyOut(id=None, symbol=sym)
+        return out.model_dump_json().encode(), {}
+
+    return await cache.respond(request, "strategies", sym, load)
+
+# before /{symbol}: "bulk" is not a symbol here
+@router.put("/bulk", response_model=BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_strategies(request: Request, db: AsyncSession = Depends(get_db)):
+    # JSON array or CSV of StrategyIn rows plus their symbol (see app/api/bulk.py)
+    repo = AsyncRepo(db)
+    try:
+        return await import_rows(request, StrategyBulkIn, repo.bulk_upsert_strategies)
+    finally:
+        cache.invalidate("strategies")
+
 @router.put("/{symbol}", response_model=StrategyOut)
-def upsert_strategy(symbol: str, body: StrategyIn, db: Session = Depends(get_db)):
-    repo = Repo(db)
-    s = repo.upsert_strategy(symbol, body.model_dump())
-    return StrategyOut(
-        id=s.id,
-        symbol=s.symbol,
-        base_tp=s.base_tp,
-        sl_pct=s.sl_pct,
-        trail_atr_mult=s.trail_atr_mult,
-        profit_lock_pct=s.profit_lock_pct,
-        cooldown_sec=s.cooldown_sec,
-        confirm_regime=s.confirm_regime,
-    )
+async def upsert_strategy(symbol: str, body: StrategyIn, db: AsyncSession = Depends(get_db)):
+    repo = AsyncRepo(db)
+    s = await repo.upsert_strategy(symbol, body.model_dump())
+    cache.invalidate("strategies")
+    return _strategy_out(s)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Boolean, Float, Integer, DateTime, ForeignKey, UniqueConstraint, func, Text
+from sqlalchemy import String, Boolean, Float, Integer, DateTime, ForeignKey, PrimaryKeyConstraint, UniqueConstraint, func, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.persistence.db import Base
 
@@ -54,12 +54,16 @@ class EngineState(Base):
     holding = relationship("Holding")
 
 class Alert(Base):
+    # partitioned by bucket range (see persistence/partitions.py); on Postgres every key of a
+    # partitioned table must contain the partition key, hence (id, bucket)
     __tablename__ = "alerts"
     __table_args__ = (
+        PrimaryKeyConstraint("id", "bucket"),
         UniqueConstraint("holding_id", "kind", "bucket", name="uq_alert_dedup"),
+        {"postgresql_partition_by": "RANGE (bucket)"},
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True)
     holding_id: Mapped[int] = mapped_column(Integer, ForeignKey("holdings.id", ondelete="CASCADE"), index=True)
     kind: Mapped[str] = mapped_column(String(64), index=True)
     bucket: Mapped[int] = mapped_column(Integer, index=True)  # timestamp bucket for idempotency
@@ -68,3 +72,18 @@ class Alert(Base):
     created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     holding = relationship("Holding")
+
+class WorkerLease(Base):
+    # one row per shard partition; the owner evaluates every asset hashed to it
+    __tablename__ = "worker_leases"
+
+    partition: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    owner: Mapped[str | None] = mapped_column(String(128), nullable=True, index=True)
+    expires_at: Mapped[int] = mapped_column(Integer, default=0)
+    epoch: Mapped[int] = mapped_column(Integer, default=0)  # bumped on every change of owner (fencing)
+
+class WorkerNode(Base):
+    __tablename__ = "worker_nodes"
+
+    worker_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    heartbeat_at: Mapped[int] = mapped_column(Integer, index=True)
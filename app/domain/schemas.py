@@ -26,6 +26,21 @@ class StrategyIn(BaseModel):
     cooldown_sec: int = Field(1800, ge=0, le=7 * 24 * 3600)
     confirm_regime: bool = True
 
+class StrategyBulkIn(StrategyIn):
+    # one row of PUT /strategies/bulk
+    symbol: str = Field(..., min_length=1, max_length=32)
+
 class StrategyOut(StrategyIn):
-    id: int
+    id: int | None  # None: no row yet, these are the defaults the worker will apply
     symbol: str
+
+class BulkRowError(BaseModel):
+    row: int  # 1-based position in the upload (CSV header not counted)
+    error: str
+
+class BulkResult(BaseModel):
+    rows: int
+    written: int
+    failed: int
+    errors: list[BulkRowError]  # first 1000
+    aborted: str | None = None  # body became unreadable after some rows were written
@@ -0,0 +1,65 @@
+import argparse
+import csv
+import json
+import sys
+
+from app.domain.schemas import StrategyIn
+from app.engine.replay import load_candles, replay, strategy_from, write_npz
+
+# python -m app.engine.backtest candles.csv --base-tp 0.12 --sl-pct 0.05
+# python -m app.engine.backtest candles.csv --convert candles.npz   (compact binary, much faster to load)
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="python -m app.engine.backtest",
+        description="Replay a candle file (CSV symbol,ts,close or .npz) through the strategy engine.",
+    )
+    p.add_argument("file", help="CSV with symbol, ts (epoch s/ms or ISO) and close columns, or .npz")
+    p.add_argument("--symbols", help="comma separated subset of symbols")
+    defaults = StrategyIn()
+    for name, field in StrategyIn.model_fields.items():
+        flag = "--" + name.replace("_", "-")
+        if field.annotation is bool:
+            p.add_argument(flag, type=lambda v: v.lower() in ("1", "true", "yes", "on"), default=getattr(defaults, name))
+        else:
+            p.add_argument(flag, type=field.annotation, default=getattr(defaults, name))
+    p.add_argument("--no-reenter", action="store_true", help="one position per symbol (no re-entry after an exit)")
+    p.add_argument("--messages", action="store_true", help="format the alert messages in the timeline (slower)")
+    p.add_argument("--timeline", help="write the alert timeline as CSV ('-' for stdout)")
+    p.add_argument("--json", help="write summary + trades + timeline as JSON")
+    p.add_argument("--convert", metavar="NPZ", help="only convert the input to the binary format and exit")
+    return p
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    candles = load_candles(args.file)
+    if args.symbols:
+        candles = candles.only(s.strip() for s in args.symbols.split(","))
+
+    if args.convert:
+        write_npz(candles, args.convert)
+        print(f"wrote {len(candles)} candles for {len(candles.symbols)} symbols to {args.convert}", file=sys.stderr)
+        return 0
+
+    body = StrategyIn(**{name: getattr(args, name) for name in StrategyIn.model_fields})
+    result = replay(candles, strategy_from(body.model_dump()), reenter=not args.no_reenter, messages=args.messages)
+
+    if args.timeline:
+        out = sys.stdout if args.timeline == "-" else open(args.timeline, "w", newline="")
+        try:
+            events = result.timeline()
+            w = csv.DictWriter(out, fieldnames=list(events[0]) if events else ["ts", "symbol", "kind", "price", "pnl_pct"])
+            w.writeheader()
+            w.writerows(events)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(result.to_dict(limit=None), fh)
+
+    print(json.dumps(result.summary(), indent=2), file=sys.stderr if args.timeline == "-" else sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
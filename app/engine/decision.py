@@ -31,6 +31,32 @@ class Signal:
     kind: SignalKind
     message: str
 
+# messages (shared with decision_batch, which only formats them for signals that fired)
+def msg_trailing_stop(symbol: str, f: Features, trail_stop: float, pnl_pct: float) -> str:
+    return (
+        f"[{symbol}] Trailing stop tocado. "
+        f"Precio={f.last:.4f}, TrailStop≈{trail_stop:.4f}, PnL={pnl_pct*100:.2f}%."
+    )
+
+def msg_trailing_update(symbol: str, f: Features, anchor: float, trail_stop: float, pnl_pct: float) -> str:
+    return (
+        f"[{symbol}] Trailing activo. "
+        f"Anchor={anchor:.4f}, Stop≈{trail_stop:.4f}, PnL={pnl_pct*100:.2f}%, Regime={f.regime}."
+    )
+
+def msg_stop_loss(symbol: str, f: Features, smart_sl: float) -> str:
+    return (
+        f"[{symbol}] Stop inteligente tocado. "
+        f"Precio={f.last:.4f}, SL≈{smart_sl:.4f}, Regime={f.regime}."
+    )
+
+def msg_take_profit(symbol: str, f: Features, pnl_pct: float, tp_threshold: float) -> str:
+    return (
+        f"[{symbol}] Umbral TP alcanzado. "
+        f"Precio={f.last:.4f}, PnL={pnl_pct*100:.2f}%, TP≈{tp_threshold*100:.2f}%, Regime={f.regime}. "
+        f"Sugerencia: toma parcial y activa trailing."
+    )
+
 def decide(now_ts: int, h: Holding, s: Strategy, f: Features, st: EngineState) -> list[Signal]:
     signals: list[Signal] = []
 
@@ -60,20 +86,14 @@ def decide(now_ts: int, h: Holding, s: Strategy, f: Features, st: EngineState) -
         if f.last <= trail_stop:
             signals.append(Signal(
                 kind=SignalKind.TRAILING_STOP,
-                message=(
-                    f"[{h.symbol}] Trailing stop tocado. "
-                    f"Precio={f.last:.4f}, TrailStop≈{trail_stop:.4f}, PnL={pnl_pct*100:.2f}%."
-                ),
+                message=msg_trailing_stop(h.symbol, f, trail_stop, pnl_pct),
             ))
             return signals
 
         # update informativo (se deduplica por bucket)
         signals.append(Signal(
             kind=SignalKind.TRAILING_UPDATE,
-            message=(
-                f"[{h.symbol}] Trailing activo. "
-                f"Anchor={st.trailing_anchor:.4f}, Stop≈{trail_stop:.4f}, PnL={pnl_pct*100:.2f}%, Regime={f.regime}."
-            ),
+            message=msg_trailing_update(h.symbol, f, st.trailing_anchor, trail_stop, pnl_pct),
         ))
         return signals
 
@@ -83,10 +103,7 @@ def decide(now_ts: int, h: Holding, s: Strategy, f: Features, st: EngineState) -
     if f.last <= smart_sl:
         signals.append(Signal(
             kind=SignalKind.STOP_LOSS,
-            message=(
-                f"[{h.symbol}] Stop inteligente tocado. "
-                f"Precio={f.last:.4f}, SL≈{smart_sl:.4f}, Regime={f.regime}."
-            ),
+            message=msg_stop_loss(h.symbol, f, smart_sl),
         ))
         return signals
 
@@ -94,11 +111,7 @@ def decide(now_ts: int, h: Holding, s: Strategy, f: Features, st: EngineState) -
     if pnl_pct >= tp_threshold:
         signals.append(Signal(
             kind=SignalKind.TAKE_PROFIT,
-            message=(
-                f"[{h.symbol}] Umbral TP alcanzado. "
-                f"Precio={f.last:.4f}, PnL={pnl_pct*100:.2f}%, TP≈{tp_threshold*100:.2f}%, Regime={f.regime}. "
-                f"Sugerencia: toma parcial y activa trailing."
-            ),
+            message=msg_take_profit(h.symbol, f, pnl_pct, tp_threshold),
         ))
 
     return signals
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from math import isnan
+
+import numpy as np
+
+from app.providers.features import Features
+from app.providers.features_batch import FeatureBatch
+from app.domain.signals import SignalKind
+from app.engine.decision import (
+    Strategy,
+    msg_trailing_stop,
+    msg_trailing_update,
+    msg_stop_loss,
+    msg_take_profit,
+)
+
+# decide() for every holding of one symbol at once (struct-of-arrays).
+# Must match decide() holding by holding, including the state it mutates.
+# With a FeatureBatch (one row per holding) the holdings may belong to different symbols:
+# that's how the replay engine steps every symbol through one candle at once.
+
+_KINDS = (
+    SignalKind.TRAILING_STOP,
+    SignalKind.TRAILING_UPDATE,
+    SignalKind.STOP_LOSS,
+    SignalKind.TAKE_PROFIT,
+)
+
+@dataclass
+class BatchDecision:
+    symbol: str | list[str]  # per holding when features is a FeatureBatch
+    features: Features | FeatureBatch
+    index: np.ndarray  # positions (into the input arrays) that fired, ascending
+    codes: np.ndarray  # index into _KINDS, aligned with `index`
+    # updated state for every holding (decide mutates EngineState the same way)
+    trailing_active: np.ndarray
+    trailing_anchor: np.ndarray  # NaN == None
+    # intermediates kept for lazy message formatting
+    _pnl: np.ndarray
+    _trail_stop: np.ndarray
+    _smart_sl: np.ndarray
+    _tp_threshold: float | np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def kind(self, j: int) -> SignalKind:
+        return _KINDS[self.codes[j]]
+
+    def message(self, j: int) -> str:
+        i = self.index[j]
+        kind = self.kind(j)
+        f, symbol, tp = self.features, self.symbol, self._tp_threshold
+        if isinstance(f, FeatureBatch):
+            f, symbol, tp = f.row(i), symbol[i], float(tp[i])
+        pnl = float(self._pnl[i])
+        if kind == SignalKind.TRAILING_STOP:
+            return msg_trailing_stop(symbol, f, float(self._trail_stop[i]), pnl)
+        if kind == SignalKind.TRAILING_UPDATE:
+            return msg_trailing_update(
+                symbol, f, float(self.trailing_anchor[i]), float(self._trail_stop[i]), pnl
+            )
+        if kind == SignalKind.STOP_LOSS:
+            return msg_stop_loss(symbol, f, float(self._smart_sl[i]))
+        return msg_take_profit(symbol, f, pnl, tp)
+
+def _pymax(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Python's max(a, b): b only if strictly greater (keeps NaN semantics identical)
+    return np.where(b > a, b, a)
+
+def decide_batch(
+    now_ts: int,
+    symbol: str | list[str],
+    s: Strategy,
+    f: Features | FeatureBatch,
+    entry: np.ndarray,
+    trailing_active: np.ndarray,
+    trailing_anchor: np.ndarray,
+    last_alert_ts: np.ndarray,
+) -> BatchDecision:
+    # trailing_anchor: NaN == None; last_alert_ts: 0 == None. Inputs are not modified.
+    entry = np.asarray(entry, dtype=np.float64)
+    active = np.array(trailing_active, dtype=bool)
+    anchor = np.array(trailing_anchor, dtype=np.float64)
+    lat = np.asarray(last_alert_ts, dtype=np.int64)
+    n = len(entry)
+    empty = np.zeros(n, dtype=np.float64)
+
+    def result(index: np.ndarray, codes: np.ndarray, pnl=empty, trail_stop=empty, smart_sl=empty, tp=0.0):
+        return BatchDecision(
+            symbol=symbol, features=f, index=index, codes=codes,
+            trailing_active=active, trailing_anchor=anchor,
+            _pnl=pnl, _trail_stop=trail_stop, _smart_sl=smart_sl, _tp_threshold=tp,
+        )
+
+    per_row = isinstance(f, FeatureBatch)
+    if not per_row and (f.last <= 0 or isnan(f.last)):
+        return result(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8))
+
+    live = ~((lat != 0) & ((now_ts - lat) < s.cooldown_sec))
+    if per_row:
+        live &= f.last > 0  # also False for NaN (no price for that row)
+
+    pnl = (f.last / entry) - 1.0
+
+    tp_threshold = s.base_tp + 0.5 * f.vol_pct
+    if per_row:
+        if s.confirm_regime:
+            tp_threshold = np.where(f.regime != "BULL", tp_threshold * 1.25, tp_threshold)
+    elif s.confirm_regime and f.regime != "BULL":
+        tp_threshold *= 1.25
+
+    # trailing activation
+    activate = live & ~active & (pnl >= s.profit_lock_pct)
+    active |= activate
+    anchor[activate] = f.last[activate] if per_row else f.last
+
+    # trailing (highest priority)
+    trailing = live & active
+    base = np.where(np.isnan(anchor) | (anchor == 0.0), f.last, anchor)  # `anchor or last`
+    anchor = np.where(trailing, _pymax(base, np.full(n, f.last)), anchor)
+    trail_stop = anchor - (s.trail_atr_mult * f.atr)
+    ts_fire = trailing & (f.last <= trail_stop)
+    tu_fire = trailing & ~ts_fire
+
+    # smart SL / TP for the holdings without trailing
+    rest = live & ~active
+    smart_sl = _pymax(entry * (1 - s.sl_pct), np.full(n, f.ema_short - 1.0 * f.atr))
+    sl_fire = rest & (f.last <= smart_sl)
+    tp_fire = rest & ~sl_fire & (pnl >= tp_threshold)
+
+    codes_all = np.select([ts_fire, tu_fire, sl_fire, tp_fire], [0, 1, 2, 3], default=-1).astype(np.int8)
+    index = np.nonzero(codes_all >= 0)[0]
+    return result(index, codes_all[index], pnl, trail_stop, smart_sl, tp_threshold)
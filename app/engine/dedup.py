@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from typing import Iterable
+
+from app.settings import settings
+
+Key = tuple[int, str, int]  # (holding_id, kind, bucket) == uq_alert_dedup
+
+class AlertDedupIndex:
+    # In-process mirror of the live window of `alerts`, so the hot path (TRAILING_UPDATE on
+    # every tick) doesn't SELECT per signal. uq_alert_dedup stays the authoritative backstop.
+    def __init__(self, bucket_seconds: int = 300, max_entries: int | None = None):
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries or settings.dedup_max_entries
+        self._keys: OrderedDict[Key, None] = OrderedDict()
+        self._bucket: int | None = None
+        # live-window entries were evicted for size: a miss is no longer proof, ask the DB
+        self._overflowed = False
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def bucket(self, ts: int) -> int:
+        return ts - (ts % self.bucket_seconds)
+
+    def _roll(self, bucket: int) -> None:
+        if bucket == self._bucket:
+            return
+        self._bucket = bucket
+        self._overflowed = False
+        # keys arrive in time order, so stale buckets sit at the front
+        while self._keys:
+            k = next(iter(self._keys))
+            if k[2] >= bucket:
+                break
+            self._keys.popitem(last=False)
+
+    def seen(self, holding_id: int, kind: str, ts: int) -> bool | None:
+        # True: already sent in this bucket; False: not sent; None: unknown (check the DB)
+        b = self.bucket(ts)
+        self._roll(b)
+        if (holding_id, str(kind), b) in self._keys:
+            self.hits += 1
+            return True
+        if self._overflowed:
+            self.fallbacks += 1
+            return None
+        self.misses += 1
+        return False
+
+    def add(self, holding_id: int, kind: str, ts: int) -> None:
+        b = self.bucket(ts)
+        self._roll(b)
+        self._put((holding_id, str(kind), b))
+
+    def _put(self, key: Key) -> None:
+        self._keys[key] = None
+        while len(self._keys) > self.max_entries:
+            old = self._keys.popitem(last=False)[0]
+            if old[2] >= (self._bucket or 0):
+                self._overflowed = True
+
+    def warm(self, keys: Iterable[Key], now_ts: int) -> None:
+        self._roll(self.bucket(now_ts))
+        for hid, kind, b in sorted(keys, key=lambda k: k[2]):
+            if b >= self._bucket:
+                self._put((hid, str(kind), b))
+        self.warmed = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,400 @@
+import io
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Iterable
+
+import numpy as np
+
+from app.engine.decision import Strategy
+from app.engine.decision_batch import decide_batch, _KINDS
+from app.providers.features_batch import FeatureBatch, compute_features_series
+
+# Backtest / replay: every symbol's candle history goes through the live feature and
+# decision code (compute_features_series == compute_features per candle, decide_batch ==
+# decide) with simulated time, cooldown, alert dedup and one simulated position per symbol.
+# Symbols advance together one candle-time at a time; nothing is copied per candle.
+
+NPZ_MAGIC = b"PK"  # .npz is a zip archive
+_EXITS = (0, 2)  # TRAILING_STOP, STOP_LOSS (codes into decision_batch._KINDS)
+# regime is kept as an int8 code per cell (a <U8 string is 32 bytes) and only turned back
+# into strings for the one row decide_batch sees
+_REGIMES = np.array(["SIDEWAYS", "BULL", "BEAR"])
+
+# -------- Candle files --------
+@dataclass
+class CandleSet:
+    # all symbols in three flat arrays; symbol i owns ts/close[offsets[i]:offsets[i + 1]], sorted by ts
+    symbols: list[str]
+    offsets: np.ndarray
+    ts: np.ndarray
+    close: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def series(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.ts[a:b], self.close[a:b]
+
+    def only(self, symbols: Iterable[str]) -> "CandleSet":
+        wanted = set(symbols)
+        keep = [i for i, s in enumerate(self.symbols) if s in wanted]
+        parts = [self.series(i) for i in keep]
+        return _candle_set([self.symbols[i] for i in keep], [p[0] for p in parts], [p[1] for p in parts])
+
+def _candle_set(symbols: list[str], ts: list[np.ndarray], close: list[np.ndarray]) -> CandleSet:
+    offsets = np.zeros(len(symbols) + 1, dtype=np.int64)
+    out_ts, out_close = [], []
+    for i, (t, c) in enumerate(zip(ts, close)):
+        order = np.argsort(t, kind="stable")
+        t, c = t[order], c[order]
+        # one candle per timestamp: the last one in the file wins
+        keep = np.append(t[1:] != t[:-1], True) if len(t) else np.zeros(0, dtype=bool)
+        out_ts.append(t[keep])
+        out_close.append(c[keep])
+        offsets[i + 1] = offsets[i] + int(keep.sum())
+    return CandleSet(
+        symbols=symbols,
+        offsets=offsets,
+        ts=np.concatenate(out_ts) if out_ts else np.zeros(0, dtype=np.int64),
+        close=np.concatenate(out_close) if out_close else np.zeros(0),
+    )
+
+def _parse_ts(raw: str) -> int:
+    # epoch seconds (ms are scaled down once per symbol, see _epoch_seconds) or ISO 8601
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return int(float(raw))
+    except ValueError:
+        return int(datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp())
+
+def _epoch_seconds(ts: np.ndarray) -> np.ndarray:
+    return np.where(ts > 100_000_000_000, ts // 1000, ts)  # epoch ms -> s
+
+def read_csv(f: IO[str]) -> CandleSet:
+    # header with `symbol`, `close` and one of ts/time/timestamp/open_time; other columns ignored
+    reader = csv.reader(f)
+    header = [h.strip().lower() for h in next(reader, [])]
+    try:
+        i_sym = header.index("symbol")
+        i_close = header.index("close")
+        i_ts = next(header.index(c) for c in ("ts", "time", "timestamp", "open_time") if c in header)
+    except (ValueError, StopIteration):
+        raise ValueError("CSV needs symbol, close and ts/time/timestamp/open_time columns")
+
+    ts: dict[str, list[int]] = {}
+    closes: dict[str, list[float]] = {}
+    for n, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        try:
+            sym = row[i_sym]
+            t = _parse_ts(row[i_ts])
+            c = float(row[i_close])
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"CSV line {n}: {e}")
+        if sym not in ts:
+            ts[sym], closes[sym] = [], []
+        ts[sym].append(t)
+        closes[sym].append(c)
+
+    symbols = list(ts)
+    return _candle_set(
+        symbols,
+        [_epoch_seconds(np.asarray(ts[s], dtype=np.int64)) for s in symbols],
+        [np.asarray(closes[s], dtype=np.float64) for s in symbols],
+    )
+
+def read_npz(f: IO[bytes] | str) -> CandleSet:
+    with np.load(f, allow_pickle=False) as z:
+        symbols = [str(s) for s in z["symbols"]]
+        offsets = z["offsets"].astype(np.int64)
+        ts = z["ts"].astype(np.int64)
+        close = z["close"].astype(np.float64)
+    if len(offsets) != len(symbols) + 1 or offsets[-1] != len(ts) or len(ts) != len(close):
+        raise ValueError("malformed candle file (symbols/offsets/ts/close don't line up)")
+    return _candle_set(symbols, [ts[a:b] for a, b in zip(offsets, offsets[1:])], [close[a:b] for a, b in zip(offsets, offsets[1:])])
+
+def write_npz(cs: CandleSet, f: IO[bytes] | str) -> None:
+    # the compact format: symbols + offsets + flat int64 ts / float64 close, zip-compressed
+    np.savez_compressed(f, symbols=np.asarray(cs.symbols), offsets=cs.offsets, ts=cs.ts, close=cs.close)
+
+def load_candles(data: bytes | str) -> CandleSet:
+    # raw upload bytes or a file path; the format is sniffed (.npz is a zip archive)
+    if isinstance(data, str):
+        with open(data, "rb") as fh:
+            data = fh.read()
+    if data[:2] == NPZ_MAGIC:
+        return read_npz(io.BytesIO(data))
+    return read_csv(io.StringIO(data.decode("utf-8-sig")))
+
+# -------- Replay --------
+@dataclass
+class Trades:
+    # one row per position, closed or (exit_kind == -1) still open and marked to its last close
+    symbol: np.ndarray  # index into ReplayResult.names
+    entry_ts: np.ndarray
+    entry: np.ndarray
+    exit_ts: np.ndarray  # 0 while open
+    exit: np.ndarray
+    exit_kind: np.ndarray  # index into _KINDS, -1 == open
+
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+    @property
+    def ret(self) -> np.ndarray:
+        return self.exit / self.entry - 1.0
+
+@dataclass
+class ReplayResult:
+    symbols: int
+    candles: int
+    steps: int
+    elapsed_sec: float
+    # timeline, as parallel arrays in time order
+    event_ts: np.ndarray
+    event_symbol: np.ndarray  # index into `names`
+    event_kind: np.ndarray  # index into _KINDS
+    event_price: np.ndarray
+    event_pnl: np.ndarray
+    names: list[str]
+    trades: Trades
+    deduped: int = 0
+    messages: list[str] = field(default_factory=list)  # aligned with events when requested
+
+    def alerts_by_kind(self) -> dict[str, int]:
+        counts = np.bincount(self.event_kind, minlength=len(_KINDS))
+        return {str(k): int(c) for k, c in zip(_KINDS, counts)}
+
+    def summary(self) -> dict:
+        tr = self.trades
+        ret = tr.ret * 100
+        closed = ret[tr.exit_kind >= 0]
+        still_open = ret[tr.exit_kind < 0]
+        # per symbol, every trade (incl. the open one) compounded; then averaged over symbols
+        growth = np.bincount(tr.symbol, weights=np.log1p(tr.ret), minlength=self.symbols)
+        traded = np.bincount(tr.symbol, minlength=self.symbols) > 0
+
+        def stat(x: np.ndarray, fn) -> float | None:
+            return round(float(fn(x)), 4) if len(x) else None
+
+        return {
+            "symbols": self.symbols,
+            "candles": self.candles,
+            "steps": self.steps,
+            "elapsed_sec": round(self.elapsed_sec, 4),
+            "alerts": int(len(self.event_ts)),
+            "alerts_by_kind": self.alerts_by_kind(),
+            "deduped": self.deduped,
+            "trades": int(len(closed)),
+            "wins": int((closed > 0).sum()),
+            "win_rate": stat(closed > 0, np.mean),
+            "avg_trade_pct": stat(closed, np.mean),
+            "best_trade_pct": stat(closed, np.max),
+            "worst_trade_pct": stat(closed, np.min),
+            "open_positions": int(len(still_open)),
+            "avg_open_pct": stat(still_open, np.mean),
+            "avg_symbol_return_pct": stat(np.expm1(growth[traded]) * 100, np.mean),
+        }
+
+    def timeline(self, limit: int | None = None) -> list[dict]:
+        n = len(self.event_ts) if limit is None else min(limit, len(self.event_ts))
+        out = []
+        for j in range(n):
+            ev = {
+                "ts": int(self.event_ts[j]),
+                "symbol": self.names[self.event_symbol[j]],
+                "kind": str(_KINDS[self.event_kind[j]]),
+                "price": float(self.event_price[j]),
+                "pnl_pct": round(float(self.event_pnl[j]) * 100, 4),
+            }
+            if self.messages:
+                ev["message"] = self.messages[j]
+            out.append(ev)
+        return out
+
+    def trade_list(self, limit: int | None = None) -> list[dict]:
+        tr = self.trades
+        n = len(tr) if limit is None else min(limit, len(tr))
+        return [
+            {
+                "symbol": self.names[tr.symbol[j]],
+                "entry_ts": int(tr.entry_ts[j]),
+                "entry": float(tr.entry[j]),
+                "exit_ts": int(tr.exit_ts[j]) if tr.exit_kind[j] >= 0 else None,
+                "exit": float(tr.exit[j]),
+                "exit_kind": str(_KINDS[tr.exit_kind[j]]) if tr.exit_kind[j] >= 0 else None,
+                "ret_pct": round(float(tr.exit[j] / tr.entry[j] - 1.0) * 100, 4),
+            }
+            for j in range(n)
+        ]
+
+    def to_dict(self, limit: int | None = 1000) -> dict:
+        return {
+            "summary": self.summary(),
+            "trades": self.trade_list(limit),
+            "timeline": self.timeline(limit),
+            "truncated": limit is not None and max(len(self.event_ts), len(self.trades)) > limit,
+        }
+
+def replay(
+    candles: CandleSet,
+    strategy: Strategy,
+    reenter: bool = True,
+    messages: bool = False,
+    bucket_seconds: int = 300,
+) -> ReplayResult:
+    # One position per symbol, opened at the close of its first candle and evaluated from the
+    # next one on, exactly like a holding the worker ticks once per candle. TRAILING_STOP and
+    # STOP_LOSS close it at that candle's close; with `reenter` a fresh one opens right away.
+    started = time.perf_counter()
+    names = list(candles.symbols)
+    n_sym = len(names)
+    grid = np.unique(candles.ts)
+    steps = len(grid)
+
+    # feature matrices (time x symbol); NaN where a symbol has no candle at that time
+    last = np.full((steps, n_sym), np.nan)
+    atr = np.zeros((steps, n_sym))
+    ema_s = np.zeros((steps, n_sym))
+    ema_l = np.zeros((steps, n_sym))
+    vol = np.zeros((steps, n_sym))
+    regime = np.zeros((steps, n_sym), dtype=np.int8)  # index into _REGIMES
+    for i in range(n_sym):
+        ts_i, close_i = candles.series(i)
+        rows = np.searchsorted(grid, ts_i)
+        fs = compute_features_series(close_i)
+        last[rows, i] = fs.last
+        atr[rows, i] = fs.atr
+        ema_s[rows, i] = fs.ema_short
+        ema_l[rows, i] = fs.ema_long
+        vol[rows, i] = fs.vol_pct
+        regime[rows, i] = (fs.regime == "BULL") + 2 * (fs.regime == "BEAR")
+
+    entry = np.full(n_sym, np.nan)
+    entry_ts = np.zeros(n_sym, dtype=np.int64)
+    active = np.zeros(n_sym, dtype=bool)
+    anchor = np.full(n_sym, np.nan)
+    last_alert = np.zeros(n_sym, dtype=np.int64)
+    last_bucket = np.full((n_sym, len(_KINDS)), -1, dtype=np.int64)  # dedup: (symbol, kind) -> bucket
+    can_open = np.ones(n_sym, dtype=bool)
+
+    ev_ts, ev_sym, ev_kind, ev_price, ev_pnl = [], [], [], [], []
+    tr_sym, tr_entry_ts, tr_entry, tr_exit_ts, tr_exit, tr_kind = [], [], [], [], [], []
+    msgs: list[str] = []
+    deduped = 0
+
+    for t in range(steps):
+        now_ts = int(grid[t])
+        px = last[t]
+        present = px > 0
+
+        # open (or re-open) positions; they are first evaluated on the next candle
+        opening = present & np.isnan(entry) & can_open
+        if opening.any():
+            entry[opening] = px[opening]
+            entry_ts[opening] = now_ts
+            active[opening] = False
+            anchor[opening] = np.nan
+            last_alert[opening] = 0
+            last_bucket[opening] = -1
+            if not reenter:
+                can_open[opening] = False
+        # only positions held since an earlier candle are evaluated (NaN == no price for decide_batch)
+        px_eval = np.where(np.isnan(entry) | opening, np.nan, px)
+
+        f = FeatureBatch(
+            last=px_eval, atr=atr[t], ema_short=ema_s[t], ema_long=ema_l[t], vol_pct=vol[t],
+            regime=_REGIMES[regime[t]],
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res = decide_batch(now_ts, names, strategy, f, entry, active, anchor, last_alert)
+        active = res.trailing_active
+        anchor = res.trailing_anchor
+        if not len(res):
+            continue
+
+        # dedup (same holding/kind/bucket as uq_alert_dedup) and cooldown bookkeeping
+        idx, codes = res.index, res.codes.astype(np.int64)
+        bucket = now_ts - (now_ts % bucket_seconds)
+        fresh = last_bucket[idx, codes] != bucket
+        deduped += int((~fresh).sum())
+        idx, codes = idx[fresh], codes[fresh]
+        if not len(idx):
+            continue
+        last_bucket[idx, codes] = bucket
+        last_alert[idx] = now_ts
+
+        ev_ts.append(np.full(len(idx), now_ts, dtype=np.int64))
+        ev_sym.append(idx)
+        ev_kind.append(codes)
+        ev_price.append(px[idx])
+        ev_pnl.append(px[idx] / entry[idx] - 1.0)
+        if messages:
+            pos = {int(i): j for j, i in enumerate(res.index)}
+            msgs.extend(res.message(pos[int(i)]) for i in idx)
+
+        is_exit = (codes == _EXITS[0]) | (codes == _EXITS[1])
+        if is_exit.any():
+            exits = idx[is_exit]
+            tr_sym.append(exits)
+            tr_entry_ts.append(entry_ts[exits])
+            tr_entry.append(entry[exits])
+            tr_exit_ts.append(np.full(len(exits), now_ts, dtype=np.int64))
+            tr_exit.append(px[exits])
+            tr_kind.append(codes[is_exit])
+            entry[exits] = np.nan
+            active[exits] = False
+            anchor[exits] = np.nan
+
+    # still-open positions, marked to their last close
+    still = np.nonzero(~np.isnan(entry))[0]
+    tr_sym.append(still)
+    tr_entry_ts.append(entry_ts[still])
+    tr_entry.append(entry[still])
+    tr_exit_ts.append(np.zeros(len(still), dtype=np.int64))
+    tr_exit.append(candles.close[candles.offsets[still + 1] - 1])
+    tr_kind.append(np.full(len(still), -1, dtype=np.int64))
+
+    def cat(parts: list[np.ndarray], dtype) -> np.ndarray:
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    return ReplayResult(
+        symbols=n_sym,
+        candles=len(candles),
+        steps=steps,
+        elapsed_sec=time.perf_counter() - started,
+        event_ts=cat(ev_ts, np.int64),
+        event_symbol=cat(ev_sym, np.int64),
+        event_kind=cat(ev_kind, np.int64),
+        event_price=cat(ev_price, np.float64),
+        event_pnl=cat(ev_pnl, np.float64),
+        names=names,
+        trades=Trades(
+            symbol=cat(tr_sym, np.int64),
+            entry_ts=cat(tr_entry_ts, np.int64),
+            entry=cat(tr_entry, np.float64),
+            exit_ts=cat(tr_exit_ts, np.int64),
+            exit=cat(tr_exit, np.float64),
+            exit_kind=cat(tr_kind, np.int64),
+        ),
+        deduped=deduped,
+        messages=msgs,
+    )
+
+def strategy_from(data: dict) -> Strategy:
+    return Strategy(
+        base_tp=float(data["base_tp"]),
+        sl_pct=float(data["sl_pct"]),
+        trail_atr_mult=float(data["trail_atr_mult"]),
+        profit_lock_pct=float(data["profit_lock_pct"]),
+        cooldown_sec=int(data["cooldown_sec"]),
+        confirm_regime=bool(data["confirm_regime"]),
+    )
+
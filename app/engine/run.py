@@ -1,33 +1,132 @@
 import asyncio
+import signal
 import time
 import logging
 
 from app.observability.logging import configure_logging
-from app.persistence.db import SessionLocal, init_db
+from app.persistence.db import init_db, SessionLocal, AsyncSessionLocal, dispose_async_engine
 from app.settings import settings
 from app.engine.worker import Worker
+from app.engine.shard import ShardCoordinator
+from app.persistence.repo import Repo, AsyncRepo
+from app.engine.stream import StreamRunner
+from app.providers import streaming
+from app.net.http import close_clients
+from app.observability.server import StatusServer, json_route
+from app.observability import metrics
+from app.observability.profiler import TickProfiler
 
 async def main() -> None:
     configure_logging()
     log = logging.getLogger("run")
     init_db()
 
+    # SIGTERM (docker stop) cancels the loop so pooled connections are closed cleanly
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+    # kill -USR1 <pid>: sample the next PROFILE_SIGNAL_TICKS ticks into PROFILE_DIR
+    profiler = TickProfiler()
+    profiler.arm(settings.profile_ticks)
+    loop.add_signal_handler(signal.SIGUSR1, profiler.arm, settings.profile_signal_ticks)
+
+    shard: ShardCoordinator | None = None
+    if settings.sharding:
+        shard = ShardCoordinator()
+        if shard.lease_ttl <= 2 * settings.poll_interval_sec:
+            log.warning("SHARD_LEASE_TTL_SEC=%d is too close to POLL_INTERVAL_SEC; leases may lapse", shard.lease_ttl)
+        log.info("sharding on: worker=%s partitions=%d", shard.worker_id, shard.partitions)
+    w = Worker(shard=shard)
+    sender = asyncio.create_task(w.outbox.run())
+    pruner = asyncio.create_task(_maintain_alerts(log)) if settings.alert_prune_interval_sec > 0 else None
+    metrics.notify_queue_depth.set_function(lambda: w.outbox.depth)
+    status: StatusServer | None = None
+    if settings.worker_http_port:
+        status = StatusServer(settings.worker_http_host, settings.worker_http_port)
+        status.add("/health", json_route(lambda: {"status": "ok"}))
+        status.add("/health/providers", json_route(w.providers.health_view))
+        status.add("/metrics", lambda: (metrics.CONTENT_TYPE, metrics.registry.render().encode()))
+        await status.start()
+    try:
+        await _loop(log, w, profiler)
+    except asyncio.CancelledError:
+        log.info("worker shutting down")
+    finally:
+        if not await w.outbox.join(settings.notify_drain_sec):
+            log.warning("shutting down with %d undelivered alert(s)", w.outbox.depth)
+        sender.cancel()
+        if pruner:
+            pruner.cancel()
+        if shard:
+            _release(shard, log)
+        if status:
+            await status.close()
+        await close_clients()
+        await dispose_async_engine()
+
+async def _loop(log: logging.Logger, w: Worker, profiler: TickProfiler) -> None:
+    runner: StreamRunner | None = None
+    if settings.ingest_mode == "stream":
+        if streaming.websockets is None:
+            log.error("INGEST_MODE=stream but 'websockets' is not installed; polling only")
+        else:
+            runner = StreamRunner(w)
+            asyncio.create_task(runner.run()).add_done_callback(_on_stream_exit)
+
     while True:
         log.info("🔥 Worker tick starting...")
         start = time.time()
-        db = SessionLocal()
         try:
             log.info("Scanning assets...")
-            w = Worker(db)
-            await w.tick()
+            with profiler:
+                stats = await w.tick()
+            log.info(
+                "tick done partitions=%d assets=%d failed=%d fetch_wall=%.2fs fetch_serial=%.2fs saved=%.2fs "
+                "hedges=%d retries=%d states=%d alerts=%d dedup_hits=%d dedup_misses=%d db=%d/%.3fs total=%.2fs "
+                "notify_depth=%d notify_latency_avg=%.2fs notify_latency_max=%.2fs",
+                stats.partitions, stats.assets, stats.failed, stats.fetch_wall_sec, stats.fetch_serial_sec,
+                stats.saved_sec, stats.hedges, stats.retries, stats.states_written, stats.alerts_written,
+                stats.dedup_hits, stats.dedup_misses, stats.db_queries, stats.db_sec, stats.total_sec,
+                w.outbox.depth, w.outbox.stats.latency_avg_sec, w.outbox.stats.latency_max_sec,
+            )
+            if runner:
+                runner.refresh(w.assets)
         except Exception as e:
             log.exception("worker tick failed: %s", e)
-        finally:
-            db.close()
 
         elapsed = time.time() - start
         sleep_for = max(0.0, float(settings.poll_interval_sec) - elapsed)
         await asyncio.sleep(sleep_for)
 
+async def _maintain_alerts(log: logging.Logger) -> None:
+    # alert retention: creates the next partitions and drops/archives expired ones. Every
+    # replica runs it; the DDL is idempotent (IF NOT EXISTS / IF EXISTS)
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                created, removed = await AsyncRepo(db).maintain_alert_partitions(int(time.time()))
+            if created or removed:
+                log.info(
+                    "alert partitions: created=%s %s=%s (retention %dd)",
+                    created, settings.alert_retention_mode, removed, settings.alert_retention_days,
+                )
+        except Exception as e:
+            log.warning("alert partition maintenance failed: %s", e)
+        await asyncio.sleep(settings.alert_prune_interval_sec)
+
+def _release(shard: ShardCoordinator, log: logging.Logger) -> None:
+    db = SessionLocal()
+    try:
+        shard.release(Repo(db))
+    except Exception as e:
+        log.warning("releasing shard leases failed (they expire in %ds): %s", shard.lease_ttl, e)
+    finally:
+        db.close()
+
+def _on_stream_exit(t: asyncio.Task) -> None:
+    if not t.cancelled() and t.exception():
+        logging.getLogger("run").error("stream runner stopped, polling only: %r", t.exception())
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,63 @@
+import os
+import math
+import socket
+import uuid
+import zlib
+import logging
+
+from app.settings import settings
+from app.persistence.repo import Repo, AsyncRepo, LeaseFence
+
+log = logging.getLogger("shard")
+
+def partition_of(symbol: str, partitions: int) -> int:
+    # stable across processes and restarts (unlike hash())
+    return zlib.crc32(symbol.encode()) % partitions
+
+class ShardCoordinator:
+    # Splits assets across worker replicas: assets hash into SHARD_PARTITIONS partitions and
+    # each partition is leased (worker_leases) to one worker at a time. Every worker aims for
+    # ceil(partitions / live workers), so leases move when a worker joins (others give back
+    # the surplus) or dies (its leases expire after SHARD_LEASE_TTL_SEC and get claimed).
+    def __init__(self, worker_id: str | None = None, partitions: int | None = None, lease_ttl: int | None = None):
+        self.worker_id = worker_id or settings.worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.partitions = partitions or settings.shard_partitions
+        self.lease_ttl = lease_ttl or settings.shard_lease_ttl_sec
+        self.leases: dict[int, int] = {}  # partition -> epoch
+        self.live_workers = 0
+        self._ready = False
+
+    async def sync(self, repo: AsyncRepo, now_ts: int) -> None:
+        if not self._ready:
+            await repo.ensure_partitions(self.partitions)
+            self._ready = True
+        self.live_workers = max(1, await repo.heartbeat_worker(self.worker_id, now_ts, self.lease_ttl))
+        target = math.ceil(self.partitions / self.live_workers)
+        before = set(self.leases)
+        self.leases = await repo.sync_leases(self.worker_id, now_ts, self.lease_ttl, self.partitions, target)
+        if set(self.leases) != before:
+            log.info(
+                "shard %s holds %d/%d partitions (live workers=%d, +%d -%d)",
+                self.worker_id, len(self.leases), self.partitions, self.live_workers,
+                len(set(self.leases) - before), len(before - set(self.leases)),
+            )
+
+    def owns(self, symbol: str) -> bool:
+        return partition_of(symbol, self.partitions) in self.leases
+
+    def fence(self, now_ts: int) -> LeaseFence:
+        return LeaseFence(
+            worker_id=self.worker_id,
+            leases=dict(self.leases),
+            now_ts=now_ts,
+            until=now_ts + self.lease_ttl,
+        )
+
+    def forget(self) -> None:
+        # a fenced flush failed: whatever we thought we held is stale until the next sync
+        self.leases = {}
+
+    def release(self, repo: Repo) -> None:
+        # clean shutdown: hand partitions over now instead of after the lease TTL
+        repo.release_leases(self.worker_id)
+        self.leases = {}
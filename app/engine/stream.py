@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from app.settings import settings
+from app.engine.worker import Worker
+from app.providers.streaming import BinanceStream, CoinbaseStream, PriceStream
+
+log = logging.getLogger("stream")
+
+class StreamRunner:
+    # Streaming ingestion: keeps the latest streamed price per symbol and re-evaluates a
+    # symbol's holdings whenever it moves more than STREAM_MIN_MOVE_PCT. The polling loop
+    # keeps running as fallback (and refreshes candles + the subscribed asset set).
+    def __init__(self, worker: Worker, streams: list[PriceStream] | None = None):
+        self.worker = worker
+        self.streams = streams if streams is not None else [
+            BinanceStream(settings.binance_ws_url, self.on_price),
+            CoinbaseStream(settings.coinbase_ws_url, self.on_price),
+        ]
+        self.prices: dict[str, float] = {}
+        self._evaluated: dict[str, float] = {}  # price each symbol was last evaluated at
+        self._pending: set[str] = set()
+        self._wake = asyncio.Event()
+
+    def refresh(self, assets: list[dict]) -> None:
+        for s in self.streams:
+            s.set_assets(assets)
+
+    def on_price(self, symbol: str, price: float) -> None:
+        self.prices[symbol] = price
+        ref = self._evaluated.get(symbol)
+        if ref and abs(price / ref - 1.0) < settings.stream_min_move_pct:
+            return
+        self._pending.add(symbol)
+        self._wake.set()
+
+    async def run(self) -> None:
+        await asyncio.gather(*(s.run() for s in self.streams), self._consume())
+
+    async def _consume(self) -> None:
+        # coalesces bursts: every wake-up evaluates the latest price of each moved symbol once
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            batch = {sym: self.prices[sym] for sym in self._pending}
+            self._pending.clear()
+            try:
+                stats = await self.worker.evaluate_prices(batch)
+                if stats.alerts_written:
+                    log.info("stream eval symbols=%d alerts=%d", len(batch), stats.alerts_written)
+            except Exception as e:
+                log.exception("stream evaluation failed: %s", e)
+            self._evaluated.update(batch)
@@ -1,75 +1,300 @@
+import asyncio
+import inspect
 import time
 import logging
+from dataclasses import dataclass
+from math import isnan
+
+import numpy as np
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.persistence.repo import Repo
+from app.settings import settings
+from app.persistence.db import AsyncSessionLocal, DbClock, db_clock
+from app.persistence.repo import AsyncRepo, AssetBook, PendingAlert, TickSnapshot, LeaseLost
 from app.providers.aggregator import ProviderAggregator
-from app.providers.features import compute_features
-from app.engine.decision import decide, Strategy as DStrategy, Holding as DHolding, EngineState as DState
-from app.notify.telegram import TelegramNotifier
+from app.providers.base import PricePoint, FetchClock, RetryBudget, fetch_clock, retry_budget
+from app.providers.features import Features, FeatureEngine
+from app.engine.decision import EngineState as DState
+from app.engine.decision_batch import decide_batch
+from app.engine.dedup import AlertDedupIndex
+from app.engine.shard import ShardCoordinator
+from app.notify.queue import AlertQueue
 from app.domain.signals import SignalKind
+from app.observability import metrics, tracing
 
 log = logging.getLogger("worker")
 
+@dataclass
+class TickStats:
+    assets: int = 0
+    failed: int = 0
+    fetch_wall_sec: float = 0.0
+    fetch_serial_sec: float = 0.0  # sum of upstream fetch times, batch requests included (FetchClock)
+    states_written: int = 0
+    alerts_written: int = 0
+    dedup_hits: int = 0
+    dedup_misses: int = 0
+    partitions: int = 0  # shard partitions held this tick (0 == not sharded)
+    lease_lost: bool = False  # fenced flush refused: nothing written or sent
+    hedges: int = 0  # extra provider requests fired because the current one was slow
+    retries: int = 0  # extra provider requests after a failure
+    db_queries: int = 0
+    db_sec: float = 0.0
+    total_sec: float = 0.0
+
+    @property
+    def saved_sec(self) -> float:
+        return max(0.0, self.fetch_serial_sec - self.fetch_wall_sec)
+
 class Worker:
-    def __init__(self, db: Session):
-        self.repo = Repo(db)
+    # long-lived: providers (price cache, circuit breakers), incremental features, the
+    # alert dedup index and delivery queue survive between ticks; only the DB session is per tick
+    # session_factory: AsyncSessionLocal (DB I/O awaited) or a sync sessionmaker (blocking, scripts)
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession | Session] = AsyncSessionLocal,
+        shard: ShardCoordinator | None = None,
+    ):
+        self.session_factory = session_factory
+        # sharded: only assets in partitions leased to this worker are evaluated
+        self.shard = shard
         self.providers = ProviderAggregator()
-        self.notifier = TelegramNotifier()
+        self.features = FeatureEngine()
+        self.dedup = AlertDedupIndex()
+        # delivery runs in the background (run.py starts outbox.run()); ticks only enqueue
+        self.outbox = AlertQueue()
+        # last polled pricepoint per symbol (candle history for streamed prices)
+        self.last_pp: dict[str, PricePoint] = {}
+        self.assets: list[dict] = []  # enabled assets with holdings, as of the last tick
+        # polling ticks and streamed evaluations never interleave on the same state
+        self._lock = asyncio.Lock()
 
-    async def tick(self) -> None:
-        now_ts = int(time.time())
-        assets = self.repo.list_enabled_assets()
-
-        for a in assets:
-            asset_dict = {
-                "symbol": a.symbol,
-                "binance_symbol": a.binance_symbol,
-                "coinbase_product_id": a.coinbase_product_id,
-                "coingecko_id": a.coingecko_id,
-            }
-
-            holdings = self.repo.list_holdings(a.symbol)
-            if not holdings:
-                continue
+    async def tick(self) -> TickStats:
+        async with self._lock:
+            db = self.session_factory()
+            clock = DbClock()
+            token = db_clock.set(clock)
+            try:
+                with tracing.trace("tick", slow_sec=settings.slow_tick_sec):
+                    stats = await self._tick(AsyncRepo(db))
+            finally:
+                db_clock.reset(token)
+                await _close(db)
+            _record(stats, clock, "poll")
+            return stats
 
+    async def evaluate_prices(self, prices: dict[str, float]) -> TickStats:
+        # event-driven path (streaming): re-evaluate only these symbols with a fresh live
+        # price on top of the candles from the last poll
+        async with self._lock:
+            db = self.session_factory()
+            clock = DbClock()
+            token = db_clock.set(clock)
             try:
-                pp = await self.providers.get_pricepoint(asset_dict)
-                f = compute_features(pp.last, pp.ohlcv_close)
-            except Exception as e:
-                log.warning("price/features failed for %s: %s", a.symbol, e)
-                continue
+                with tracing.trace("stream_eval", slow_sec=settings.slow_tick_sec, symbols=len(prices)):
+                    stats = await self._evaluate_prices(AsyncRepo(db), prices)
+            finally:
+                db_clock.reset(token)
+                await _close(db)
+            _record(stats, clock, "stream")
+            return stats
 
-            s = self.repo.get_or_create_strategy(a.symbol)
-            ds = DStrategy(
-                base_tp=s.base_tp,
-                sl_pct=s.sl_pct,
-                trail_atr_mult=s.trail_atr_mult,
-                profit_lock_pct=s.profit_lock_pct,
-                cooldown_sec=s.cooldown_sec,
-                confirm_regime=s.confirm_regime,
+    async def _evaluate_prices(self, repo: AsyncRepo, prices: dict[str, float]) -> TickStats:
+        started = time.perf_counter()
+        now_ts = int(time.time())
+        stats = TickStats()
+        with tracing.span("prepare"):
+            snap = await repo.load_tick_snapshot(
+                symbols=list(prices),
+                owns=self.shard.owns if self.shard else None,
             )
+        stats.assets = len(snap.books)
+
+        results: list[Features | BaseException] = []
+        with tracing.span("features", assets=len(snap.books)):
+            for b in snap.books:
+                sym = b.asset["symbol"]
+                base = self.last_pp.get(sym)
+                if base is None:
+                    results.append(RuntimeError("no_candles_yet"))
+                    continue
+                pp = PricePoint(last=prices[sym], ohlcv_close=base.ohlcv_close, source=base.source, seq=base.seq)
+                results.append(self.features.update(sym, pp))
+
+        await self._decide_and_flush(repo, now_ts, snap, results, stats)
+        stats.total_sec = time.perf_counter() - started
+        return stats
+
+    async def _tick(self, repo: AsyncRepo) -> TickStats:
+        started = time.perf_counter()
+        now_ts = int(time.time())
+        stats = TickStats()
+
+        with tracing.span("prepare"):
+            if not self.dedup.warmed:
+                self.dedup.warm(await repo.recent_alert_keys(self.dedup.bucket(now_ts)), now_ts)
+
+            owns = None
+            if self.shard:
+                await self.shard.sync(repo, now_ts)
+                stats.partitions = len(self.shard.leases)
+                owns = self.shard.owns
+            snap = await repo.load_tick_snapshot(owns=owns)
+        stats.assets = len(snap.books)
+        self.assets = [b.asset for b in snap.books]
+
+        # phase 1: batched prices (one request per provider where possible) + features
+        clock = FetchClock()
+        budget = RetryBudget()
+        token = fetch_clock.set(clock)
+        budget_token = retry_budget.set(budget)
+        t_fetch = time.perf_counter()
+        try:
+            with tracing.span("fetch", assets=len(snap.books)):
+                pps = await self.providers.get_pricepoints([b.asset for b in snap.books])
+        finally:
+            retry_budget.reset(budget_token)
+            fetch_clock.reset(token)
+        stats.fetch_wall_sec = time.perf_counter() - t_fetch
+        stats.fetch_serial_sec = clock.busy_sec
+        stats.hedges = budget.hedges
+        stats.retries = budget.retries
+
+        results: list[Features | BaseException] = []
+        with tracing.span("features", assets=len(snap.books)):
+            for b in snap.books:
+                pp = pps.get(b.asset["symbol"])
+                try:
+                    if isinstance(pp, BaseException):
+                        raise pp
+                    if pp is None:
+                        raise RuntimeError("no_pricepoint")
+                    self.last_pp[b.asset["symbol"]] = pp
+                    results.append(self.features.update(b.asset["symbol"], pp))
+                except Exception as e:
+                    results.append(e)
+
+        await self._decide_and_flush(repo, now_ts, snap, results, stats)
+        stats.total_sec = time.perf_counter() - started
+        return stats
+
+    async def _decide_and_flush(
+        self,
+        repo: AsyncRepo,
+        now_ts: int,
+        snap: TickSnapshot,
+        results: list[Features | BaseException],
+        stats: TickStats,
+    ) -> None:
+        # phase 2: decide serially; changes are written at the end in one transaction and
+        # messages are only queued once it has committed
+        hits0, misses0 = self.dedup.hits, self.dedup.misses
+        dirty: dict[int, DState] = {}
+        alerts: list[PendingAlert] = []
+        with tracing.span("decide", assets=len(snap.books)):
+            for book, f in zip(snap.books, results):
+                if isinstance(f, BaseException):
+                    log.warning("price/features failed for %s: %r", book.asset["symbol"], f)
+                    stats.failed += 1
+                    continue
+                await self._evaluate(repo, now_ts, book, snap.states, f, dirty, alerts)
+
+        try:
+            with tracing.span("flush", states=len(dirty), alerts=len(alerts)):
+                inserted = await repo.flush_tick(dirty, alerts, fence=self.shard.fence(now_ts) if self.shard else None)
+        except LeaseLost as e:
+            # another worker owns (some of) these holdings now and evaluates them itself
+            log.warning("%s; dropping %d state(s) and %d alert(s)", e, len(dirty), len(alerts))
+            self.shard.forget()
+            stats.lease_lost = True
+            return
+        # only alerts whose row this flush inserted are sent: a conflict on uq_alert_dedup
+        # means someone already sent it (the key is in the table, so the index learns it too)
+        sent = 0
+        with tracing.span("enqueue", alerts=len(inserted)):
+            for a in alerts:
+                self.dedup.add(a.holding_id, a.kind, a.ts)
+                if (a.holding_id, str(a.kind), self.dedup.bucket(a.ts)) not in inserted:
+                    metrics.alerts_deduped.inc(str(a.kind))
+                    continue
+                self.outbox.put(a.message)
+                metrics.alerts_emitted.inc(str(a.kind))
+                sent += 1
+        stats.states_written = len(dirty)
+        stats.alerts_written = sent
+        stats.dedup_hits = self.dedup.hits - hits0
+        stats.dedup_misses = self.dedup.misses - misses0
+
+    async def _evaluate(
+        self,
+        repo: AsyncRepo,
+        now_ts: int,
+        book: AssetBook,
+        states: dict[int, DState],
+        f: Features,
+        dirty: dict[int, DState],
+        alerts: list[PendingAlert],
+    ) -> None:
+        holdings = book.holdings
+        sts = [states[h.id] for h in holdings]
+        res = decide_batch(
+            now_ts, book.asset["symbol"], book.strategy, f,
+            entry=np.fromiter((h.entry for h in holdings), dtype=np.float64, count=len(holdings)),
+            trailing_active=np.fromiter((st.trailing_active for st in sts), dtype=bool, count=len(sts)),
+            trailing_anchor=np.fromiter(
+                (np.nan if st.trailing_anchor is None else st.trailing_anchor for st in sts),
+                dtype=np.float64, count=len(sts),
+            ),
+            last_alert_ts=np.fromiter((st.last_alert_ts or 0 for st in sts), dtype=np.int64, count=len(sts)),
+        )
+
+        # messages are only formatted for signals that fired
+        alerted: set[int] = set()
+        for j in range(len(res)):
+            i = int(res.index[j])
+            h, kind = holdings[i], res.kind(j)
+            seen = self.dedup.seen(h.id, kind, now_ts)
+            if seen is None:
+                seen = not await repo.should_send_alert(h.id, kind, now_ts)
+            if seen:
+                metrics.alerts_deduped.inc(str(kind))
+                continue
+            alerts.append(PendingAlert(holding_id=h.id, kind=kind, message=res.message(j), ts=now_ts))
+            alerted.add(i)
+
+        # only rows whose state actually changed are written back (an alerted row too:
+        # flush_tick sets its last_alert_ts if the alert is actually inserted)
+        for i, (h, st) in enumerate(zip(holdings, sts)):
+            anchor = float(res.trailing_anchor[i])
+            active = bool(res.trailing_active[i])
+            anchor_v = None if isnan(anchor) else anchor
+            if i in alerted or active != st.trailing_active or anchor_v != st.trailing_anchor:
+                st.trailing_active = active
+                st.trailing_anchor = anchor_v
+                dirty[h.id] = st
+
+def _record(stats: TickStats, clock: DbClock, mode: str) -> None:
+    stats.db_queries = clock.queries
+    stats.db_sec = clock.busy_sec
+    metrics.tick_seconds.observe(stats.total_sec, mode)
+    metrics.tick_phase_seconds.observe(stats.db_sec, mode, "db")
+    if mode == "poll":
+        metrics.tick_phase_seconds.observe(stats.fetch_wall_sec, mode, "fetch")
+    metrics.tick_db_queries.observe(stats.db_queries, mode)
+    metrics.tick_assets.set(stats.assets, mode)
+    if stats.failed:
+        metrics.tick_failed.inc(mode, n=stats.failed)
+    if stats.lease_lost:
+        metrics.tick_lease_lost.inc()
+    if stats.hedges:
+        metrics.provider_extra.inc("hedge", n=stats.hedges)
+    if stats.retries:
+        metrics.provider_extra.inc("retry", n=stats.retries)
 
-            for h in holdings:
-                st = self.repo.load_state(h.id)
-                dst = DState(
-                    trailing_active=st.trailing_active,
-                    trailing_anchor=st.trailing_anchor,
-                    last_alert_ts=st.last_alert_ts,
-                )
-
-                dh = DHolding(id=h.id, symbol=h.symbol, entry=h.entry, invested_amount=h.invested_amount)
-
-                signals = decide(now_ts, dh, ds, f, dst)
-
-                for sig in signals:
-                    if self.repo.should_send_alert(h.id, sig.kind, now_ts):
-                        await self.notifier.send(sig.message)
-                        self.repo.record_alert(h.id, sig.kind, sig.message, now_ts)
-                        dst.last_alert_ts = now_ts
-
-                # persist state back
-                st.trailing_active = dst.trailing_active
-                st.trailing_anchor = dst.trailing_anchor
-                st.last_alert_ts = dst.last_alert_ts
-                self.repo.save_state(st)
+async def _close(db: AsyncSession | Session) -> None:
+    res = db.close()
+    if inspect.isawaitable(res):
+        await res
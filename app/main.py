@@ -1,21 +1,59 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from app.observability.logging import configure_logging
-from app.persistence.db import init_db
+from app.observability import metrics
+from app.persistence.db import init_db, dispose_async_engine
 
 from app.api.routes_health import router as health_router
 from app.api.routes_assets import router as assets_router
 from app.api.routes_holdings import router as holdings_router
 from app.api.routes_strategies import router as strategies_router
+from app.api.routes_backtest import router as backtest_router
 
 def create_app() -> FastAPI:
     configure_logging()
     init_db()
 
-    app = FastAPI(title="Price Alert Engine", version="0.1.0")
+    app = FastAPI(title="Price Alert Engine", version="0.1.0", lifespan=_lifespan)
+    app.middleware("http")(_observe_request)
     app.include_router(health_router)
     app.include_router(assets_router, prefix="/assets", tags=["assets"])
     app.include_router(holdings_router, prefix="/holdings", tags=["holdings"])
     app.include_router(strategies_router, prefix="/strategies", tags=["strategies"])
+    app.include_router(backtest_router, prefix="/backtest", tags=["backtest"])
     return app
 
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    yield
+    await dispose_async_engine()
+
+_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+async def _observe_request(request: Request, call_next):
+    # labelled by route template (/strategies/{symbol}), never by the raw path
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        path = _route_template(request)
+        method = request.method if request.method in _METHODS else "OTHER"
+        metrics.http_requests.inc(method, path, str(status))
+        metrics.http_seconds.observe(time.perf_counter() - t0, method, path)
+
+def _route_template(request: Request) -> str:
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # depending on the FastAPI version the matched route's path may lack the include_router
+    # prefix; prefixes are static, so take them from the request path
+    tpl = [p for p in route.path.split("/") if p]
+    raw = [p for p in request.url.path.split("/") if p]
+    return "/" + "/".join(raw[: max(0, len(raw) - len(tpl))] + tpl)
+
 app = create_app()
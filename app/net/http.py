@@ -0,0 +1,46 @@
+import logging
+from urllib.parse import urlsplit
+
+import httpx
+from app.settings import settings
+
+log = logging.getLogger("http")
+
+# one long-lived client per upstream host (keep-alive + pooled connections)
+_clients: dict[str, httpx.AsyncClient] = {}
+
+def _http2_enabled() -> bool:
+    if not settings.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        log.warning("HTTP2 enabled but 'h2' is not installed; using HTTP/1.1")
+        return False
+    return True
+
+def get_client(base_url: str, headers: dict | None = None) -> httpx.AsyncClient:
+    host = urlsplit(base_url).netloc
+    client = _clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.http_timeout_sec),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive,
+                keepalive_expiry=settings.http_keepalive_expiry_sec,
+            ),
+            http2=_http2_enabled(),
+            headers=headers,
+        )
+        _clients[host] = client
+    return client
+
+async def close_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for c in clients:
+        try:
+            await c.aclose()
+        except Exception as e:
+            log.warning("closing http client failed: %s", e)
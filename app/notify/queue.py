@@ -0,0 +1,231 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+
+from app.settings import settings
+from app.notify.telegram import TelegramNotifier, TelegramRateLimited
+from app.observability import metrics, tracing
+
+log = logging.getLogger("notify")
+
+TELEGRAM_MAX_CHARS = 4096
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def delay(self) -> float:
+        # seconds until a token is available (0 == now)
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._paused_until - now)
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1.0
+
+    def pause(self, seconds: float) -> None:
+        # server said slow down (retry_after): empty the bucket and hold it closed
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self._paused_until = max(self._paused_until, now + seconds)
+
+@dataclass
+class Outgoing:
+    chat_id: str
+    text: str
+    enqueued_at: float  # monotonic
+    attempts: int = 0
+
+@dataclass
+class DeliveryStats:
+    enqueued: int = 0
+    sent: int = 0  # Telegram messages (a digest counts once)
+    delivered: int = 0  # alerts (a digest counts every alert in it)
+    digests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    dropped: int = 0
+    latency_last_sec: float = 0.0
+    latency_max_sec: float = 0.0
+    latency_sum_sec: float = 0.0  # over `delivered`
+
+    @property
+    def latency_avg_sec(self) -> float:
+        return self.latency_sum_sec / self.delivered if self.delivered else 0.0
+
+class AlertQueue:
+    # Decouples alert delivery from the tick: put() never awaits the network; run() drains
+    # per chat through a global and a per-chat token bucket, honours 429 retry_after and
+    # folds a backed-up chat into digest messages instead of sending one by one.
+    def __init__(self, notifier: TelegramNotifier | None = None):
+        self.notifier = notifier or TelegramNotifier()
+        self.stats = DeliveryStats()
+        self._chats: dict[str, deque[Outgoing]] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._global = TokenBucket(settings.notify_rate_per_sec, settings.notify_burst)
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._chats.values())
+
+    def put(self, text: str, chat_id: str | None = None) -> None:
+        if not self.notifier.enabled:
+            return
+        chat = chat_id or self.notifier.chat_id
+        q = self._chats.setdefault(chat, deque())
+        if self.depth >= settings.notify_queue_max:
+            # bounded: shed the oldest alert of this chat rather than grow without limit
+            (q or max(self._chats.values(), key=len)).popleft()
+            self.stats.dropped += 1
+            metrics.notify_messages.inc("dropped")
+        q.append(Outgoing(chat_id=chat, text=text, enqueued_at=time.monotonic()))
+        self.stats.enqueued += 1
+        self._idle.clear()
+        self._wake.set()
+
+    async def join(self, timeout: float | None = None) -> bool:
+        # waits until everything queued so far was delivered or dropped
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self) -> None:
+        while True:
+            batch = self._next()
+            if batch is None:
+                self._idle.set()
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if isinstance(batch, float):
+                await self._sleep(batch)
+                continue
+            with tracing.trace("notify.deliver", slow_sec=settings.slow_tick_sec, alerts=len(batch)):
+                await self._deliver(batch)
+
+    def _bucket(self, chat: str) -> TokenBucket:
+        b = self._buckets.get(chat)
+        if b is None:
+            b = self._buckets[chat] = TokenBucket(settings.notify_chat_rate_per_sec, settings.notify_chat_burst)
+        return b
+
+    def _next(self) -> list[Outgoing] | float | None:
+        # the chat that can send soonest (oldest head on ties); a float means "sleep that long"
+        best, best_key = None, None
+        for chat, q in self._chats.items():
+            if not q:
+                continue
+            key = (max(self._bucket(chat).delay(), self._global.delay()), q[0].enqueued_at)
+            if best_key is None or key < best_key:
+                best, best_key = chat, key
+        if best is None:
+            return None
+        if best_key[0] > 0:
+            return best_key[0]
+
+        q = self._chats[best]
+        if len(q) < settings.notify_digest_threshold:
+            return [q.popleft()]
+        batch: list[Outgoing] = []
+        size = 0
+        while q and len(batch) < settings.notify_digest_max:
+            size += len(q[0].text) + 2
+            if batch and size > TELEGRAM_MAX_CHARS - 64:
+                break
+            batch.append(q.popleft())
+        return batch
+
+    async def _sleep(self, seconds: float) -> None:
+        # new alerts don't shorten a rate-limit wait, they only end an idle one
+        await asyncio.sleep(min(seconds, 60.0))
+
+    async def _deliver(self, batch: list[Outgoing]) -> None:
+        chat = batch[0].chat_id
+        if len(batch) == 1:
+            text = batch[0].text
+        else:
+            text = f"Resumen: {len(batch)} alertas\n\n" + "\n\n".join(o.text for o in batch)
+
+        self._global.take()
+        self._bucket(chat).take()
+        t0 = time.perf_counter()
+        try:
+            await self.notifier.send(text[:TELEGRAM_MAX_CHARS], chat_id=chat)
+        except TelegramRateLimited as e:
+            metrics.notify_send_seconds.observe(time.perf_counter() - t0, "rate_limited")
+            metrics.notify_messages.inc("rate_limited", n=len(batch))
+            self.stats.rate_limited += 1
+            log.warning("telegram 429 for chat %s, pausing %.1fs", chat, e.retry_after)
+            self._bucket(chat).pause(e.retry_after)
+            self._requeue(batch, count_attempt=False)
+            return
+        except httpx.HTTPStatusError as e:
+            metrics.notify_send_seconds.observe(time.perf_counter() - t0, "error")
+            if e.response.status_code < 500:
+                # bad chat id / message: retrying won't help
+                log.error("telegram rejected %d alert(s) for chat %s: %s", len(batch), chat, e)
+                self.stats.dropped += len(batch)
+                metrics.notify_messages.inc("dropped", n=len(batch))
+                return
+            self._retry(batch, e)
+            return
+        except Exception as e:
+            metrics.notify_send_seconds.observe(time.perf_counter() - t0, "error")
+            self._retry(batch, e)
+            return
+
+        metrics.notify_send_seconds.observe(time.perf_counter() - t0, "ok")
+        metrics.notify_messages.inc("delivered", n=len(batch))
+        now = time.monotonic()
+        self.stats.sent += 1
+        self.stats.delivered += len(batch)
+        if len(batch) > 1:
+            self.stats.digests += 1
+        for o in batch:
+            lat = now - o.enqueued_at
+            metrics.notify_latency_seconds.observe(lat)
+            self.stats.latency_sum_sec += lat
+            self.stats.latency_max_sec = max(self.stats.latency_max_sec, lat)
+        self.stats.latency_last_sec = now - batch[0].enqueued_at
+
+    def _retry(self, batch: list[Outgoing], e: Exception) -> None:
+        attempts = batch[0].attempts + 1
+        if attempts >= settings.notify_max_attempts:
+            log.error("giving up on %d alert(s) after %d attempts: %r", len(batch), attempts, e)
+            self.stats.dropped += len(batch)
+            metrics.notify_messages.inc("dropped", n=len(batch))
+            return
+        self.stats.retries += 1
+        metrics.notify_messages.inc("retried", n=len(batch))
+        log.warning("telegram send failed (attempt %d): %r", attempts, e)
+        self._bucket(batch[0].chat_id).pause(0.5 * 2 ** attempts)
+        self._requeue(batch)
+
+    def _requeue(self, batch: list[Outgoing], count_attempt: bool = True) -> None:
+        q = self._chats.setdefault(batch[0].chat_id, deque())
+        for o in reversed(batch):
+            if count_attempt:
+                o.attempts += 1
+            q.appendleft(o)
@@ -1,5 +1,14 @@
 import httpx
+
 from app.settings import settings
+from app.net.http import get_client
+from app.observability.tracing import traced
+
+class TelegramRateLimited(RuntimeError):
+    # 429 from the Bot API; retry_after comes from the response (parameters.retry_after)
+    def __init__(self, retry_after: float):
+        super().__init__(f"telegram rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
 
 class TelegramNotifier:
     def __init__(self):
@@ -7,17 +16,33 @@ class TelegramNotifier:
         self.chat_id = settings.telegram_chat_id
         self.base_url = f"https://api.telegram.org/bot{self.token}"
 
-    async def send(self, text: str) -> None:
-        if not self.token or not self.chat_id:
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    @traced("telegram.send")
+    async def send(self, text: str, chat_id: str | None = None) -> None:
+        if not self.enabled:
             return
-        timeout = httpx.Timeout(settings.http_timeout_sec)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            r = await client.post(
-                f"{self.base_url}/sendMessage",
-                json={
-                    "chat_id": self.chat_id,
-                    "text": text,
-                    "disable_web_page_preview": True,
-                },
-            )
-            r.raise_for_status()
+        client = get_client(self.base_url)
+        r = await client.post(
+            f"{self.base_url}/sendMessage",
+            json={
+                "chat_id": chat_id or self.chat_id,
+                "text": text,
+                "disable_web_page_preview": True,
+            },
+        )
+        if r.status_code == 429:
+            raise TelegramRateLimited(_retry_after(r))
+        r.raise_for_status()
+
+def _retry_after(r: httpx.Response) -> float:
+    try:
+        return float(r.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(r.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
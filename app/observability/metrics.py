@@ -0,0 +1,230 @@
+import bisect
+import logging
+import math
+import threading
+from typing import Callable
+
+from app.settings import settings
+
+log = logging.getLogger("observability")
+
+# Prometheus text exposition (0.0.4), no client library needed. Metrics are process-wide
+# (like providers.health.registry) and every label is a small closed set (provider, kind,
+# phase, route template, ...) -- never a symbol or holding id. As a backstop, a metric
+# that reaches METRICS_MAX_SERIES label combinations folds new ones into "_other".
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds: sub-millisecond DB queries up to slow upstream calls and ticks
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._series: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()  # API handlers run in a threadpool
+        self._overflowed = False
+
+    def _key(self, values: tuple) -> tuple[str, ...]:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values!r}")
+        key = tuple(str(v) for v in values)
+        if key not in self._series and len(self._series) >= settings.metrics_max_series:
+            if not self._overflowed:
+                self._overflowed = True
+                log.warning("metric %s reached %d series; folding new labels into _other", self.name, len(self._series))
+            key = ("_other",) * len(key)
+        return key
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._series.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, n: float = 1.0) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + n
+
+    def value(self, *labels: str) -> float:
+        return self._series.get(tuple(labels), 0.0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._fn: Callable[[], float | dict[tuple[str, ...], float]] | None = None
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._series[self._key(labels)] = float(value)
+
+    def set_function(self, fn: Callable[[], float | dict[tuple[str, ...], float]]) -> None:
+        # read at scrape time (queue depth, breaker state, ...): a number, or {labels: number}
+        self._fn = fn
+
+    def render(self) -> list[str]:
+        if self._fn is None:
+            return super().render()
+        try:
+            got = self._fn()
+        except Exception as e:
+            log.debug("gauge %s callback failed: %r", self.name, e)
+            return self._header()
+        if not isinstance(got, dict):
+            got = {(): got}
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in got.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]  # per-bucket, sum, count
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()]
+        out = self._header()
+        for key, (counts, total, count) in items:
+            acc = 0
+            for le, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                le_label = 'le="' + _fmt(le) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return out
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _add(self, m: _Metric):
+        if m.name in self._metrics:
+            raise ValueError(f"metric {m.name} already registered")
+        self._metrics[m.name] = m
+        return m
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# -------- worker ticks (mode: poll | stream) --------
+tick_seconds = registry.histogram("worker_tick_duration_seconds", "Wall time of one worker tick.", ("mode",))
+tick_phase_seconds = registry.histogram(
+    "worker_tick_phase_seconds", "Wall time of one tick phase (fetch, db).", ("mode", "phase"),
+)
+tick_assets = registry.gauge("worker_tick_assets", "Assets evaluated by the last tick.", ("mode",))
+tick_failed = registry.counter("worker_tick_failed_assets_total", "Assets whose price/features failed.", ("mode",))
+tick_db_queries = registry.histogram(
+    "worker_tick_db_queries", "DB statements executed per tick.", ("mode",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000),
+)
+tick_lease_lost = registry.counter("worker_tick_lease_lost_total", "Ticks whose fenced flush was refused (sharding).")
+
+# -------- providers (provider: BINANCE | COINBASE | COINGECKO) --------
+provider_seconds = registry.histogram(
+    "provider_request_duration_seconds", "Latency of successful upstream price requests.", ("provider",),
+)
+provider_requests = registry.counter(
+    "provider_requests_total", "Upstream price requests by outcome (ok, error, cancelled).", ("provider", "outcome"),
+)
+provider_extra = registry.counter(
+    "provider_extra_requests_total", "Requests beyond the first per symbol (hedge, retry).", ("reason",),
+)
+provider_breaker_open = registry.gauge("provider_circuit_open", "1 while the provider's circuit breaker is open.", ("provider",))
+price_cache = registry.counter("price_cache_lookups_total", "Price cache lookups (hit, miss).", ("result",))
+price_cache_ratio = registry.gauge("price_cache_hit_ratio", "Price cache hits / lookups since start.")
+price_cache_ratio.set_function(
+    lambda: price_cache.value("hit") / max(1.0, price_cache.value("hit") + price_cache.value("miss"))
+)
+
+# -------- database (op: SELECT | INSERT | UPDATE | DELETE | OTHER) --------
+db_queries = registry.counter("db_queries_total", "DB statements executed.", ("op",))
+db_query_seconds = registry.histogram("db_query_duration_seconds", "DB statement execution time.", ("op",))
+
+# -------- alerts (kind: SignalKind) --------
+alerts_emitted = registry.counter("alerts_emitted_total", "Alerts persisted and queued for delivery.", ("kind",))
+alerts_deduped = registry.counter("alerts_deduped_total", "Signals dropped because the alert was already sent.", ("kind",))
+alert_partitions_pruned = registry.counter(
+    "alert_partitions_pruned_total", "Alert partitions removed by retention (mode: drop, archive).", ("mode",),
+)
+
+# -------- notifier --------
+notify_send_seconds = registry.histogram("notify_send_duration_seconds", "Telegram sendMessage call time.", ("outcome",))
+notify_latency_seconds = registry.histogram(
+    "notify_delivery_latency_seconds", "Time from enqueue to delivery per alert.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+notify_messages = registry.counter(
+    "notify_alerts_total", "Alerts by delivery outcome (delivered, retried, rate_limited, dropped).", ("outcome",),
+)
+notify_queue_depth = registry.gauge("notify_queue_depth", "Alerts waiting in the delivery queue.")
+
+# -------- API (route: matched path template, never the raw path) --------
+http_requests = registry.counter("http_requests_total", "API requests.", ("method", "route", "status"))
+http_seconds = registry.histogram("http_request_duration_seconds", "API request handling time.", ("method", "route"))
+
+# -------- API response cache (resource: assets | holdings | strategies) --------
+api_cache = registry.counter("api_cache_lookups_total", "API response cache lookups (hit, miss).", ("resource", "result"))
+api_cache_ratio = registry.gauge("api_cache_hit_ratio", "API response cache hits / lookups since start.", ("resource",))
+api_cache_ratio.set_function(
+    lambda: {
+        (r,): api_cache.value(r, "hit") / max(1.0, api_cache.value(r, "hit") + api_cache.value(r, "miss"))
+        for r in ("assets", "holdings", "strategies")
+    }
+)
+api_not_modified = registry.counter(
+    "api_not_modified_total", "GETs answered 304 Not Modified (If-None-Match matched).", ("resource",),
+)
@@ -0,0 +1,100 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from app.settings import settings
+
+log = logging.getLogger("profiler")
+
+class SamplingProfiler:
+    # Samples one thread's Python stack every `interval_sec` from a helper thread and counts
+    # identical stacks. Output is the "collapsed stacks" format (frame;frame;frame count)
+    # that flamegraph.pl, speedscope and inferno read directly.
+    def __init__(self, interval_sec: float, thread_id: int | None = None):
+        self.interval_sec = interval_sec
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as fh:
+            for stack, n in self.stacks.most_common():
+                fh.write(f"{stack} {n}\n")
+
+class TickProfiler:
+    # Admin toggle: arm(n) profiles the next n worker ticks (samples only while a tick runs)
+    # and writes one collapsed-stacks file to PROFILE_DIR when they are done. Armed at
+    # startup by PROFILE_TICKS and at runtime by SIGUSR1 (see engine/run.py).
+    def __init__(self):
+        self.remaining = 0
+        self.ticks = 0
+        self._prof: SamplingProfiler | None = None
+
+    @property
+    def armed(self) -> bool:
+        return self.remaining > 0
+
+    def arm(self, ticks: int) -> None:
+        if ticks <= 0:
+            return
+        self.remaining = ticks
+        log.info("profiling the next %d tick(s) every %.1fms", ticks, settings.profile_interval_ms)
+
+    def __enter__(self) -> "TickProfiler":
+        if self.remaining > 0:
+            if self._prof is None:
+                self._prof = SamplingProfiler(settings.profile_interval_ms / 1000)
+                self.ticks = 0
+            self._prof.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._prof is None:
+            return
+        self._prof.stop()
+        self.ticks += 1
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self._dump()
+
+    def _dump(self) -> None:
+        prof, self._prof = self._prof, None
+        try:
+            os.makedirs(settings.profile_dir, exist_ok=True)
+            path = os.path.join(settings.profile_dir, f"worker-{int(time.time())}-{self.ticks}ticks.collapsed")
+            prof.write(path)
+            log.info("profile of %d tick(s) (%d samples) written to %s", self.ticks, prof.samples, path)
+        except OSError as e:
+            log.error("could not write profile: %s", e)
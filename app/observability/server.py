@@ -0,0 +1,58 @@
+import asyncio
+import json
+import logging
+from typing import Callable
+
+log = logging.getLogger("observability")
+
+# path -> () -> (content type, body); read-only views, so GET only
+Route = Callable[[], tuple[str, bytes]]
+
+def json_route(view: Callable[[], dict]) -> Route:
+    return lambda: ("application/json", json.dumps(view(), separators=(",", ":")).encode())
+
+class StatusServer:
+    # Tiny HTTP/1.1 listener for the worker process (it has no web framework): serves
+    # scrapeable status views without pulling FastAPI/uvicorn into the worker loop.
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.routes: dict[str, Route] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    def add(self, path: str, route: Route) -> None:
+        self.routes[path] = route
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info("status server listening on %s:%d (%s)", self.host, self.port, ", ".join(self.routes))
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass  # headers are not needed
+            parts = line.decode("latin-1").split()
+            method, path = (parts[0], parts[1].split("?", 1)[0]) if len(parts) >= 2 else ("", "")
+            route = self.routes.get(path)
+            if method != "GET":
+                status, ctype, body = "405 Method Not Allowed", "text/plain", b"method not allowed\n"
+            elif route is None:
+                status, ctype, body = "404 Not Found", "text/plain", b"not found\n"
+            else:
+                status = "200 OK"
+                ctype, body = route()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            log.debug("status request failed: %r", e)
+        finally:
+            writer.close()
@@ -0,0 +1,159 @@
+import functools
+import inspect
+import logging
+import time
+from contextvars import ContextVar
+
+from app.settings import settings
+
+log = logging.getLogger("tracing")
+
+# In-process span trees for one unit of work (a worker tick, a delivery). Spans only exist
+# under an active trace(); elsewhere span()/traced() cost one contextvar lookup. Nothing is
+# exported: a trace that ran longer than its threshold is logged as an aggregated tree
+# (same-named siblings folded into one line, e.g. 1000 x features.update).
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "error", "root")
+
+    def __init__(self, name: str, attrs: dict, root: "Span | None"):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: list[Span] = []
+        self.error: str | None = None
+        self.root = root or self
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+class _Root(Span):
+    __slots__ = ("count", "dropped")
+
+    def __init__(self, name: str, attrs: dict):
+        super().__init__(name, attrs, None)
+        self.count = 1
+        self.dropped = 0
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+def current() -> Span | None:
+    return _current.get()
+
+class span:
+    # child of the current span; a no-op outside a trace or past TRACE_MAX_SPANS
+    __slots__ = ("name", "attrs", "span", "_token")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.span: Span | None = None
+        self._token = None
+
+    def __enter__(self) -> Span | None:
+        parent = _current.get()
+        if parent is None:
+            return None
+        root = parent.root
+        if root.count >= settings.trace_max_spans:
+            root.dropped += 1
+            return None
+        root.count += 1
+        s = self.span = Span(self.name, self.attrs, root)
+        parent.children.append(s)
+        self._token = _current.set(s)
+        return s
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        s = self.span
+        if s is None:
+            return
+        s.end = time.perf_counter()
+        if exc_type is not None:
+            s.error = exc_type.__name__
+        _current.reset(self._token)
+
+class trace:
+    # root of a span tree; logs the tree when it took >= slow_sec (0/None: never)
+    def __init__(self, name: str, slow_sec: float | None = None, **attrs):
+        self.name = name
+        self.slow_sec = slow_sec
+        self.attrs = attrs
+        self.root: _Root | None = None
+        self._token = None
+
+    def __enter__(self) -> _Root | None:
+        if not settings.tracing:
+            return None
+        self.root = _Root(self.name, self.attrs)
+        self._token = _current.set(self.root)
+        return self.root
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        root = self.root
+        if root is None:
+            return
+        root.end = time.perf_counter()
+        if exc_type is not None:
+            root.error = exc_type.__name__
+        _current.reset(self._token)
+        if self.slow_sec and root.duration >= self.slow_sec:
+            log.warning(
+                "slow %s: %.2fs (threshold %.2fs)\n%s", self.name, root.duration, self.slow_sec, render(root),
+            )
+
+def traced(name: str | None = None):
+    # decorator: the call is a span (sync or async); name defaults to Class.method
+    def wrap(fn):
+        label = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with span(label):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+def render(root: Span) -> str:
+    lines: list[str] = []
+    _render([root], 0, lines)
+    if isinstance(root, _Root) and root.dropped:
+        lines.append(f"  ... {root.dropped} span(s) not recorded (TRACE_MAX_SPANS={settings.trace_max_spans})")
+    return "\n".join(lines)
+
+def _ms(sec: float) -> str:
+    return f"{sec * 1000:.1f}ms"
+
+def _render(group: list[Span], depth: int, lines: list[str]) -> None:
+    pad = "  " * depth
+    first = group[0]
+    errors = sum(1 for s in group if s.error)
+    if len(group) == 1:
+        attrs = " ".join(f"{k}={v}" for k, v in first.attrs.items())
+        err = f" error={first.error}" if first.error else ""
+        lines.append(f"{pad}{first.name} {_ms(first.duration)}{' ' + attrs if attrs else ''}{err}")
+    else:
+        total = sum(s.duration for s in group)
+        wall = max(s.start + s.duration for s in group) - min(s.start for s in group)
+        longest = max(s.duration for s in group)
+        err = f" errors={errors}" if errors else ""
+        lines.append(
+            f"{pad}{first.name} x{len(group)} sum={_ms(total)} wall={_ms(wall)} max={_ms(longest)}{err}"
+        )
+    # children of every span in the group, folded by name in first-seen order
+    by_name: dict[str, list[Span]] = {}
+    for s in group:
+        for c in s.children:
+            by_name.setdefault(c.name, []).append(c)
+    for children in by_name.values():
+        _render(children, depth + 1, lines)
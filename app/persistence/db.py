@@ -1,6 +1,12 @@
-from sqlalchemy import create_engine
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.settings import settings
+from app.observability import metrics
 
 class Base(DeclarativeBase):
     pass
@@ -12,7 +18,89 @@ _engine = create_engine(
 
 SessionLocal = sessionmaker(bind=_engine, autoflush=False, autocommit=False)
 
+def async_url(url: str) -> URL:
+    # same database through an async driver: psycopg (3) async for Postgres, aiosqlite locally
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        return u.set(drivername="postgresql+psycopg")
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    return u
+
+# Async engine for the worker and the API routes; SessionLocal stays for scripts and
+# anything sync. Created on first use so sync-only callers never import the async drivers.
+# expire_on_commit=False: attributes of committed rows are read after the await, where a
+# lazy reload is not possible.
+_async_engine: AsyncEngine | None = None
+_async_sessions: async_sessionmaker[AsyncSession] | None = None
+
+def async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.async_database_url or async_url(settings.database_url),
+            pool_pre_ping=True,
+        )
+    return _async_engine
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_sessions
+    if _async_sessions is None:
+        _async_sessions = async_sessionmaker(bind=async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_sessions()
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessions
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = _async_sessions = None
+
 def init_db() -> None:
+    create_schema(_engine)
+
+def create_schema(engine: Engine) -> None:
     # Import models to register metadata
     from app.domain import models  # noqa: F401
-    Base.metadata.create_all(bind=_engine)
+    from app.persistence import partitions
+
+    now_ts = int(time.time())
+    with engine.begin() as conn:
+        partitions.lock_schema(conn)
+        legacy = partitions.retire_legacy(conn)
+        Base.metadata.create_all(bind=conn, tables=partitions.tables_to_create(conn, Base.metadata))
+        created = partitions.ensure(conn, partitions.upcoming(now_ts))
+        if legacy:
+            created += partitions.adopt_legacy(conn, now_ts)
+    partitions.committed(conn, created)
+
+class DbClock:
+    # statements executed (and time spent in them) by whoever set it, e.g. one worker tick
+    def __init__(self):
+        self.queries = 0
+        self.busy_sec = 0.0
+
+db_clock: ContextVar[DbClock | None] = ContextVar("db_clock", default=None)
+
+_OPS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+# every engine (the app's and any other, e.g. bench/) reports to /metrics
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_t0 = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_end(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_metrics_t0", None)
+    if t0 is None:
+        return
+    dt = time.perf_counter() - t0
+    op = statement.lstrip()[:6].upper()
+    op = op if op in _OPS else "OTHER"
+    metrics.db_queries.inc(op)
+    metrics.db_query_seconds.observe(dt, op)
+    clock = db_clock.get()
+    if clock is not None:
+        clock.queries += 1
+        clock.busy_sec += dt
@@ -0,0 +1,219 @@
+import logging
+from typing import Iterable
+
+from sqlalchemy import (
+    Column, Connection, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, UniqueConstraint, func, text,
+)
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.settings import settings
+from app.domain.models import Alert, Holding
+from app.observability import metrics
+
+log = logging.getLogger("partitions")
+
+# `alerts` is split by bucket range into partitions of ALERT_PARTITION_SEC (a day by default),
+# alerts_p<start> holding buckets [start, start + period):
+#  - Postgres: native partitioning. `alerts` is PARTITION BY RANGE (bucket) and every query
+#    goes through it (the planner skips partitions outside the bucket range asked for).
+#  - SQLite has no partitioning: each period is a table of its own with the same columns and
+#    dedup key, and Repo picks the table(s) from the bucket (rotation). There is no `alerts`.
+# The dedup key (holding_id, kind, bucket) contains the partition key, so a key lives in
+# exactly one partition and ON CONFLICT DO NOTHING stays the authoritative dedup. Retention
+# removes whole partitions (DROP, or detach + rename with ALERT_RETENTION_MODE=archive) and
+# never one that overlaps the live window (the current and previous bucket).
+
+PREFIX = "alerts_p"
+ARCHIVE_PREFIX = "alerts_archive_p"
+LEGACY = "alerts_legacy"
+
+# partitions known to exist, per database (the bench opens several in one process)
+_known: dict[tuple, set[int]] = {}
+
+def _db_key(conn: Connection) -> tuple:
+    u = conn.engine.url
+    return (conn.dialect.name, u.host, u.port, u.database)
+
+def _partitioned(conn: Connection) -> bool:
+    return conn.dialect.name in ("postgresql", "sqlite")
+
+def start_of(bucket: int) -> int:
+    return bucket - bucket % settings.alert_partition_sec
+
+def name_of(start: int) -> str:
+    return f"{PREFIX}{start}"
+
+# -------- SQLite tables (one per period) --------
+_sqlite_meta = MetaData()
+Holding.__table__.to_metadata(_sqlite_meta)  # only so the partitions' FK resolves; never created from here
+
+def _sqlite_table(start: int) -> Table:
+    name = name_of(start)
+    t = _sqlite_meta.tables.get(name)
+    if t is None:
+        t = Table(
+            name,
+            _sqlite_meta,
+            Column("id", Integer, primary_key=True),
+            Column("holding_id", Integer, ForeignKey("holdings.id", ondelete="CASCADE"), nullable=False, index=True),
+            Column("kind", String(64), nullable=False),
+            Column("bucket", Integer, nullable=False, index=True),
+            Column("message", Text, nullable=False),
+            Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+            UniqueConstraint("holding_id", "kind", "bucket"),
+        )
+    return t
+
+def table_for(conn: Connection, bucket: int) -> Table:
+    # where alerts of `bucket` are read and written (ensure() it before writing)
+    if conn.dialect.name == "sqlite":
+        return _sqlite_table(start_of(bucket))
+    return Alert.__table__
+
+def present(conn: Connection, bucket: int) -> bool:
+    # whether alerts of `bucket` have a table to read from (the Postgres parent always does:
+    # a bucket without a partition just has no rows)
+    if conn.dialect.name != "sqlite":
+        return True
+    start = start_of(bucket)
+    if start in _known.get(_db_key(conn), ()):
+        return True
+    q = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name")
+    return conn.execute(q, {"name": name_of(start)}).first() is not None
+
+def tables_since(conn: Connection, bucket: int) -> list[Table]:
+    # tables holding buckets >= bucket
+    if conn.dialect.name == "sqlite":
+        first = start_of(bucket)
+        return [_sqlite_table(s) for s in existing(conn) if s >= first]
+    return [Alert.__table__]
+
+def existing(conn: Connection) -> list[int]:
+    # starts of the live partitions, ascending
+    if conn.dialect.name == "postgresql":
+        q = "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'alerts'::regclass"
+    elif conn.dialect.name == "sqlite":
+        q = "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'alerts_p[0-9]*'"
+    else:
+        return []
+    starts = (r[0][len(PREFIX):] for r in conn.execute(text(q)))
+    return sorted(int(s) for s in starts if s.isdigit())
+
+def missing(conn: Connection, buckets: Iterable[int]) -> list[int]:
+    # partition starts for these buckets not created yet (as far as this process knows)
+    if not _partitioned(conn):
+        return []
+    known = _known.get(_db_key(conn), set())
+    return sorted({start_of(b) for b in buckets} - known)
+
+def ensure(conn: Connection, starts: Iterable[int]) -> list[int]:
+    # CREATE ... IF NOT EXISTS for each start; call committed() once the transaction commits
+    done = []
+    for s in sorted(set(starts)):
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name_of(s)} PARTITION OF alerts "
+                f"FOR VALUES FROM ({s}) TO ({s + settings.alert_partition_sec})"
+            ))
+        elif conn.dialect.name == "sqlite":
+            t = _sqlite_table(s)
+            conn.execute(CreateTable(t, if_not_exists=True))
+            for ix in t.indexes:
+                conn.execute(CreateIndex(ix, if_not_exists=True))
+        else:
+            continue
+        done.append(s)
+    return done
+
+def committed(conn: Connection, created: Iterable[int] = (), removed: Iterable[int] = ()) -> None:
+    known = _known.setdefault(_db_key(conn), set())
+    known.update(created)
+    known.difference_update(removed)
+
+def upcoming(now_ts: int) -> list[int]:
+    # the current partition and ALERT_PARTITIONS_AHEAD after it
+    first = start_of(now_ts)
+    return [first + i * settings.alert_partition_sec for i in range(settings.alert_partitions_ahead + 1)]
+
+def prune(conn: Connection, now_ts: int, bucket_seconds: int = 300) -> list[int]:
+    # drop (or archive) partitions entirely older than ALERT_RETENTION_DAYS
+    retention = settings.alert_retention_days * 86400
+    if retention <= 0 or not _partitioned(conn):
+        return []
+    live = now_ts - now_ts % bucket_seconds - bucket_seconds
+    cutoff = min(now_ts - retention, live)
+    archive = settings.alert_retention_mode == "archive"
+    removed = []
+    for s in existing(conn):
+        if s + settings.alert_partition_sec > cutoff:
+            break
+        name = name_of(s)
+        if archive:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text(f"ALTER TABLE alerts DETACH PARTITION {name}"))
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {ARCHIVE_PREFIX}{s}"))
+        else:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        metrics.alert_partitions_pruned.inc("archive" if archive else "drop")
+        removed.append(s)
+    return removed
+
+# -------- schema setup (init_db) --------
+def lock_schema(conn: Connection) -> None:
+    # API and worker both run init_db at startup: serialize it on Postgres
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('price-alert-engine:schema'))"))
+
+def tables_to_create(conn: Connection, metadata: MetaData) -> list[Table]:
+    # on SQLite `alerts` is never created: its rows live in the per-period tables
+    return [t for t in metadata.sorted_tables if not (conn.dialect.name == "sqlite" and t is Alert.__table__)]
+
+def retire_legacy(conn: Connection) -> bool:
+    # an unpartitioned `alerts` from before partitioning is renamed to alerts_legacy (the
+    # rows within retention are copied over by adopt_legacy; drop it when no longer needed)
+    if conn.dialect.name == "postgresql":
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('alerts')")).scalar()
+        if kind != "r":
+            return False
+        conn.execute(text(f"ALTER TABLE alerts RENAME TO {LEGACY}"))
+        # index and sequence names are schema-wide: free them for the new table
+        for (ix,) in conn.execute(text(f"SELECT indexname FROM pg_indexes WHERE tablename = '{LEGACY}'")).all():
+            conn.execute(text(f'ALTER INDEX "{ix}" RENAME TO "{ix}_legacy"'))
+        seq = conn.execute(text(f"SELECT pg_get_serial_sequence('{LEGACY}', 'id')")).scalar()
+        if seq:
+            conn.execute(text(f"ALTER SEQUENCE {seq} RENAME TO {LEGACY}_id_seq"))
+        return True
+    if conn.dialect.name == "sqlite":
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts'")).first() is None:
+            return False
+        conn.execute(text(f"ALTER TABLE alerts RENAME TO {LEGACY}"))
+        return True
+    return False
+
+def adopt_legacy(conn: Connection, now_ts: int) -> list[int]:
+    # copies the rows still within retention from alerts_legacy into the partitions
+    retention = settings.alert_retention_days * 86400
+    since = now_ts - retention if retention > 0 else 0
+    p = settings.alert_partition_sec
+    starts = [r[0] for r in conn.execute(
+        text(f"SELECT DISTINCT bucket - bucket % {p} FROM {LEGACY} WHERE bucket >= :since"), {"since": since},
+    )]
+    created = ensure(conn, starts)
+    cols = "holding_id, kind, bucket, message, created_at"
+    copied = 0
+    if conn.dialect.name == "postgresql":
+        copied = conn.execute(text(
+            f"INSERT INTO alerts ({cols}) SELECT {cols} FROM {LEGACY} WHERE bucket >= :since ON CONFLICT DO NOTHING"
+        ), {"since": since}).rowcount
+    else:
+        for s in starts:
+            copied += conn.execute(text(
+                f"INSERT OR IGNORE INTO {name_of(s)} ({cols}) SELECT {cols} FROM {LEGACY} "
+                f"WHERE bucket >= :since AND bucket >= {s} AND bucket < {s + p}"
+            ), {"since": since}).rowcount
+    log.warning(
+        "alerts is now partitioned: copied %d alert(s) from the last %s into %d partition(s); "
+        "the old rows stay in %s (drop it when no longer needed)",
+        copied, f"{settings.alert_retention_days} day(s)" if retention > 0 else "ever", len(created), LEGACY,
+    )
+    return created
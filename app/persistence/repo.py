@@ -1,16 +1,103 @@
 import time
-from sqlalchemy import select
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+from sqlalchemy import select, insert, update, delete, func, or_, tuple_, bindparam, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
 
-from app.domain.models import Asset, Holding, Strategy, EngineState, Alert
+from app.domain.models import Asset, Holding, Strategy, EngineState, WorkerLease, WorkerNode
 from app.domain.signals import SignalKind
+from app.engine.decision import Strategy as DStrategy, Holding as DHolding, EngineState as DState
+from app.observability.tracing import traced
+from app.persistence import partitions
+
+# -------- Tick snapshot (plain, detached from the session) --------
+@dataclass
+class AssetBook:
+    asset: dict  # provider mappings: symbol, binance_symbol, coinbase_product_id, coingecko_id
+    strategy: DStrategy
+    holdings: list[DHolding]
+
+@dataclass
+class TickSnapshot:
+    books: list[AssetBook]  # enabled assets that have holdings
+    states: dict[int, DState]  # holding_id -> state
+
+@dataclass
+class PendingAlert:
+    holding_id: int
+    kind: SignalKind
+    message: str
+    ts: int
+
+_STRATEGY_COLS = (
+    Strategy.symbol,
+    Strategy.base_tp,
+    Strategy.sl_pct,
+    Strategy.trail_atr_mult,
+    Strategy.profit_lock_pct,
+    Strategy.cooldown_sec,
+    Strategy.confirm_regime,
+)
+
+# API listings (plain rows, no ORM objects) and their keyset pagination by id
+_ASSET_COLS = (
+    Asset.id,
+    Asset.symbol,
+    Asset.enabled,
+    Asset.binance_symbol,
+    Asset.coinbase_product_id,
+    Asset.coingecko_id,
+)
+_HOLDING_COLS = (Holding.id, Holding.symbol, Holding.entry, Holding.invested_amount)
+
+def _page(q, id_col, after_id: int | None, limit: int | None):
+    q = q.order_by(id_col)
+    if after_id is not None:
+        q = q.where(id_col > after_id)
+    if limit is not None:
+        q = q.limit(limit)
+    return q
+
+def _holdings_query(cols, symbol: str | None, after_id: int | None, limit: int | None):
+    q = select(*cols)
+    if symbol:
+        q = q.where(Holding.symbol == symbol.upper().strip())
+    return _page(q, Holding.id, after_id, limit)
+
+@dataclass
+class LeaseFence:
+    # leases a tick was computed under; flush_tick only commits while all of them still hold
+    worker_id: str
+    leases: dict[int, int]  # partition -> epoch
+    now_ts: int
+    until: int  # renewed expiry
+
+class LeaseLost(RuntimeError):
+    pass
+
+def _dstrategy(row) -> DStrategy:
+    return DStrategy(
+        base_tp=row.base_tp,
+        sl_pct=row.sl_pct,
+        trail_atr_mult=row.trail_atr_mult,
+        profit_lock_pct=row.profit_lock_pct,
+        cooldown_sec=row.cooldown_sec,
+        confirm_regime=row.confirm_regime,
+    )
 
 class Repo:
     def __init__(self, db: Session):
         self.db = db
 
     # -------- Assets --------
+    def list_assets(self, after_id: int | None = None, limit: int | None = None) -> list[Asset]:
+        # enabled + disabled, by id; after_id/limit: one keyset page
+        return list(self.db.execute(_page(select(Asset), Asset.id, after_id, limit)).scalars().all())
+
     def list_enabled_assets(self) -> list[Asset]:
         q = select(Asset).where(Asset.enabled == True)  # noqa: E712
         return list(self.db.execute(q).scalars().all())
@@ -51,13 +138,17 @@ class Repo:
         self.db.commit()
         return h
 
-    def list_holdings(self, symbol: str | None = None) -> list[Holding]:
-        q = select(Holding)
-        if symbol:
-            q = q.where(Holding.symbol == symbol.upper().strip())
-        return list(self.db.execute(q).scalars().all())
+    def list_holdings(
+        self, symbol: str | None = None, after_id: int | None = None, limit: int | None = None,
+    ) -> list[Holding]:
+        # by id (stable order: stable ETags); after_id/limit: one keyset page
+        return list(self.db.execute(_holdings_query((Holding,), symbol, after_id, limit)).scalars().all())
 
     # -------- Strategies --------
+    def get_strategy(self, symbol: str) -> Strategy | None:
+        q = select(Strategy).where(Strategy.symbol == symbol.upper().strip())
+        return self.db.execute(q).scalars().first()
+
     def get_or_create_strategy(self, symbol: str) -> Strategy:
         sym = symbol.upper().strip()
         q = select(Strategy).where(Strategy.symbol == sym)
@@ -78,6 +169,101 @@ class Repo:
         self.db.refresh(s)
         return s
 
+    # -------- Bulk import (one transaction per call; the API sends chunks) --------
+    # Rows are already validated (schemas *In). Returns the ids written (in no particular
+    # order: asking for row order makes SQLAlchemy insert one row per statement on SQLite);
+    # on error the call is rolled back as a whole. Symbols must be unique within one call: the caller
+    # splits chunks on repeats so a later row still wins.
+    def bulk_upsert_assets(self, rows: list[dict]) -> list[int]:
+        rows = [{**r, "symbol": r["symbol"].upper().strip()} for r in rows]
+        return self._in_transaction(lambda: self._upsert_by_symbol(Asset, rows))
+
+    def bulk_upsert_strategies(self, rows: list[dict]) -> list[int]:
+        rows = [{**r, "symbol": r["symbol"].upper().strip()} for r in rows]
+        return self._in_transaction(lambda: self._upsert_by_symbol(Strategy, rows))
+
+    def bulk_create_holdings(self, rows: list[dict]) -> list[int]:
+        # holdings and their engine_state rows in the same transaction
+        rows = [
+            {"symbol": r["symbol"].upper().strip(), "entry": r["entry"], "invested_amount": r["invested_amount"]}
+            for r in rows
+        ]
+        return self._in_transaction(lambda: self._insert_holdings(rows))
+
+    def _insert_holdings(self, rows: list[dict]) -> list[int]:
+        if self.db.get_bind().dialect.name == "postgresql":
+            # COPY can't return ids: take them from the sequence first, then copy both tables
+            ids = list(self.db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('holdings', 'id')) FROM generate_series(1, :n)"),
+                {"n": len(rows)},
+            ).scalars())
+            self._copy(
+                "holdings", ("id", "symbol", "entry", "invested_amount"),
+                [(i, r["symbol"], r["entry"], r["invested_amount"]) for i, r in zip(ids, rows)],
+            )
+            self._copy("engine_state", ("holding_id", "trailing_active"), [(i, False) for i in ids])
+        else:
+            # multi-row INSERT ... RETURNING (batched by SQLAlchemy's insertmanyvalues); Core
+            # tables, not the ORM bulk path, which costs more per row than the SQL itself
+            holdings, states = Holding.__table__, EngineState.__table__
+            ids = list(self.db.execute(insert(holdings).returning(holdings.c.id), rows).scalars())
+            self.db.execute(insert(states), [{"holding_id": i, "trailing_active": False} for i in ids])
+        return ids
+
+    def _in_transaction(self, work: Callable[[], list[int]]) -> list[int]:
+        try:
+            ids = work()
+            self.db.commit()
+            return ids
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def _upsert_by_symbol(self, model, rows: list[dict]) -> list[int]:
+        table = model.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect not in ("postgresql", "sqlite"):
+            ids = []
+            for r in rows:
+                obj = self.db.execute(select(model).where(model.symbol == r["symbol"])).scalars().first()
+                if obj is None:
+                    obj = model(**r)
+                    self.db.add(obj)
+                else:
+                    for k, v in r.items():
+                        setattr(obj, k, v)
+                self.db.flush()
+                ids.append(obj.id)
+            return ids
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        # like upsert_asset / upsert_strategy: every given field overwrites the stored one
+        cols = [c for c in rows[0] if c != "symbol"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["symbol"], set_={c: stmt.excluded[c] for c in cols},
+        ).returning(table.c.id)
+        return list(self.db.execute(stmt, rows).scalars())
+
+    def _copy(self, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+        # Postgres COPY FROM STDIN on the session's own connection (so it joins the
+        # transaction): psycopg async under AsyncSession.run_sync, plain psycopg otherwise
+        conn = self.db.connection().connection.driver_connection
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+        async def copy_async():
+            async with conn.cursor() as cur:
+                async with cur.copy(sql) as cp:
+                    for r in rows:
+                        await cp.write_row(r)
+
+        import psycopg  # postgres only
+
+        if isinstance(conn, psycopg.AsyncConnection):
+            await_only(copy_async())
+            return
+        with conn.cursor() as cur, cur.copy(sql) as cp:
+            for r in rows:
+                cp.write_row(r)
+
     # -------- Engine State --------
     def load_state(self, holding_id: int) -> EngineState:
         q = select(EngineState).where(EngineState.holding_id == holding_id)
@@ -93,26 +279,478 @@ class Repo:
         self.db.add(st)
         self.db.commit()
 
+    # -------- Tick snapshot --------
+    @traced()
+    def load_tick_snapshot(
+        self,
+        symbols: list[str] | None = None,
+        owns: Callable[[str], bool] | None = None,
+    ) -> TickSnapshot:
+        # constant number of queries regardless of asset/holding count; missing strategy
+        # and engine_state rows are created in bulk (one commit). `symbols` narrows it down,
+        # `owns` (shard membership) keeps only the assets this worker holds a lease for.
+        cond = [Asset.enabled == True]  # noqa: E712
+        if owns is not None:
+            q = select(Asset.symbol).where(*cond)
+            if symbols is not None:
+                q = q.where(Asset.symbol.in_(symbols))
+            symbols = [sym for sym in self.db.execute(q).scalars() if owns(sym)]
+        if symbols is not None:
+            cond.append(Asset.symbol.in_(symbols))
+        enabled = select(Asset.symbol).where(*cond)
+
+        assets = self.db.execute(
+            select(Asset.symbol, Asset.binance_symbol, Asset.coinbase_product_id, Asset.coingecko_id)
+            .where(*cond)
+            .order_by(Asset.id)
+        ).all()
+
+        holdings: dict[str, list[DHolding]] = {}
+        for h in self.db.execute(
+            select(Holding.id, Holding.symbol, Holding.entry, Holding.invested_amount)
+            .where(Holding.symbol.in_(enabled))
+            .order_by(Holding.id)
+        ):
+            holdings.setdefault(h.symbol, []).append(
+                DHolding(id=h.id, symbol=h.symbol, entry=h.entry, invested_amount=h.invested_amount)
+            )
+
+        strategies = {
+            r.symbol: _dstrategy(r)
+            for r in self.db.execute(select(*_STRATEGY_COLS).where(Strategy.symbol.in_(enabled)))
+        }
+
+        states = {
+            r.holding_id: DState(
+                trailing_active=r.trailing_active,
+                trailing_anchor=r.trailing_anchor,
+                last_alert_ts=r.last_alert_ts,
+            )
+            for r in self.db.execute(
+                select(
+                    EngineState.holding_id,
+                    EngineState.trailing_active,
+                    EngineState.trailing_anchor,
+                    EngineState.last_alert_ts,
+                )
+                .join(Holding, Holding.id == EngineState.holding_id)
+                .where(Holding.symbol.in_(enabled))
+            )
+        }
+
+        missing_strategies = [sym for sym in holdings if sym not in strategies]
+        missing_states = [h.id for hs in holdings.values() for h in hs if h.id not in states]
+        if missing_strategies or missing_states:
+            self._create_missing(missing_strategies, missing_states, strategies, states)
+
+        books = [
+            AssetBook(
+                asset={
+                    "symbol": a.symbol,
+                    "binance_symbol": a.binance_symbol,
+                    "coinbase_product_id": a.coinbase_product_id,
+                    "coingecko_id": a.coingecko_id,
+                },
+                strategy=strategies[a.symbol],
+                holdings=holdings[a.symbol],
+            )
+            for a in assets
+            if a.symbol in holdings
+        ]
+        return TickSnapshot(books=books, states=states)
+
+    def _create_missing(
+        self,
+        symbols: list[str],
+        holding_ids: list[int],
+        strategies: dict[str, DStrategy],
+        states: dict[int, DState],
+    ) -> None:
+        try:
+            if symbols:
+                rows = self.db.execute(
+                    insert(Strategy).returning(*_STRATEGY_COLS),
+                    [{"symbol": sym} for sym in symbols],
+                )
+                strategies.update({r.symbol: _dstrategy(r) for r in rows})
+            if holding_ids:
+                self.db.execute(
+                    insert(EngineState),
+                    [{"holding_id": hid, "trailing_active": False} for hid in holding_ids],
+                )
+            self.db.commit()
+        except IntegrityError:
+            # raced with the API creating the same rows: fall back to the one-by-one path
+            self.db.rollback()
+            for sym in symbols:
+                strategies[sym] = _dstrategy(self.get_or_create_strategy(sym))
+            for hid in holding_ids:
+                st = self.load_state(hid)
+                states[hid] = DState(
+                    trailing_active=st.trailing_active,
+                    trailing_anchor=st.trailing_anchor,
+                    last_alert_ts=st.last_alert_ts,
+                )
+            return
+
+        for hid in holding_ids:
+            states[hid] = DState(trailing_active=False, trailing_anchor=None, last_alert_ts=None)
+
     # -------- Alerts / Dedup --------
     @staticmethod
     def _bucket(now_ts: int, seconds: int = 300) -> int:
         return now_ts - (now_ts % seconds)
 
+    # alerts live in bucket-range partitions (persistence/partitions.py): the table comes
+    # from partitions.table_for(bucket), the parent `alerts` on Postgres
+    @traced()
     def should_send_alert(self, holding_id: int, kind: SignalKind, now_ts: int, bucket_seconds: int = 300) -> bool:
+        # read-only: a partition that doesn't exist yet means no alert yet (flush_tick and the
+        # maintenance task create them), so no DDL/commit in the middle of a tick
         bucket = self._bucket(now_ts, bucket_seconds)
-        q = select(Alert).where(
-            Alert.holding_id == holding_id,
-            Alert.kind == str(kind),
-            Alert.bucket == bucket,
+        conn = self.db.connection()
+        if not partitions.present(conn, bucket):
+            return True
+        t = partitions.table_for(conn, bucket)
+        q = select(t.c.id).where(
+            t.c.holding_id == holding_id,
+            t.c.kind == str(kind),
+            t.c.bucket == bucket,
         )
-        exists = self.db.execute(q).scalars().first()
+        exists = self.db.execute(q).first()
         return exists is None
 
+    @traced()
+    def recent_alert_keys(self, since_bucket: int) -> list[tuple[int, str, int]]:
+        out = []
+        for t in partitions.tables_since(self.db.connection(), since_bucket):
+            q = select(t.c.holding_id, t.c.kind, t.c.bucket).where(t.c.bucket >= since_bucket)
+            out.extend((r.holding_id, r.kind, r.bucket) for r in self.db.execute(q))
+        return out
+
     def record_alert(self, holding_id: int, kind: SignalKind, message: str, now_ts: int, bucket_seconds: int = 300) -> None:
         bucket = self._bucket(now_ts, bucket_seconds)
-        a = Alert(holding_id=holding_id, kind=str(kind), bucket=bucket, message=message)
-        self.db.add(a)
+        self._ensure_alert_partitions([bucket])
+        t = partitions.table_for(self.db.connection(), bucket)
+        self.db.execute(
+            self._insert_ignore_alert(t),
+            {"holding_id": holding_id, "kind": str(kind), "bucket": bucket, "message": message},
+        )
+        self.db.commit()
+
+    def _ensure_alert_partitions(self, buckets: list[int]) -> None:
+        # creates missing partitions in a transaction of their own, so a tick that rolls back
+        # (LeaseLost, errors) can't leave this process believing they exist
+        conn = self.db.connection()
+        starts = partitions.missing(conn, buckets)
+        if not starts:
+            return
         try:
+            created = partitions.ensure(conn, starts)
             self.db.commit()
-        except IntegrityError:
+        except Exception:
+            self.db.rollback()
+            raise
+        partitions.committed(conn, created)
+
+    @traced()
+    def maintain_alert_partitions(self, now_ts: int, bucket_seconds: int = 300) -> tuple[list[int], list[int]]:
+        # retention job: creates the upcoming partitions, drops/archives the expired ones
+        conn = self.db.connection()
+        try:
+            have = set(partitions.existing(conn))
+            created = partitions.ensure(conn, [s for s in partitions.upcoming(now_ts) if s not in have])
+            removed = partitions.prune(conn, now_ts, bucket_seconds)
+            self.db.commit()
+        except Exception:
             self.db.rollback()
+            raise
+        partitions.committed(conn, have | set(created), removed)
+        return created, removed
+
+    # -------- Tick write-back --------
+    @traced()
+    def flush_tick(
+        self,
+        states: dict[int, DState],
+        alerts: list[PendingAlert],
+        bucket_seconds: int = 300,
+        fence: LeaseFence | None = None,
+    ) -> set[tuple[int, str, int]]:
+        # One transaction per tick: INSERT ... ON CONFLICT DO NOTHING for the alerts (dedup
+        # key), grouped by partition, plus bulk UPDATE of the dirty engine_state rows (executemany).
+        # Returns the (holding_id, kind, bucket) keys actually inserted: an alert whose key was
+        # already there (stale dedup index, overlapping shard owners) must not be sent again,
+        # and only an inserted alert stamps last_alert_ts on its holding's state (the cooldown
+        # starts when we send, not when someone else already did).
+        #
+        # Crash semantics: alerts are persisted here and only queued for delivery after this
+        # commit. If the process dies before it, that tick's state changes (trailing
+        # activation/anchor, last_alert_ts) and alert rows are lost together and nothing was
+        # sent; the next tick re-evaluates from the previous committed state.
+        #
+        # With a fence (sharding) the same transaction first re-checks and renews the leases;
+        # if another worker took a partition meanwhile, nothing is written (LeaseLost).
+        if not states and not alerts:
+            return set()
+        if alerts:
+            self._ensure_alert_partitions([self._bucket(a.ts, bucket_seconds) for a in alerts])
+        conn = self.db.connection()
+        try:
+            if fence is not None and not self._fence_leases(fence):
+                raise LeaseLost(f"lost shard lease(s) of {fence.worker_id} during the tick")
+            by_table: dict[Any, list[dict]] = {}
+            for a in alerts:
+                bucket = self._bucket(a.ts, bucket_seconds)
+                by_table.setdefault(partitions.table_for(conn, bucket), []).append(
+                    {"holding_id": a.holding_id, "kind": str(a.kind), "bucket": bucket, "message": a.message}
+                )
+            inserted: set[tuple[int, str, int]] = set()
+            for table, rows in by_table.items():
+                res = conn.execute(
+                    self._insert_ignore_alert(table).returning(table.c.holding_id, table.c.kind, table.c.bucket), rows,
+                )
+                inserted.update((r.holding_id, r.kind, r.bucket) for r in res)
+            for a in alerts:
+                st = states.get(a.holding_id)
+                if st is not None and (a.holding_id, str(a.kind), self._bucket(a.ts, bucket_seconds)) in inserted:
+                    st.last_alert_ts = a.ts
+            if states:
+                conn.execute(
+                    update(EngineState.__table__)
+                    .where(EngineState.__table__.c.holding_id == bindparam("hid"))
+                    .values(
+                        trailing_active=bindparam("trailing_active"),
+                        trailing_anchor=bindparam("trailing_anchor"),
+                        last_alert_ts=bindparam("last_alert_ts"),
+                    ),
+                    [
+                        {
+                            "hid": hid,
+                            "trailing_active": st.trailing_active,
+                            "trailing_anchor": st.trailing_anchor,
+                            "last_alert_ts": st.last_alert_ts,
+                        }
+                        for hid, st in states.items()
+                    ],
+                )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return inserted
+
+    def _insert_ignore_alert(self, table):
+        # dedup key (inferred, so it also matches each partition's unique index)
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(table).on_conflict_do_nothing(index_elements=["holding_id", "kind", "bucket"])
+        if dialect == "sqlite":
+            return sqlite.insert(table).on_conflict_do_nothing(index_elements=["holding_id", "kind", "bucket"])
+        return insert(table)
+
+    # -------- Shard leases --------
+    @traced()
+    def ensure_partitions(self, partitions: int) -> None:
+        existing = set(self.db.execute(select(WorkerLease.partition)).scalars())
+        missing = [p for p in range(partitions) if p not in existing]
+        if not missing:
+            return
+        try:
+            self.db.execute(
+                insert(WorkerLease),
+                [{"partition": p, "owner": None, "expires_at": 0, "epoch": 0} for p in missing],
+            )
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()  # another worker created them first
+
+    @traced()
+    def heartbeat_worker(self, worker_id: str, now_ts: int, ttl: int) -> int:
+        # refreshes this worker's heartbeat, forgets dead ones and returns the live count
+        res = self.db.execute(
+            update(WorkerNode).where(WorkerNode.worker_id == worker_id).values(heartbeat_at=now_ts)
+        )
+        if res.rowcount == 0:
+            self.db.add(WorkerNode(worker_id=worker_id, heartbeat_at=now_ts))
+        self.db.execute(delete(WorkerNode).where(WorkerNode.heartbeat_at < now_ts - ttl))
+        live = self.db.execute(select(func.count()).select_from(WorkerNode)).scalar_one()
+        self.db.commit()
+        return live
+
+    @traced()
+    def sync_leases(self, worker_id: str, now_ts: int, ttl: int, partitions: int, target: int) -> dict[int, int]:
+        # renew what we hold, give back anything above `target` and claim free/expired
+        # partitions up to it. Claims are compare-and-set UPDATEs (epoch + 1), so two workers
+        # can never both win a partition; on Postgres candidates are picked with SKIP LOCKED.
+        lease = WorkerLease
+        until = now_ts + ttl
+        self.db.execute(
+            update(lease)
+            .where(lease.owner == worker_id, lease.expires_at >= now_ts, lease.partition < partitions)
+            .values(expires_at=until)
+        )
+        owned = dict(
+            self.db.execute(
+                select(lease.partition, lease.epoch)
+                .where(lease.owner == worker_id, lease.expires_at >= now_ts, lease.partition < partitions)
+                .order_by(lease.partition)
+            ).all()
+        )
+
+        if len(owned) > target:
+            extra = list(owned)[target:]
+            self.db.execute(
+                update(lease)
+                .where(lease.owner == worker_id, lease.partition.in_(extra))
+                .values(owner=None, expires_at=0)
+            )
+            for p in extra:
+                del owned[p]
+        elif len(owned) < target:
+            free = or_(lease.owner.is_(None), lease.expires_at < now_ts)
+            q = (
+                select(lease.partition)
+                .where(free, lease.partition < partitions)
+                .order_by(lease.partition)
+                .limit(target - len(owned))
+            )
+            if self.db.get_bind().dialect.name == "postgresql":
+                q = q.with_for_update(skip_locked=True)
+            for p in list(self.db.execute(q).scalars()):
+                res = self.db.execute(
+                    update(lease)
+                    .where(lease.partition == p, free)
+                    .values(owner=worker_id, expires_at=until, epoch=lease.epoch + 1)
+                    .returning(lease.epoch)
+                )
+                epoch = res.scalar_one_or_none()
+                if epoch is not None:
+                    owned[p] = epoch
+        self.db.commit()
+        return owned
+
+    @traced()
+    def release_leases(self, worker_id: str) -> None:
+        self.db.execute(
+            update(WorkerLease).where(WorkerLease.owner == worker_id).values(owner=None, expires_at=0)
+        )
+        self.db.execute(delete(WorkerNode).where(WorkerNode.worker_id == worker_id))
+        self.db.commit()
+
+    def _fence_leases(self, fence: LeaseFence) -> bool:
+        # runs inside flush_tick's transaction: the UPDATE row-locks the leases (Postgres) or
+        # takes the write lock (SQLite), so no claim can slip in before the commit
+        if not fence.leases:
+            return False
+        res = self.db.execute(
+            update(WorkerLease)
+            .where(
+                WorkerLease.owner == fence.worker_id,
+                WorkerLease.expires_at >= fence.now_ts,
+                tuple_(WorkerLease.partition, WorkerLease.epoch).in_(list(fence.leases.items())),
+            )
+            .values(expires_at=fence.until)
+        )
+        return res.rowcount == len(fence.leases)
+
+class AsyncRepo:
+    # Async face of Repo for the worker and the API. Each call runs the very same Repo code
+    # through AsyncSession.run_sync: SQL, transactions and dedup semantics are shared, and
+    # the driver I/O is awaited (psycopg async / aiosqlite) instead of blocking the event
+    # loop. Wrapping a plain Session also works (calls then block, as before) for scripts.
+    def __init__(self, db: AsyncSession | Session):
+        self.db = db
+
+    async def _run(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        if isinstance(self.db, AsyncSession):
+            return await self.db.run_sync(lambda s: method(Repo(s), *args, **kwargs))
+        return method(Repo(self.db), *args, **kwargs)
+
+    # -------- API --------
+    async def list_assets(self, after_id: int | None = None, limit: int | None = None) -> list[Asset]:
+        return await self._run(Repo.list_assets, after_id, limit)
+
+    async def upsert_asset(self, data: dict) -> Asset:
+        return await self._run(Repo.upsert_asset, data)
+
+    async def create_holding(self, data: dict) -> Holding:
+        return await self._run(Repo.create_holding, data)
+
+    async def list_holdings(
+        self, symbol: str | None = None, after_id: int | None = None, limit: int | None = None,
+    ) -> list[Holding]:
+        return await self._run(Repo.list_holdings, symbol, after_id, limit)
+
+    async def bulk_upsert_assets(self, rows: list[dict]) -> list[int]:
+        return await self._run(Repo.bulk_upsert_assets, rows)
+
+    async def bulk_upsert_strategies(self, rows: list[dict]) -> list[int]:
+        return await self._run(Repo.bulk_upsert_strategies, rows)
+
+    async def bulk_create_holdings(self, rows: list[dict]) -> list[int]:
+        return await self._run(Repo.bulk_create_holdings, rows)
+
+    # Full listings as chunks of rows from a server-side cursor (psycopg async; aiosqlite
+    # fetches in chunks too), so memory stays flat whatever the table size. Needs an
+    # AsyncSession; `after_id` resumes an interrupted stream.
+    def stream_assets(self, after_id: int | None = None, chunk: int = 1000) -> AsyncIterator[list]:
+        return self._stream(_page(select(*_ASSET_COLS), Asset.id, after_id, None), chunk)
+
+    def stream_holdings(
+        self, symbol: str | None = None, after_id: int | None = None, chunk: int = 1000,
+    ) -> AsyncIterator[list]:
+        return self._stream(_holdings_query(_HOLDING_COLS, symbol, after_id, None), chunk)
+
+    async def _stream(self, q, chunk: int) -> AsyncIterator[list]:
+        result = await self.db.stream(q.execution_options(yield_per=chunk))
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_strategy(self, symbol: str) -> Strategy | None:
+        return await self._run(Repo.get_strategy, symbol)
+
+    async def get_or_create_strategy(self, symbol: str) -> Strategy:
+        return await self._run(Repo.get_or_create_strategy, symbol)
+
+    async def upsert_strategy(self, symbol: str, data: dict) -> Strategy:
+        return await self._run(Repo.upsert_strategy, symbol, data)
+
+    # -------- worker tick --------
+    async def load_tick_snapshot(
+        self,
+        symbols: list[str] | None = None,
+        owns: Callable[[str], bool] | None = None,
+    ) -> TickSnapshot:
+        return await self._run(Repo.load_tick_snapshot, symbols=symbols, owns=owns)
+
+    async def should_send_alert(self, holding_id: int, kind: SignalKind, now_ts: int, bucket_seconds: int = 300) -> bool:
+        return await self._run(Repo.should_send_alert, holding_id, kind, now_ts, bucket_seconds)
+
+    async def recent_alert_keys(self, since_bucket: int) -> list[tuple[int, str, int]]:
+        return await self._run(Repo.recent_alert_keys, since_bucket)
+
+    async def maintain_alert_partitions(self, now_ts: int, bucket_seconds: int = 300) -> tuple[list[int], list[int]]:
+        return await self._run(Repo.maintain_alert_partitions, now_ts, bucket_seconds)
+
+    async def flush_tick(
+        self,
+        states: dict[int, DState],
+        alerts: list[PendingAlert],
+        bucket_seconds: int = 300,
+        fence: LeaseFence | None = None,
+    ) -> set[tuple[int, str, int]]:
+        return await self._run(Repo.flush_tick, states, alerts, bucket_seconds, fence)
+
+    # -------- shard leases --------
+    async def ensure_partitions(self, partitions: int) -> None:
+        return await self._run(Repo.ensure_partitions, partitions)
+
+    async def heartbeat_worker(self, worker_id: str, now_ts: int, ttl: int) -> int:
+        return await self._run(Repo.heartbeat_worker, worker_id, now_ts, ttl)
+
+    async def sync_leases(self, worker_id: str, now_ts: int, ttl: int, partitions: int, target: int) -> dict[int, int]:
+        return await self._run(Repo.sync_leases, worker_id, now_ts, ttl, partitions, target)
+
+    async def release_leases(self, worker_id: str) -> None:
+        return await self._run(Repo.release_leases, worker_id)
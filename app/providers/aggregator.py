@@ -1,12 +1,23 @@
+import asyncio
 import time
-import random
+import logging
 from dataclasses import dataclass
 
 from app.settings import settings
-from app.providers.base import PricePoint
+from app.providers.base import (
+    PricePoint,
+    ProviderUnavailable,
+    RetryBudget,
+    gather_limited,
+    retry_budget,
+)
 from app.providers.binance import BinanceProvider
 from app.providers.coinbase import CoinbaseProvider
 from app.providers.coingecko import CoinGeckoProvider
+from app.providers.health import registry
+from app.observability import metrics, tracing
+
+log = logging.getLogger("providers")
 
 @dataclass
 class Cached:
@@ -22,36 +33,164 @@ class ProviderAggregator:
         }
         self.order = [p.strip().upper() for p in settings.provider_order.split(",") if p.strip()]
         self.cache: dict[str, Cached] = {}
+        self.health = registry
 
     def _cache_key(self, asset: dict) -> str:
         return asset.get("symbol", "UNK").upper()
 
+    def ranked(self) -> list[str]:
+        # PROVIDER_ORDER adjusted per request by observed health (see HealthRegistry.rank)
+        return self.health.rank([p for p in self.order if p in self.providers])
+
+    def health_view(self) -> dict:
+        return self.health.snapshot(self.ranked())
+
+    def hedge_delay(self, pname: str) -> float:
+        # how long to wait on a provider before firing the next one: its observed quantile
+        # (p95 by default) once there are enough samples, HEDGE_DELAY_SEC until then
+        q = self.health.get(pname).latency.quantile(settings.hedge_quantile)
+        if q is None:
+            q = settings.hedge_delay_sec
+        return min(max(q, settings.hedge_min_delay_sec), settings.asset_timeout_sec)
+
     async def get_pricepoint(self, asset: dict) -> PricePoint:
         key = self._cache_key(asset)
         now = int(time.time())
         cached = self.cache.get(key)
         if cached and (now - cached.ts) <= settings.price_cache_ttl_sec:
+            metrics.price_cache.inc("hit")
             return cached.pricepoint
+        metrics.price_cache.inc("miss")
+        return await self._fetch_hedged(asset, key, now)
 
-        # fallback with retry/backoff per provider
+    @tracing.traced("get_pricepoint")
+    async def _fetch_hedged(self, asset: dict, key: str, now: int) -> PricePoint:
+        # hedged fallback: the next provider starts when the current one fails or is slower
+        # than its hedge delay; first valid answer wins, the rest are cancelled. Every request
+        # after the first is charged to the tick's retry budget.
+        budget = retry_budget.get() or RetryBudget()
+        queue = self.ranked()
+        running: dict[asyncio.Task, tuple[str, bool, bool]] = {}  # name, charged, hedge
         last_err: Exception | None = None
-        for pname in self.order:
-            prov = self.providers.get(pname)
-            if not prov:
-                continue
-
-            for attempt in range(3):
-                try:
-                    pp = await prov.get_pricepoint(asset)
-                    self.cache[key] = Cached(ts=now, pricepoint=pp)
-                    return pp
-                except Exception as e:
-                    last_err = e
-                    backoff = (0.4 * (2 ** attempt)) + random.random() * 0.2
-                    await _sleep(backoff)
+        free = True  # no real upstream request made yet: the next one isn't charged
+
+        def launch(charged: bool, hedge: bool) -> str:
+            pname = queue.pop(0)
+            task = asyncio.ensure_future(self._attempt(pname, asset))
+            task.add_done_callback(_consume_result)  # losers may finish after we return
+            running[task] = (pname, charged, hedge)
+            return pname
+
+        try:
+            if not queue:
+                raise RuntimeError("all_providers_failed: no providers configured")
+            current = launch(charged=False, hedge=False)
+            free = False
+            can_hedge = True
+            while running:
+                timeout = self.hedge_delay(current) if queue and can_hedge else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if budget.take(hedge=True):
+                        current = launch(charged=True, hedge=True)
+                    else:
+                        can_hedge = False
+                    continue
+
+                for task in done:
+                    pname, charged, hedge = running.pop(task)
+                    try:
+                        pp = task.result()
+                    except ProviderUnavailable as e:
+                        # breaker open / asset not listed here: nothing was sent upstream
+                        last_err = e
+                        if charged:
+                            budget.refund(hedge)
+                        else:
+                            free = True
+                        continue
+                    except Exception as e:
+                        last_err = e
+                        continue
+                    if _valid(pp):
+                        self.cache[key] = Cached(ts=now, pricepoint=pp)
+                        return pp
+                    last_err = ValueError(f"{pname} returned an invalid pricepoint")
+
+                if not running and queue:
+                    if free:
+                        current = launch(charged=False, hedge=False)
+                        free = False
+                        continue
+                    if not budget.take():
+                        last_err = RuntimeError(f"retry budget exhausted ({budget.limit}); last error: {last_err}")
+                        break
+                    current = launch(charged=True, hedge=False)
+        finally:
+            for task in running:
+                task.cancel()
 
         raise RuntimeError(f"all_providers_failed: {last_err}")
 
-async def _sleep(sec: float) -> None:
-    import asyncio
-    await asyncio.sleep(sec)
+    async def _attempt(self, pname: str, asset: dict) -> PricePoint:
+        with tracing.span(f"provider.{pname}"):
+            return await self.providers[pname].get_pricepoint(asset)
+
+    async def get_pricepoints(self, assets: list[dict]) -> dict[str, PricePoint | Exception]:
+        # one batch call per provider (in order) for whatever is still missing, then the
+        # per-symbol retry path only for the assets no batch call could serve
+        now = int(time.time())
+        out: dict[str, PricePoint | Exception] = {}
+        pending: list[dict] = []
+        for a in assets:
+            cached = self.cache.get(self._cache_key(a))
+            if cached and (now - cached.ts) <= settings.price_cache_ttl_sec:
+                out[a["symbol"]] = cached.pricepoint
+            else:
+                pending.append(a)
+        metrics.price_cache.inc("hit", n=len(out))
+        metrics.price_cache.inc("miss", n=len(pending))
+
+        for pname in self.ranked():
+            prov = self.providers[pname]
+            if not pending:
+                break
+            got: dict[str, PricePoint] = {}  # filled as symbols finish, kept if the batch fails later
+            try:
+                with tracing.span(f"provider.{pname}.batch", assets=len(pending)):
+                    await asyncio.wait_for(prov.get_pricepoints(pending, out=got), timeout=settings.batch_timeout_sec)
+            except ProviderUnavailable:
+                pass
+            except asyncio.TimeoutError:
+                log.warning(
+                    "%s batch timed out after %gs: %d of %d assets served",
+                    pname, settings.batch_timeout_sec, len(got), len(pending),
+                )
+            except Exception as e:
+                log.warning("%s batch failed for %d assets: %r", pname, len(pending), e)
+            for a in pending:
+                pp = got.get(a["symbol"])
+                if pp is None:
+                    continue
+                if not _valid(pp):
+                    log.warning("%s returned an invalid pricepoint for %s", pname, a["symbol"])
+                    continue
+                self.cache[self._cache_key(a)] = Cached(ts=now, pricepoint=pp)
+                out[a["symbol"]] = pp
+            pending = [a for a in pending if a["symbol"] not in out]
+
+        if pending:
+            res = await gather_limited(
+                asyncio.wait_for(self._fetch_hedged(a, self._cache_key(a), now), timeout=settings.asset_timeout_sec)
+                for a in pending
+            )
+            for a, pp in zip(pending, res):
+                out[a["symbol"]] = pp
+        return out
+
+def _valid(pp: PricePoint) -> bool:
+    return pp.last > 0 and bool(pp.ohlcv_close)
+
+def _consume_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
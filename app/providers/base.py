@@ -1,11 +1,107 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Protocol
+from typing import Awaitable, Iterable, Protocol
+
+from app.settings import settings
 
 @dataclass
 class PricePoint:
     last: float
     ohlcv_close: list[float]  # closes for feature calcs
+    # candle-buffer identity: total candles ever appended by `source`; lets stateful
+    # consumers (FeatureEngine) tell how many candles closed since the last call
+    source: str = ""
+    seq: int | None = None
 
 class PriceProvider(Protocol):
     name: str
     async def get_pricepoint(self, asset: dict) -> PricePoint: ...
+    # keyed by asset["symbol"]; assets the provider couldn't serve are simply missing. Each
+    # result also lands in `out` as soon as it is ready, so a caller that gives up on the
+    # whole batch still keeps the symbols that finished
+    async def get_pricepoints(
+        self, assets: list[dict], out: dict[str, PricePoint] | None = None,
+    ) -> dict[str, PricePoint]: ...
+
+class ProviderUnavailable(RuntimeError):
+    # provider can't serve this asset right now (breaker open, no symbol mapping): skip, don't retry
+    pass
+
+class FetchClock:
+    # time spent in upstream work, summed as if it had run one after another: every
+    # per-symbol call (gather_limited) plus the shared request of a batch call (fetch_timed)
+    def __init__(self):
+        self.busy_sec = 0.0
+
+fetch_clock: ContextVar[FetchClock | None] = ContextVar("fetch_clock", default=None)
+
+@contextmanager
+def fetch_timed():
+    # adds the time spent in the block to the tick's FetchClock (if any)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        clock = fetch_clock.get()
+        if clock is not None:
+            clock.busy_sec += time.perf_counter() - t0
+
+class RetryBudget:
+    # extra upstream requests (hedges, fallbacks after a failure) one tick may spend; the
+    # first request per symbol is free, so a degraded exchange can't multiply tick load
+    def __init__(self, limit: int | None = None):
+        self.limit = settings.tick_retry_budget if limit is None else limit
+        self.used = 0
+        self.hedges = 0
+        self.retries = 0
+
+    def take(self, hedge: bool = False) -> bool:
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        if hedge:
+            self.hedges += 1
+        else:
+            self.retries += 1
+        return True
+
+    def refund(self, hedge: bool = False) -> None:
+        # the extra request turned out free (provider skipped it without calling upstream)
+        self.used = max(0, self.used - 1)
+        if hedge:
+            self.hedges -= 1
+        else:
+            self.retries -= 1
+
+retry_budget: ContextVar[RetryBudget | None] = ContextVar("retry_budget", default=None)
+
+async def gather_limited(aws: Iterable[Awaitable], limit: int | None = None) -> list:
+    # asyncio.gather(return_exceptions=True) with at most `limit` in flight
+    sem = asyncio.Semaphore(max(1, limit or settings.worker_concurrency))
+
+    async def run(aw: Awaitable):
+        async with sem:
+            with fetch_timed():
+                return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=True)
+
+async def gather_into(
+    out: dict[str, PricePoint], calls: Iterable[tuple[str, Awaitable[PricePoint]]],
+) -> dict[str, PricePoint]:
+    # the per-symbol part of a batch call: each one bounded by ASSET_TIMEOUT_SEC and stored in
+    # `out` when done; a slow or failing symbol only loses itself
+    async def one(key: str, aw: Awaitable[PricePoint]) -> None:
+        out[key] = await asyncio.wait_for(aw, timeout=settings.asset_timeout_sec)
+
+    await gather_limited(one(k, aw) for k, aw in calls)
+    return out
+
+async def emulate_batch(
+    provider: PriceProvider, assets: list[dict], out: dict[str, PricePoint] | None = None,
+) -> dict[str, PricePoint]:
+    # for upstreams without a multi-symbol endpoint: one get_pricepoint per asset
+    return await gather_into({} if out is None else out, ((a["symbol"], provider.get_pricepoint(a)) for a in assets))
@@ -1,52 +1,119 @@
-import random
+import json
+import logging
 import time
-import httpx
-from app.settings import settings
-from app.providers.base import PricePoint
+from app.net.http import get_client
+from app.providers.base import PricePoint, ProviderUnavailable, fetch_timed, gather_into
+from app.providers.candles import CandleBuffer
+from app.providers.health import registry
+
+log = logging.getLogger("providers")
+
+INVALID_SYMBOL = -1121
+INVALID_RECHECK_SEC = 3600  # how long a symbol Binance doesn't list stays out of the batch
 
 class BinanceProvider:
     name = "BINANCE"
     base_url = "https://api.binance.com"
 
     def __init__(self):
-        self._fail_count = 0
-        self._cb_open_until = 0
-
-    def _cb_allow(self) -> bool:
-        return int(time.time()) >= self._cb_open_until
+        self.health = registry.get(self.name)
+        self._candles: dict[str, CandleBuffer] = {}
+        # symbols Binance answered "Invalid symbol" for -> when to try them again
+        self._invalid: dict[str, float] = {}
 
-    def _cb_on_failure(self) -> None:
-        self._fail_count += 1
-        if self._fail_count >= settings.cb_fail_threshold:
-            self._cb_open_until = int(time.time()) + settings.cb_open_seconds
-
-    def _cb_on_success(self) -> None:
-        self._fail_count = 0
-        self._cb_open_until = 0
+    def _quarantined(self, symbol: str) -> bool:
+        until = self._invalid.get(symbol)
+        if until is None:
+            return False
+        if time.time() >= until:
+            del self._invalid[symbol]
+            return False
+        return True
 
     async def get_pricepoint(self, asset: dict) -> PricePoint:
-        if not self._cb_allow():
-            raise RuntimeError("circuit_open")
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
 
         symbol = asset.get("binance_symbol")
         if not symbol:
-            raise RuntimeError("no_binance_symbol")
-
-        timeout = httpx.Timeout(settings.http_timeout_sec)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # last price
-            r = await client.get(f"{self.base_url}/api/v3/ticker/price", params={"symbol": symbol})
-            r.raise_for_status()
-            last = float(r.json()["price"])
-
-            # klines: 1h candles, last 300 closes
-            r2 = await client.get(
-                f"{self.base_url}/api/v3/klines",
-                params={"symbol": symbol, "interval": "1h", "limit": 300},
-            )
-            r2.raise_for_status()
-            kl = r2.json()
-            closes = [float(x[4]) for x in kl]  # close index 4
-
-        self._cb_on_success()
-        return PricePoint(last=last, ohlcv_close=closes)
+            raise ProviderUnavailable("no_binance_symbol")
+        if self._quarantined(symbol):
+            raise ProviderUnavailable("invalid_binance_symbol")
+
+        client = get_client(self.base_url)
+        return await self.health.call(self._fetch(client, symbol))
+
+    async def _fetch(self, client, symbol: str) -> PricePoint:
+        # last price
+        r = await client.get(f"{self.base_url}/api/v3/ticker/price", params={"symbol": symbol})
+        r.raise_for_status()
+        last = float(r.json()["price"])
+        return await self._pricepoint(client, symbol, last)
+
+    async def get_pricepoints(
+        self, assets: list[dict], out: dict[str, PricePoint] | None = None,
+    ) -> dict[str, PricePoint]:
+        out = {} if out is None else out
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
+
+        by_symbol = {
+            a["binance_symbol"]: a["symbol"]
+            for a in assets if a.get("binance_symbol") and not self._quarantined(a["binance_symbol"])
+        }
+        if not by_symbol:
+            return out
+
+        client = get_client(self.base_url)
+        try:
+            with fetch_timed():
+                # every last price in one request: symbols=["BTCUSDT","ETHUSDT",...]
+                r = await client.get(
+                    f"{self.base_url}/api/v3/ticker/price",
+                    params={"symbols": json.dumps(list(by_symbol), separators=(",", ":"))},
+                )
+                if _invalid_symbol(r):
+                    # one unknown symbol fails the whole list: take the full ticker list instead,
+                    # filter it here and keep the symbols Binance doesn't have out of later batches
+                    r = await client.get(f"{self.base_url}/api/v3/ticker/price")
+                    r.raise_for_status()
+                    lasts = {x["symbol"]: float(x["price"]) for x in r.json() if x["symbol"] in by_symbol}
+                    unknown = sorted(by_symbol.keys() - lasts.keys())
+                    for s in unknown:
+                        self._invalid[s] = time.time() + INVALID_RECHECK_SEC
+                    log.warning("binance does not list %s: left out of its batches for %ds", unknown, INVALID_RECHECK_SEC)
+                else:
+                    r.raise_for_status()
+                    lasts = {x["symbol"]: float(x["price"]) for x in r.json()}
+        except Exception as e:
+            self.health.on_failure(e)
+            raise
+
+        return await gather_into(
+            out, ((by_symbol[s], self.health.call(self._pricepoint(client, s, lasts[s]))) for s in by_symbol if s in lasts),
+        )
+
+    async def _pricepoint(self, client, symbol: str, last: float) -> PricePoint:
+        # klines: 1h candles, last 300 closes; once seeded only fetch from the last open candle on
+        buf = self._candles.setdefault(symbol, CandleBuffer(maxlen=300, interval_sec=3600))
+        seed = buf.needs_seed(int(time.time()))
+        params = {"symbol": symbol, "interval": "1h", "limit": 300}
+        if not seed:
+            params["startTime"] = buf.last_open_ts * 1000
+        r2 = await client.get(f"{self.base_url}/api/v3/klines", params=params)
+        r2.raise_for_status()
+        kl = [(int(x[0]) // 1000, float(x[4])) for x in r2.json()]  # open time (ms), close index 4
+        if seed:
+            buf.seed(kl)
+        else:
+            buf.merge(kl)
+        return PricePoint(last=last, ohlcv_close=buf.closes(), source=self.name, seq=buf.appended)
+
+def _invalid_symbol(r) -> bool:
+    # HTTP 400 {"code": -1121, "msg": "Invalid symbol."}
+    if r.status_code != 400:
+        return False
+    try:
+        return r.json().get("code") == INVALID_SYMBOL
+    except ValueError:
+        return False
@@ -0,0 +1,47 @@
+from collections import deque
+from typing import Iterable
+
+class CandleBuffer:
+    # rolling window of (open_ts, close) for one symbol; the last entry is the still-open candle
+    def __init__(self, maxlen: int = 300, interval_sec: int = 3600):
+        self.maxlen = maxlen
+        self.interval_sec = interval_sec
+        self._open_ts: deque[int] = deque(maxlen=maxlen)
+        self._closes: deque[float] = deque(maxlen=maxlen)
+        self.appended = 0  # monotonic, survives re-seeds
+
+    def __len__(self) -> int:
+        return len(self._closes)
+
+    @property
+    def last_open_ts(self) -> int | None:
+        return self._open_ts[-1] if self._open_ts else None
+
+    def open_ts_for(self, ts: int) -> int:
+        return ts - (ts % self.interval_sec)
+
+    def needs_seed(self, now_ts: int) -> bool:
+        # empty, or the gap is too large to close with one incremental request
+        last = self.last_open_ts
+        return last is None or (now_ts - last) >= (self.maxlen - 1) * self.interval_sec
+
+    def seed(self, candles: Iterable[tuple[int, float]]) -> None:
+        self._open_ts.clear()
+        self._closes.clear()
+        self.merge(candles)
+
+    def merge(self, candles: Iterable[tuple[int, float]]) -> None:
+        # candles sorted by open_ts; same open_ts as the last one replaces it (candle still forming)
+        for open_ts, close in candles:
+            last = self.last_open_ts
+            if last is not None and open_ts < last:
+                continue
+            if open_ts == last:
+                self._closes[-1] = close
+            else:
+                self._open_ts.append(open_ts)
+                self._closes.append(close)
+                self.appended += 1
+
+    def closes(self) -> list[float]:
+        return list(self._closes)
@@ -1,54 +1,63 @@
 import time
-import httpx
-from app.settings import settings
-from app.providers.base import PricePoint
+from datetime import datetime, timezone
+from app.net.http import get_client
+from app.providers.base import PricePoint, ProviderUnavailable, emulate_batch
+from app.providers.candles import CandleBuffer
+from app.providers.health import registry
 
 class CoinbaseProvider:
     name = "COINBASE"
     base_url = "https://api.exchange.coinbase.com"
 
     def __init__(self):
-        self._fail_count = 0
-        self._cb_open_until = 0
-
-    def _cb_allow(self) -> bool:
-        return int(time.time()) >= self._cb_open_until
-
-    def _cb_on_failure(self) -> None:
-        self._fail_count += 1
-        if self._fail_count >= settings.cb_fail_threshold:
-            self._cb_open_until = int(time.time()) + settings.cb_open_seconds
-
-    def _cb_on_success(self) -> None:
-        self._fail_count = 0
-        self._cb_open_until = 0
+        self.health = registry.get(self.name)
+        self._candles: dict[str, CandleBuffer] = {}
 
     async def get_pricepoint(self, asset: dict) -> PricePoint:
-        if not self._cb_allow():
-            raise RuntimeError("circuit_open")
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
 
         product_id = asset.get("coinbase_product_id")
         if not product_id:
-            raise RuntimeError("no_coinbase_product_id")
-
-        timeout = httpx.Timeout(settings.http_timeout_sec)
-        headers = {"User-Agent": "price-alert-engine/1.0"}
-        async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-            # ticker (last)
-            r = await client.get(f"{self.base_url}/products/{product_id}/ticker")
-            r.raise_for_status()
-            last = float(r.json()["price"])
-
-            # candles (1h, 300 points) - Coinbase returns [time, low, high, open, close, volume]
-            r2 = await client.get(
-                f"{self.base_url}/products/{product_id}/candles",
-                params={"granularity": 3600},
-            )
-            r2.raise_for_status()
-            candles = r2.json()
-            # returned in reverse chronological order
-            candles_sorted = sorted(candles, key=lambda x: x[0])[-300:]
-            closes = [float(x[4]) for x in candles_sorted]
-
-        self._cb_on_success()
-        return PricePoint(last=last, ohlcv_close=closes)
+            raise ProviderUnavailable("no_coinbase_product_id")
+
+        client = get_client(self.base_url, headers={"User-Agent": "price-alert-engine/1.0"})
+        return await self.health.call(self._fetch(client, product_id))
+
+    async def _fetch(self, client, product_id: str) -> PricePoint:
+        # ticker (last)
+        r = await client.get(f"{self.base_url}/products/{product_id}/ticker")
+        r.raise_for_status()
+        last = float(r.json()["price"])
+
+        # candles (1h, 300 points) - Coinbase returns [time, low, high, open, close, volume]
+        # once seeded only ask for the range starting at the last (still open) candle
+        buf = self._candles.setdefault(product_id, CandleBuffer(maxlen=300, interval_sec=3600))
+        now = int(time.time())
+        seed = buf.needs_seed(now)
+        params = {"granularity": 3600}
+        if not seed:
+            params["start"] = _iso(buf.last_open_ts)
+            params["end"] = _iso(now)
+        r2 = await client.get(f"{self.base_url}/products/{product_id}/candles", params=params)
+        r2.raise_for_status()
+        candles = r2.json()
+        # returned in reverse chronological order
+        candles_sorted = sorted(candles, key=lambda x: x[0])[-300:]
+        cs = [(int(x[0]), float(x[4])) for x in candles_sorted]
+        if seed:
+            buf.seed(cs)
+        else:
+            buf.merge(cs)
+        return PricePoint(last=last, ohlcv_close=buf.closes(), source=self.name, seq=buf.appended)
+
+    async def get_pricepoints(
+        self, assets: list[dict], out: dict[str, PricePoint] | None = None,
+    ) -> dict[str, PricePoint]:
+        # the Exchange API has no multi-product ticker: emulated with bounded per-product calls
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
+        return await emulate_batch(self, [a for a in assets if a.get("coinbase_product_id")], out)
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
@@ -1,54 +1,79 @@
 import time
-import httpx
-from app.settings import settings
-from app.providers.base import PricePoint
+from app.net.http import get_client
+from app.providers.base import PricePoint, ProviderUnavailable, fetch_timed, gather_into
+from app.providers.candles import CandleBuffer
+from app.providers.health import registry
 
 class CoinGeckoProvider:
     name = "COINGECKO"
     base_url = "https://api.coingecko.com/api/v3"
 
     def __init__(self):
-        self._fail_count = 0
-        self._cb_open_until = 0
-
-    def _cb_allow(self) -> bool:
-        return int(time.time()) >= self._cb_open_until
-
-    def _cb_on_failure(self) -> None:
-        self._fail_count += 1
-        if self._fail_count >= settings.cb_fail_threshold:
-            self._cb_open_until = int(time.time()) + settings.cb_open_seconds
-
-    def _cb_on_success(self) -> None:
-        self._fail_count = 0
-        self._cb_open_until = 0
+        self.health = registry.get(self.name)
+        self._candles: dict[str, CandleBuffer] = {}
 
     async def get_pricepoint(self, asset: dict) -> PricePoint:
-        if not self._cb_allow():
-            raise RuntimeError("circuit_open")
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
 
         cg_id = asset.get("coingecko_id")
         if not cg_id:
-            raise RuntimeError("no_coingecko_id")
-
-        timeout = httpx.Timeout(settings.http_timeout_sec)
-        headers = {"accept": "application/json"}
-        async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-            r = await client.get(
-                f"{self.base_url}/simple/price",
-                params={"ids": cg_id, "vs_currencies": "usd"},
-            )
-            r.raise_for_status()
-            last = float(r.json()[cg_id]["usd"])
+            raise ProviderUnavailable("no_coingecko_id")
+
+        client = get_client(self.base_url, headers={"accept": "application/json"})
+        return await self.health.call(self._fetch(client, cg_id))
+
+    async def _fetch(self, client, cg_id: str) -> PricePoint:
+        r = await client.get(
+            f"{self.base_url}/simple/price",
+            params={"ids": cg_id, "vs_currencies": "usd"},
+        )
+        r.raise_for_status()
+        last = float(r.json()[cg_id]["usd"])
+        return await self._pricepoint(client, cg_id, last)
 
-            # market chart (hourly-ish): last 7d, then take last 300 points as "closes"
+    async def get_pricepoints(
+        self, assets: list[dict], out: dict[str, PricePoint] | None = None,
+    ) -> dict[str, PricePoint]:
+        out = {} if out is None else out
+        if not self.health.allow():
+            raise ProviderUnavailable("circuit_open")
+
+        by_id = {a["coingecko_id"]: a["symbol"] for a in assets if a.get("coingecko_id")}
+        if not by_id:
+            return out
+
+        client = get_client(self.base_url, headers={"accept": "application/json"})
+        try:
+            with fetch_timed():
+                # every last price in one request: ids=bitcoin,ethereum,...
+                r = await client.get(
+                    f"{self.base_url}/simple/price",
+                    params={"ids": ",".join(by_id), "vs_currencies": "usd"},
+                )
+                r.raise_for_status()
+                lasts = {k: float(v["usd"]) for k, v in r.json().items() if "usd" in v}
+        except Exception as e:
+            self.health.on_failure(e)
+            raise
+
+        return await gather_into(
+            out, ((by_id[i], self.health.call(self._pricepoint(client, i, lasts[i]))) for i in by_id if i in lasts),
+        )
+
+    async def _pricepoint(self, client, cg_id: str, last: float) -> PricePoint:
+        # market chart (hourly-ish): last 7d, only to seed the buffer. CoinGecko has no
+        # incremental hourly endpoint, so after that the live price rolls the current hour
+        # (re-seed if we missed a whole hour, otherwise the series would have holes)
+        buf = self._candles.setdefault(cg_id, CandleBuffer(maxlen=300, interval_sec=3600))
+        now = int(time.time())
+        if buf.needs_seed(now) or buf.open_ts_for(now) - buf.last_open_ts > buf.interval_sec:
             r2 = await client.get(
                 f"{self.base_url}/coins/{cg_id}/market_chart",
                 params={"vs_currency": "usd", "days": "7"},
             )
             r2.raise_for_status()
             prices = r2.json().get("prices", [])
-            closes = [float(p[1]) for p in prices][-300:]
-
-        self._cb_on_success()
-        return PricePoint(last=last, ohlcv_close=closes)
+            buf.seed((buf.open_ts_for(int(p[0]) // 1000), float(p[1])) for p in prices)
+        buf.merge([(buf.open_ts_for(now), last)])
+        return PricePoint(last=last, ohlcv_close=buf.closes(), source=self.name, seq=buf.appended)
@@ -1,6 +1,9 @@
+from collections import deque
 from dataclasses import dataclass
 from math import sqrt
 from app.settings import settings
+from app.providers.base import PricePoint
+from app.observability.tracing import traced
 
 @dataclass
 class Features:
@@ -46,6 +49,7 @@ def _atr_approx(closes: list[float], period: int) -> float:
         return 0.0
     return sum(window) / len(window)
 
+@traced("compute_features")
 def compute_features(last: float, closes: list[float]) -> Features:
     closes2 = closes[-max(settings.ema_long * 2, 300):] if closes else []
     if closes2 and last > 0:
@@ -73,3 +77,165 @@ def compute_features(last: float, closes: list[float]) -> Features:
         vol_pct=float(vol_pct),
         regime=regime,
     )
+
+class _RollingEma:
+    # EMA over a sliding window seeded with the window's first value (same as _ema on the slice):
+    #   ema = a^(n-1) * x0 + k * T,   T = sum_{i>=1} a^(n-1-i) * x_i
+    def __init__(self, period: int):
+        self.k = 2 / (period + 1)
+        self.a = 1 - self.k
+        self.tail = 0.0
+
+    def push(self, n_before: int, x: float) -> None:
+        self.tail = 0.0 if n_before == 0 else self.a * self.tail + x
+
+    def pop_front(self, n_before: int, x1: float) -> None:
+        # x1 (second value) becomes the new seed, so it leaves the tail sum
+        self.tail = 0.0 if n_before <= 1 else self.tail - (self.a ** (n_before - 2)) * x1
+
+    def value(self, seed: float, n: int, live: float) -> float:
+        if n == 0:
+            return live
+        closed = (self.a ** (n - 1)) * seed + self.k * self.tail
+        return live * self.k + closed * self.a
+
+class FeatureState:
+    # incremental compute_features for one symbol: O(1) per closed candle / live price.
+    # Tracks the closed candles (everything but the still-open last one) of the same
+    # window compute_features would slice, so both return the same Features.
+    _RESYNC_EVERY = 1024  # rebuild rolling sums now and then to bound float drift
+
+    def __init__(self):
+        self.window = max(settings.ema_long * 2, 300)
+        self.vol_window = settings.vol_window
+        self.atr_period = settings.atr_period
+        self.source = ""
+        self.seq: int | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._closed: deque[float] = deque()
+        self._ema_s = _RollingEma(settings.ema_short)
+        self._ema_l = _RollingEma(settings.ema_long)
+        self._rets: deque[float | None] = deque()  # None == skipped (prev <= 0)
+        self._ret_sum = 0.0
+        self._ret_sq = 0.0
+        self._ret_n = 0
+        self._deltas: deque[float] = deque()
+        self._delta_sum = 0.0
+        self._pushes = 0
+
+    def _push(self, x: float) -> None:
+        n = len(self._closed)
+        self._ema_s.push(n, x)
+        self._ema_l.push(n, x)
+        if n:
+            prev = self._closed[-1]
+            r = (x / prev) - 1.0 if prev > 0 else None
+            self._rets.append(r)
+            if r is not None:
+                self._ret_sum += r
+                self._ret_sq += r * r
+                self._ret_n += 1
+            d = abs(x - prev)
+            self._deltas.append(d)
+            self._delta_sum += d
+        self._closed.append(x)
+        self._trim_pairs()
+        self._pushes += 1
+
+    def _pop_front(self) -> None:
+        n = len(self._closed)
+        x1 = self._closed[1] if n > 1 else 0.0
+        self._ema_s.pop_front(n, x1)
+        self._ema_l.pop_front(n, x1)
+        self._closed.popleft()
+        self._trim_pairs()
+
+    def _trim_pairs(self) -> None:
+        # returns use the last vol_window closed values (+ live), ATR the last atr_period-1 deltas (+ live)
+        n = len(self._closed)
+        while len(self._rets) > max(0, min(self.vol_window, n) - 1):
+            r = self._rets.popleft()
+            if r is not None:
+                self._ret_sum -= r
+                self._ret_sq -= r * r
+                self._ret_n -= 1
+        while len(self._deltas) > max(0, min(self.atr_period, n) - 1):
+            self._delta_sum -= self._deltas.popleft()
+
+    def _rebuild(self, closed: list[float]) -> None:
+        self._reset()
+        for x in closed:
+            self._push(x)
+        self._pushes = 0
+
+    def update(self, pp: PricePoint) -> Features:
+        closes = pp.ohlcv_close
+        if not closes:
+            self._reset()
+            self.seq = None
+            return compute_features(pp.last, closes)
+
+        cap = min(self.window, len(closes)) - 1
+        new = None
+        if pp.seq is not None and self.seq is not None and pp.source == self.source:
+            new = pp.seq - self.seq
+        if new is None or new < 0 or new >= len(closes) or self._pushes >= self._RESYNC_EVERY:
+            self._rebuild(closes[-(cap + 1):-1] if cap > 0 else [])
+        else:
+            # the candle that was open last time and any newer ones have closed
+            for i in range(new, 0, -1):
+                self._push(float(closes[-1 - i]))
+            while len(self._closed) > cap:
+                self._pop_front()
+        self.source = pp.source
+        self.seq = pp.seq
+
+        live = pp.last if pp.last > 0 else closes[-1]
+        return self._features(pp.last, live)
+
+    def _features(self, last: float, live: float) -> Features:
+        n = len(self._closed)
+        seed = self._closed[0] if n else live
+        ema_s = self._ema_s.value(seed, n, live)
+        ema_l = self._ema_l.value(seed, n, live)
+
+        s1, s2, cnt = self._ret_sum, self._ret_sq, self._ret_n
+        if n and self._closed[-1] > 0:
+            r = (live / self._closed[-1]) - 1.0
+            s1 += r
+            s2 += r * r
+            cnt += 1
+        vol = sqrt(max(0.0, (s2 - s1 * s1 / cnt) / (cnt - 1))) if cnt >= 2 else 0.0
+
+        atr = 0.0
+        if n:
+            atr = (self._delta_sum + abs(live - self._closed[-1])) / min(n, self.atr_period)
+
+        regime = "SIDEWAYS"
+        if ema_s > ema_l * 1.001:
+            regime = "BULL"
+        elif ema_s < ema_l * 0.999:
+            regime = "BEAR"
+
+        return Features(
+            last=float(last),
+            atr=float(atr),
+            ema_short=float(ema_s),
+            ema_long=float(ema_l),
+            vol_pct=float(vol),
+            regime=regime,
+        )
+
+class FeatureEngine:
+    # per-symbol FeatureState registry, meant to live as long as the worker
+    def __init__(self):
+        self.states: dict[str, FeatureState] = {}
+
+    @traced("features.update")
+    def update(self, symbol: str, pp: PricePoint) -> Features:
+        st = self.states.get(symbol)
+        if st is None:
+            st = self.states[symbol] = FeatureState()
+        return st.update(pp)
@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.settings import settings
+from app.providers.features import Features
+
+# Vectorized compute_features for many symbols at once. compute_features (scalar) stays
+# the reference implementation; this must agree with it row by row within float tolerance.
+
+@dataclass
+class FeatureBatch:
+    last: np.ndarray
+    atr: np.ndarray
+    ema_short: np.ndarray
+    ema_long: np.ndarray
+    vol_pct: np.ndarray
+    regime: np.ndarray  # str: BULL/BEAR/SIDEWAYS
+
+    def __len__(self) -> int:
+        return len(self.last)
+
+    def row(self, i: int) -> Features:
+        return Features(
+            last=float(self.last[i]),
+            atr=float(self.atr[i]),
+            ema_short=float(self.ema_short[i]),
+            ema_long=float(self.ema_long[i]),
+            vol_pct=float(self.vol_pct[i]),
+            regime=str(self.regime[i]),
+        )
+
+def _ema(x: np.ndarray, valid: np.ndarray, first: np.ndarray, period: int) -> np.ndarray:
+    # closed form of _ema: seed (first valid col) weighs a^age, every later value k*a^age
+    n = x.shape[1]
+    k = 2 / (period + 1)
+    decay = (1 - k) ** np.arange(n - 1, -1, -1, dtype=np.float64)  # a^age, age 0 == last col
+    w = np.where(valid, k * decay, 0.0)
+    rows = np.nonzero(first < n)[0]
+    w[rows, first[rows]] = decay[first[rows]]
+    return (x * w).sum(axis=1)
+
+def compute_features_batch(
+    closes: np.ndarray,
+    last: np.ndarray,
+    lengths: np.ndarray | None = None,
+) -> FeatureBatch:
+    # closes: symbols x candles, right-aligned (newest in the last column). Shorter histories are
+    # left-padded (NaN) or described by `lengths` = number of valid trailing columns per row.
+    closes = np.asarray(closes, dtype=np.float64)
+    last = np.asarray(last, dtype=np.float64)
+    if closes.ndim != 2 or last.shape != (closes.shape[0],):
+        raise ValueError("closes must be (symbols, candles) and last (symbols,)")
+
+    if lengths is None:
+        lengths = (~np.isnan(closes)).sum(axis=1)
+    window = max(settings.ema_long * 2, 300)
+    if closes.shape[1] > window:
+        closes = closes[:, -window:]
+    s, n = closes.shape
+    lengths = np.minimum(np.asarray(lengths, dtype=np.int64), n)
+    if n == 0:
+        # no candles for anyone yet (cold start): what compute_features gives for []
+        zeros = np.zeros(s)
+        return FeatureBatch(last.copy(), zeros, zeros.copy(), zeros.copy(), zeros.copy(), np.full(s, "SIDEWAYS"))
+
+    col = np.arange(n)
+    first = n - lengths  # first valid column (== n when the row is empty)
+    valid = col[None, :] >= first[:, None]
+    x = np.where(valid, closes, 0.0)
+
+    live = (last > 0) & (lengths > 0)
+    x[live, -1] = last[live]
+
+    ema_s = _ema(x, valid, first, settings.ema_short)
+    ema_l = _ema(x, valid, first, settings.ema_long)
+
+    # returns over the last vol_window+1 values, skipping prev <= 0
+    prev, cur = x[:, :-1], x[:, 1:]
+    pair_ok = valid[:, :-1] & valid[:, 1:]
+    ret_ok = pair_ok & (prev > 0) & (col[None, :-1] >= n - settings.vol_window - 1)
+    rets = np.divide(cur, prev, out=np.ones_like(cur), where=ret_ok) - 1.0
+    cnt = ret_ok.sum(axis=1)
+    mean = np.where(ret_ok, rets, 0.0).sum(axis=1) / np.maximum(cnt, 1)
+    sq = np.where(ret_ok, (rets - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    vol = np.where(cnt >= 2, np.sqrt(sq / np.maximum(cnt - 1, 1)), 0.0)
+
+    # ATR proxy: mean abs close delta over the last atr_period deltas
+    atr_ok = pair_ok & (col[None, 1:] >= n - settings.atr_period)
+    atr_n = atr_ok.sum(axis=1)
+    atr_sum = np.where(atr_ok, np.abs(cur - prev), 0.0).sum(axis=1)
+    atr = np.divide(atr_sum, atr_n, out=np.zeros(s), where=atr_n > 0)
+
+    regime = np.where(
+        ema_s > ema_l * 1.001, "BULL",
+        np.where(ema_s < ema_l * 0.999, "BEAR", "SIDEWAYS"),
+    )
+
+    return FeatureBatch(
+        last=last.copy(),
+        atr=atr,
+        ema_short=ema_s,
+        ema_long=ema_l,
+        vol_pct=vol,
+        regime=regime,
+    )
+
+def _ema_series(x: np.ndarray, period: int, window: int) -> np.ndarray:
+    # _ema over the sliding window ending at every t (seeded with the window's first value):
+    # a FIR filter (k*a^age, a^(W-1) for the seed), applied with an FFT convolution
+    t_len = len(x)
+    k = 2 / (period + 1)
+    a = 1 - k
+    w = min(window, t_len)
+    kernel = k * a ** np.arange(w, dtype=np.float64)
+    if w == window:
+        kernel[-1] = a ** (w - 1)
+    size = 1 << int(t_len + w - 1).bit_length()
+    y = np.fft.irfft(np.fft.rfft(x, size) * np.fft.rfft(kernel, size), size)[:t_len]
+    # windows that still start at x0 weigh it a^t (seed), not k*a^t
+    head = min(t_len, window - 1)
+    y[:head] += a ** np.arange(1, head + 1, dtype=np.float64) * x[0]
+    return y
+
+def _window_sum(v: np.ndarray, width: int) -> np.ndarray:
+    # sum of v[t-width+1 .. t] for every t (shorter at the start)
+    padded = np.concatenate((np.zeros(width - 1), v))
+    return np.lib.stride_tricks.sliding_window_view(padded, width).sum(axis=1)
+
+def compute_features_series(closes: np.ndarray) -> FeatureBatch:
+    # Features at every candle of one symbol's history, as compute_features(closes[t], closes[:t+1])
+    # would give them candle by candle (same tolerance as compute_features_batch). Row t == candle t.
+    x = np.asarray(closes, dtype=np.float64)
+    t_len = len(x)
+    if t_len == 0:
+        empty = np.zeros(0)
+        return FeatureBatch(empty, empty, empty, empty, empty, np.zeros(0, dtype="<U8"))
+    window = max(settings.ema_long * 2, 300)
+
+    ema_s = _ema_series(x, settings.ema_short, window)
+    ema_l = _ema_series(x, settings.ema_long, window)
+
+    prev = np.concatenate(([0.0], x[:-1]))
+    ok = prev > 0
+    ok[0] = False
+    r = np.divide(x, prev, out=np.ones(t_len), where=ok) - 1.0
+    r[~ok] = 0.0
+    cnt = _window_sum(ok.astype(np.float64), settings.vol_window)
+    s1 = _window_sum(r, settings.vol_window)
+    s2 = _window_sum(r * r, settings.vol_window)
+    var = np.divide(s2 - s1 * s1 / np.maximum(cnt, 1), cnt - 1, out=np.zeros(t_len), where=cnt >= 2)
+    vol = np.sqrt(np.maximum(var, 0.0))
+
+    d = np.abs(x - prev)
+    d[0] = 0.0
+    atr_n = np.minimum(np.arange(t_len), settings.atr_period)
+    atr = np.divide(_window_sum(d, settings.atr_period), atr_n, out=np.zeros(t_len), where=atr_n > 0)
+
+    regime = np.where(
+        ema_s > ema_l * 1.001, "BULL",
+        np.where(ema_s < ema_l * 0.999, "BEAR", "SIDEWAYS"),
+    )
+    return FeatureBatch(last=x.copy(), atr=atr, ema_short=ema_s, ema_long=ema_l, vol_pct=vol, regime=regime)
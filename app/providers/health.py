@@ -0,0 +1,157 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, TypeVar
+
+from app.settings import settings
+from app.observability import metrics
+
+T = TypeVar("T")
+
+class LatencyWindow:
+    # recent successful request latencies of one provider (for the hedge delay)
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def observe(self, sec: float) -> None:
+        self._samples.append(sec)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        xs = sorted(self._samples)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+class ProviderHealth:
+    # latency/error EWMAs plus the circuit breaker of one provider (shared by every caller)
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = LatencyWindow()
+        self.ewma_latency_sec: float | None = None
+        self.error_rate = 0.0  # EWMA of failures (0..1)
+        self.requests = 0
+        self.failures = 0
+        self.last_error = ""
+        self._fail_count = 0  # consecutive
+        self._cb_open_until = 0
+
+    def allow(self) -> bool:
+        return int(time.time()) >= self._cb_open_until
+
+    @property
+    def state(self) -> str:
+        if not self.allow():
+            return "open"
+        if self._fail_count >= settings.cb_fail_threshold:
+            return "half_open"  # next failure reopens, next success closes
+        return "closed"
+
+    def _ewma(self, prev: float | None, x: float) -> float:
+        a = settings.health_ewma_alpha
+        return x if prev is None else prev + a * (x - prev)
+
+    def on_success(self, latency_sec: float) -> None:
+        self.requests += 1
+        metrics.provider_requests.inc(self.name, "ok")
+        metrics.provider_seconds.observe(latency_sec, self.name)
+        self.latency.observe(latency_sec)
+        self.ewma_latency_sec = self._ewma(self.ewma_latency_sec, latency_sec)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        self._fail_count = 0
+        self._cb_open_until = 0
+
+    def on_failure(self, err: BaseException) -> None:
+        self.requests += 1
+        self.failures += 1
+        metrics.provider_requests.inc(self.name, "error")
+        self.last_error = repr(err)[:200]
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        self._fail_count += 1
+        if self._fail_count >= settings.cb_fail_threshold:
+            self._cb_open_until = int(time.time()) + settings.cb_open_seconds
+
+    def on_cancel(self, elapsed_sec: float) -> None:
+        # hedge loser: not an error, but it was at least this slow
+        metrics.provider_requests.inc(self.name, "cancelled")
+        self.ewma_latency_sec = self._ewma(self.ewma_latency_sec, max(elapsed_sec, self.ewma_latency_sec or 0.0))
+
+    async def call(self, aw: Awaitable[T]) -> T:
+        t0 = time.perf_counter()
+        try:
+            res = await aw
+        except asyncio.CancelledError:
+            self.on_cancel(time.perf_counter() - t0)
+            raise
+        except Exception as e:
+            self.on_failure(e)
+            raise
+        self.on_success(time.perf_counter() - t0)
+        return res
+
+    def cost(self) -> float | None:
+        # expected seconds to a good answer: latency inflated by the chance of failing
+        if self.ewma_latency_sec is None:
+            return None
+        return self.ewma_latency_sec / max(1.0 - self.error_rate, 0.05)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "ewma_latency_ms": None if self.ewma_latency_sec is None else round(self.ewma_latency_sec * 1000, 1),
+            "p95_latency_ms": _ms(self.latency.quantile(0.95)),
+            "error_rate": round(self.error_rate, 4),
+            "consecutive_failures": self._fail_count,
+            "open_until": self._cb_open_until or None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error or None,
+        }
+
+def _ms(sec: float | None) -> float | None:
+    return None if sec is None else round(sec * 1000, 1)
+
+class HealthRegistry:
+    def __init__(self):
+        self._providers: dict[str, ProviderHealth] = {}
+
+    def get(self, name: str) -> ProviderHealth:
+        h = self._providers.get(name)
+        if h is None:
+            h = self._providers[name] = ProviderHealth(name)
+        return h
+
+    def rank(self, order: list[str]) -> list[str]:
+        # configured order, except that a healthy provider moves ahead of an earlier one whose
+        # cost is worse by more than PROVIDER_RANK_MARGIN; open breakers go last
+        if not settings.provider_adaptive:
+            return list(order)
+        ranked: list[str] = []
+        for name in order:
+            i = len(ranked)
+            while i > 0 and self._ahead(name, ranked[i - 1]):
+                i -= 1
+            ranked.insert(i, name)
+        return ranked
+
+    def _ahead(self, a: str, b: str) -> bool:
+        ha, hb = self.get(a), self.get(b)
+        if ha.allow() != hb.allow():
+            return ha.allow()
+        ca, cb = ha.cost(), hb.cost()
+        if ca is None or cb is None:
+            return False
+        return ca * (1 + settings.provider_rank_margin) < cb
+
+    def snapshot(self, order: list[str] | None = None) -> dict:
+        names = order or list(self._providers)
+        return {
+            "order": self.rank(names),
+            "providers": {n: self.get(n).snapshot() for n in names},
+        }
+
+# process-wide, like the shared http clients: every aggregator/provider sees the same health
+registry = HealthRegistry()
+metrics.provider_breaker_open.set_function(
+    lambda: {(n,): 0.0 if h.allow() else 1.0 for n, h in list(registry._providers.items())}
+)
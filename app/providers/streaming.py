@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+import random
+import logging
+from typing import Callable
+
+from app.settings import settings
+
+try:
+    import websockets
+except ImportError:  # optional: poetry install -E stream
+    websockets = None
+
+log = logging.getLogger("stream")
+
+OnPrice = Callable[[str, float], None]  # (asset symbol, price)
+
+class PriceStream:
+    # One WebSocket connection to an exchange feed: subscribe to every mapped symbol,
+    # reconnect with jittered exponential backoff, resubscribe after reconnects or when the
+    # symbol set changes, and drop the connection if nothing arrives within the heartbeat.
+    name = "BASE"
+    asset_key = ""  # asset dict field holding the upstream id
+
+    def __init__(self, url: str, on_price: OnPrice):
+        self.url = url
+        self.on_price = on_price
+        self._symbols: dict[str, str] = {}  # upstream id -> asset symbol
+        self._changed = asyncio.Event()
+        self.connected = False
+        self.last_msg_ts = 0.0
+        self.reconnects = 0
+
+    def set_assets(self, assets: list[dict]) -> None:
+        mapping = {self._upstream_id(a[self.asset_key]): a["symbol"] for a in assets if a.get(self.asset_key)}
+        if mapping != self._symbols:
+            self._symbols = mapping
+            self._changed.set()
+
+    async def run(self) -> None:
+        if websockets is None:
+            raise RuntimeError("streaming mode requires the 'websockets' package")
+        attempt = 0
+        while True:
+            if not self._symbols:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            resubscribe = False
+            connected_at = time.monotonic()
+            try:
+                async with websockets.connect(
+                    self.url,
+                    ping_interval=20,
+                    ping_timeout=20,
+                    open_timeout=settings.http_timeout_sec,
+                ) as ws:
+                    self._changed.clear()
+                    for msg in self._subscribe_messages(list(self._symbols)):
+                        await ws.send(json.dumps(msg))
+                    self.connected = True
+                    log.info("%s stream connected (%d symbols)", self.name, len(self._symbols))
+                    resubscribe = await self._read(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("%s stream dropped: %r", self.name, e)
+            finally:
+                self.connected = False
+
+            if resubscribe:
+                continue
+            if time.monotonic() - connected_at >= settings.stream_heartbeat_sec:
+                attempt = 0  # it was healthy for a while: start backoff over
+            self.reconnects += 1
+            attempt += 1
+            delay = min(settings.stream_backoff_max_sec, 0.5 * (2 ** min(attempt, 10)))
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def _read(self, ws) -> bool:
+        # returns True when the symbol set changed (reconnect right away and resubscribe)
+        changed = asyncio.ensure_future(self._changed.wait())
+        try:
+            while True:
+                recv = asyncio.ensure_future(ws.recv())
+                done, _ = await asyncio.wait(
+                    {recv, changed},
+                    timeout=settings.stream_heartbeat_sec,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if changed in done:
+                    recv.cancel()
+                    return True
+                if not done:
+                    recv.cancel()
+                    raise TimeoutError(f"no message in {settings.stream_heartbeat_sec}s (watchdog)")
+
+                self.last_msg_ts = time.time()
+                for upstream_id, price in self._parse(json.loads(recv.result())):
+                    symbol = self._symbols.get(upstream_id)
+                    if symbol and price > 0:
+                        self.on_price(symbol, price)
+        finally:
+            changed.cancel()
+
+    def _upstream_id(self, raw: str) -> str:
+        return raw
+
+    def _subscribe_messages(self, ids: list[str]) -> list[dict]:
+        raise NotImplementedError
+
+    def _parse(self, msg) -> list[tuple[str, float]]:
+        raise NotImplementedError
+
+class BinanceStream(PriceStream):
+    name = "BINANCE"
+    asset_key = "binance_symbol"
+
+    def _upstream_id(self, raw: str) -> str:
+        return raw.upper()
+
+    def _subscribe_messages(self, ids: list[str]) -> list[dict]:
+        # 1s mini-ticker per symbol (close == last price); Binance caps params per request
+        streams = [f"{s.lower()}@miniTicker" for s in ids]
+        return [
+            {"method": "SUBSCRIBE", "params": streams[i:i + 200], "id": i // 200 + 1}
+            for i in range(0, len(streams), 200)
+        ]
+
+    def _parse(self, msg) -> list[tuple[str, float]]:
+        events = msg if isinstance(msg, list) else [msg.get("data", msg)]
+        return [
+            (e["s"], float(e["c"]))
+            for e in events
+            if isinstance(e, dict) and e.get("e") == "24hrMiniTicker"
+        ]
+
+class CoinbaseStream(PriceStream):
+    name = "COINBASE"
+    asset_key = "coinbase_product_id"
+
+    def _subscribe_messages(self, ids: list[str]) -> list[dict]:
+        # heartbeat channel keeps the watchdog fed on quiet products
+        return [{"type": "subscribe", "product_ids": ids, "channels": ["ticker", "heartbeat"]}]
+
+    def _parse(self, msg) -> list[tuple[str, float]]:
+        if isinstance(msg, dict) and msg.get("type") == "ticker" and "price" in msg:
+            return [(msg["product_id"], float(msg["price"]))]
+        return []
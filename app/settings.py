@@ -7,6 +7,12 @@ def _get_int(name: str, default: int) -> int:
     except ValueError:
         return default
 
+def _get_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
 def _get_float(name: str, default: float) -> float:
     try:
         return float(os.getenv(name, str(default)))
@@ -15,13 +21,41 @@ def _get_float(name: str, default: float) -> float:
 
 class Settings(BaseModel):
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./data.db")
+    # async driver URL for the worker/API; empty == DATABASE_URL with the async driver
+    # (postgresql+psycopg, sqlite+aiosqlite)
+    async_database_url: str = os.getenv("ASYNC_DATABASE_URL", "")
 
     telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     telegram_chat_id: str = os.getenv("TELEGRAM_CHAT_ID", "")
 
     poll_interval_sec: int = _get_int("POLL_INTERVAL_SEC", 30)
+
+    # worker status listener (read-only views such as /health/providers); 0 disables it
+    worker_http_host: str = os.getenv("WORKER_HTTP_HOST", "0.0.0.0")
+    worker_http_port: int = _get_int("WORKER_HTTP_PORT", 9100)
     http_timeout_sec: float = _get_float("HTTP_TIMEOUT_SEC", 8.0)
 
+    # shared http pool (one client per upstream host)
+    http_max_connections: int = _get_int("HTTP_MAX_CONNECTIONS", 100)
+    http_max_keepalive: int = _get_int("HTTP_MAX_KEEPALIVE", 20)
+    http_keepalive_expiry_sec: float = _get_float("HTTP_KEEPALIVE_EXPIRY_SEC", 30.0)
+    http2: bool = _get_bool("HTTP2", False)
+
+    # horizontal sharding: assets hash into SHARD_PARTITIONS partitions leased to workers
+    # (worker_leases table). Every replica must use the same partition count; the lease TTL
+    # must comfortably exceed POLL_INTERVAL_SEC + tick time.
+    sharding: bool = _get_bool("SHARDING", False)
+    shard_partitions: int = _get_int("SHARD_PARTITIONS", 64)
+    shard_lease_ttl_sec: int = _get_int("SHARD_LEASE_TTL_SEC", 120)
+    worker_id: str = os.getenv("WORKER_ID", "")
+
+    # tick fan-out: max assets fetched in parallel (1 == sequential) and per-asset budget
+    worker_concurrency: int = _get_int("WORKER_CONCURRENCY", 16)
+    asset_timeout_sec: float = _get_float("ASSET_TIMEOUT_SEC", 20.0)
+    # one provider's whole batch call (last prices + every kline refresh); symbols that
+    # finished before it fires are kept, the rest go to the next provider
+    batch_timeout_sec: float = _get_float("BATCH_TIMEOUT_SEC", 30.0)
+
     ema_short: int = _get_int("EMA_SHORT", 50)
     ema_long: int = _get_int("EMA_LONG", 200)
     atr_period: int = _get_int("ATR_PERIOD", 14)
@@ -32,6 +66,84 @@ class Settings(BaseModel):
     cb_fail_threshold: int = _get_int("CB_FAIL_THRESHOLD", 4)
     cb_open_seconds: int = _get_int("CB_OPEN_SECONDS", 120)
 
+    # provider health: EWMA smoothing for latency/error rate; with PROVIDER_ADAPTIVE a provider
+    # jumps ahead of an earlier one in PROVIDER_ORDER only if its cost is better by the margin
+    health_ewma_alpha: float = _get_float("HEALTH_EWMA_ALPHA", 0.2)
+    provider_adaptive: bool = _get_bool("PROVIDER_ADAPTIVE", True)
+    provider_rank_margin: float = _get_float("PROVIDER_RANK_MARGIN", 0.5)
+
     price_cache_ttl_sec: int = _get_int("PRICE_CACHE_TTL_SEC", 8)
 
+    # hedged per-symbol fallback: next provider fires when the current one exceeds its
+    # observed HEDGE_QUANTILE latency (HEDGE_DELAY_SEC until enough samples)
+    hedge_delay_sec: float = _get_float("HEDGE_DELAY_SEC", 1.5)
+    hedge_min_delay_sec: float = _get_float("HEDGE_MIN_DELAY_SEC", 0.1)
+    hedge_quantile: float = _get_float("HEDGE_QUANTILE", 0.95)
+    # extra upstream requests (hedges + fallbacks after errors) allowed per tick
+    tick_retry_budget: int = _get_int("TICK_RETRY_BUDGET", 32)
+
+    # ingestion: "poll" (default) or "stream" (WebSocket push + polling as fallback)
+    ingest_mode: str = os.getenv("INGEST_MODE", "poll").strip().lower()
+    binance_ws_url: str = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/ws")
+    coinbase_ws_url: str = os.getenv("COINBASE_WS_URL", "wss://ws-feed.exchange.coinbase.com")
+    stream_heartbeat_sec: float = _get_float("STREAM_HEARTBEAT_SEC", 30.0)
+    stream_backoff_max_sec: float = _get_float("STREAM_BACKOFF_MAX_SEC", 60.0)
+    stream_min_move_pct: float = _get_float("STREAM_MIN_MOVE_PCT", 0.001)
+
+    # alert delivery queue: global + per-chat token buckets (Telegram allows ~30 msg/s overall
+    # and ~1 msg/s per chat); a chat with >= NOTIFY_DIGEST_THRESHOLD queued alerts gets digests
+    notify_rate_per_sec: float = _get_float("NOTIFY_RATE_PER_SEC", 25.0)
+    notify_burst: int = _get_int("NOTIFY_BURST", 25)
+    notify_chat_rate_per_sec: float = _get_float("NOTIFY_CHAT_RATE_PER_SEC", 1.0)
+    notify_chat_burst: int = _get_int("NOTIFY_CHAT_BURST", 3)
+    notify_digest_threshold: int = _get_int("NOTIFY_DIGEST_THRESHOLD", 5)
+    notify_digest_max: int = _get_int("NOTIFY_DIGEST_MAX", 20)
+    notify_queue_max: int = _get_int("NOTIFY_QUEUE_MAX", 10_000)
+    notify_max_attempts: int = _get_int("NOTIFY_MAX_ATTEMPTS", 5)
+    notify_drain_sec: float = _get_float("NOTIFY_DRAIN_SEC", 5.0)
+
+    # in-memory alert dedup index (bounded; falls back to the DB when it overflows)
+    dedup_max_entries: int = _get_int("DEDUP_MAX_ENTRIES", 200_000)
+
+    # POST /backtest: max upload size (CSV or .npz candles)
+    backtest_max_bytes: int = _get_int("BACKTEST_MAX_BYTES", 64 * 1024 * 1024)
+
+    # alerts partitioned by bucket range (ALERT_PARTITION_SEC, a multiple of the 300s bucket);
+    # partitions older than ALERT_RETENTION_DAYS (0 keeps everything) are dropped or, with
+    # ALERT_RETENTION_MODE=archive, detached and renamed to alerts_archive_p<start>. The worker
+    # runs that (and creates the next ALERT_PARTITIONS_AHEAD) every ALERT_PRUNE_INTERVAL_SEC (0: never)
+    alert_partition_sec: int = _get_int("ALERT_PARTITION_SEC", 86400)
+    alert_partitions_ahead: int = _get_int("ALERT_PARTITIONS_AHEAD", 2)
+    alert_retention_days: int = _get_int("ALERT_RETENTION_DAYS", 30)
+    alert_retention_mode: str = os.getenv("ALERT_RETENTION_MODE", "drop")
+    alert_prune_interval_sec: int = _get_int("ALERT_PRUNE_INTERVAL_SEC", 3600)
+
+    # API read-through cache for GET /assets, /holdings, /strategies/{symbol} (0 disables);
+    # POST/PUT invalidate it, the TTL bounds staleness from writes by other processes
+    api_cache_ttl_sec: float = _get_float("API_CACHE_TTL_SEC", 10.0)
+    api_cache_max_entries: int = _get_int("API_CACHE_MAX_ENTRIES", 1024)
+
+    # GET /assets, /holdings: max keyset page size, and rows per chunk of the NDJSON stream
+    api_page_max: int = _get_int("API_PAGE_MAX", 1000)
+    api_stream_chunk: int = _get_int("API_STREAM_CHUNK", 1000)
+
+    # bulk imports (/assets/bulk, /holdings/bulk, /strategies/bulk): max upload, rows per transaction
+    bulk_max_bytes: int = _get_int("BULK_MAX_BYTES", 64 * 1024 * 1024)
+    bulk_chunk_rows: int = _get_int("BULK_CHUNK_ROWS", 5000)
+
+    # /metrics (API and worker): cap on label combinations per metric (extra ones fold into "_other")
+    metrics_max_series: int = _get_int("METRICS_MAX_SERIES", 500)
+
+    # per-tick span trees; a tick slower than SLOW_TICK_SEC logs its tree (0 disables the dump)
+    tracing: bool = _get_bool("TRACING", True)
+    slow_tick_sec: float = _get_float("SLOW_TICK_SEC", 10.0)
+    trace_max_spans: int = _get_int("TRACE_MAX_SPANS", 5000)
+
+    # sampling profiler: PROFILE_TICKS profiles the first N ticks, SIGUSR1 the next
+    # PROFILE_SIGNAL_TICKS; collapsed stacks (flamegraph.pl / speedscope) go to PROFILE_DIR
+    profile_ticks: int = _get_int("PROFILE_TICKS", 0)
+    profile_signal_ticks: int = _get_int("PROFILE_SIGNAL_TICKS", 5)
+    profile_interval_ms: float = _get_float("PROFILE_INTERVAL_MS", 5.0)
+    profile_dir: str = os.getenv("PROFILE_DIR", "./profiles")
+
 settings = Settings()
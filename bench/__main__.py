@@ -0,0 +1,81 @@
+import argparse
+import json
+import logging
+import sys
+import time
+
+from bench.harness import measure, environment, compare
+
+# python -m bench                                  # everything -> bench/results.json
+# python -m bench -k tick -k repo --quick           # subset, smaller scales
+# python -m bench --baseline bench/baseline.json    # run + compare, exit 1 on regression
+# python -m bench --compare old.json new.json       # compare two result files, no run
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m bench", description="Engine hot-path benchmarks.")
+    p.add_argument("-k", "--filter", action="append", default=[], help="only cases whose name contains this (repeatable)")
+    p.add_argument("--quick", action="store_true", help="skip the largest scales")
+    p.add_argument("--repeat", type=int, default=7, help="timed samples per case (median is reported)")
+    p.add_argument("--target-sec", type=float, default=0.1, help="approximate duration of one sample")
+    p.add_argument("--out", default="bench/results.json", help="where to write the results JSON ('-' to skip)")
+    p.add_argument("--baseline", help="results JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.15, help="allowed median slowdown before failing (0.15 == +15%%)")
+    p.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="only compare two result files")
+    return p
+
+def _report(rows: list[dict], regressions: list[dict], threshold: float) -> int:
+    slow = {r["name"] for r in regressions}
+    width = max((len(r["name"]) for r in rows), default=10)
+    print(f"\n{'case':<{width}}  {'baseline ms':>12}  {'current ms':>12}  {'ratio':>6}")
+    for r in rows:
+        flag = "  << REGRESSION" if r["name"] in slow else ""
+        print(f"{r['name']:<{width}}  {r['baseline_ms']:>12.4f}  {r['current_ms']:>12.4f}  {r['ratio']:>6.2f}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {threshold:.0%}")
+        return 1
+    print(f"\nno regressions over {threshold:.0%} ({len(rows)} case(s) compared)")
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as fh:
+            baseline = json.load(fh)
+        with open(args.compare[1]) as fh:
+            current = json.load(fh)
+        return _report(*compare(current, baseline, args.threshold), args.threshold)
+
+    # worker warnings (failed symbols, etc.) are part of some cases, not something to print
+    logging.basicConfig(level=logging.ERROR)
+    from bench.cases import GROUPS
+
+    out = {"env": environment(), "quick": args.quick, "results": {}}
+    started = time.perf_counter()
+    for group in GROUPS.values():
+        for name, build in group(args.quick):
+            # filter on the name before build(): skipped cases don't set anything up
+            if args.filter and not any(k in name for k in args.filter):
+                continue
+            case = build()
+            try:
+                res = measure(case, repeat=args.repeat, target_sec=args.target_sec)
+            finally:
+                if case.teardown:
+                    case.teardown()
+            out["results"][case.name] = res.to_dict()
+            print(f"{case.name:<48} {res.median_ms:>12.4f} ms  (min {res.min_ms:.4f}, n={res.number}x{args.repeat})", flush=True)
+    print(f"{len(out['results'])} case(s) in {time.perf_counter() - started:.1f}s")
+
+    if args.out != "-":
+        with open(args.out, "w") as fh:
+            json.dump(out, fh, indent=2, sort_keys=True)
+        print(f"results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        return _report(*compare(out, baseline, args.threshold), args.threshold)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import asyncio
+from dataclasses import replace
+from typing import Callable, Iterator
+
+import numpy as np
+
+from app.engine.decision import Strategy, Holding, EngineState, decide
+from app.engine.decision_batch import decide_batch
+from app.engine.worker import Worker
+from app.notify.queue import AlertQueue
+from app.persistence.repo import Repo, PendingAlert
+from app.domain.signals import SignalKind
+from app.providers.base import PricePoint
+from app.providers.features import Features, FeatureState, compute_features
+from app.providers.features_batch import compute_features_batch, compute_features_series
+
+from bench.fakes import BenchDB, FakeProvider, NullNotifier
+from bench.harness import Case
+
+# Every group yields (name, build) pairs and build() sets the case up, so cases that -k
+# filters out never pay for their setup (e.g. a SQLite BenchDB). `quick` drops the largest
+# scales (CI smoke run).
+Lazy = tuple[str, Callable[[], Case]]
+
+def _walk(n: int, seed: int = 7) -> list[float]:
+    rng = np.random.default_rng(seed)
+    return (100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, n)))).tolist()
+
+# -------- features --------
+def features_cases(quick: bool) -> Iterator[Lazy]:
+    for hist in (50, 300) if quick else (50, 300, 1000):
+        name = f"features.compute[hist={hist}]"
+
+        def compute(name=name, hist=hist):
+            closes = _walk(hist)
+            return Case(name, lambda: compute_features(closes[-1] * 1.001, closes))
+
+        yield name, compute
+
+    def update_candle():
+        # steady state of the worker: one more closed candle per call (same list, seq + 1)
+        closes = _walk(300)
+        st = FeatureState()
+        pp = PricePoint(last=closes[-1], ohlcv_close=closes, source="bench", seq=0)
+
+        def step():
+            pp.seq += 1
+            st.update(pp)
+
+        return Case("features.update[new_candle]", step)
+
+    yield "features.update[new_candle]", update_candle
+
+    def update_live():
+        closes = _walk(300)
+        live = PricePoint(last=closes[-1] * 1.002, ohlcv_close=closes, source="bench2", seq=1)
+        st_live = FeatureState()
+        return Case("features.update[live_price]", lambda: st_live.update(live))
+
+    yield "features.update[live_price]", update_live
+
+    symbols = 100 if quick else 1000
+    name = f"features.batch[symbols={symbols},hist=300]"
+
+    def batch(name=name):
+        m = np.array([_walk(300, seed=i) for i in range(symbols)])
+        return Case(name, lambda: compute_features_batch(m, m[:, -1]))
+
+    yield name, batch
+
+    def series():
+        closes = np.array(_walk(8760))
+        return Case("features.series[hist=8760]", lambda: compute_features_series(closes))
+
+    yield "features.series[hist=8760]", series
+
+# -------- decide --------
+_NOW = 1_700_000_000
+_H = Holding(id=1, symbol="BENCH", entry=100.0, invested_amount=1000.0)
+_S = Strategy(base_tp=0.10, sl_pct=0.08, trail_atr_mult=2.5, profit_lock_pct=0.06, cooldown_sec=1800, confirm_regime=True)
+
+def _f(last: float, regime: str = "BULL") -> Features:
+    return Features(last=last, atr=5.0, ema_short=95.0, ema_long=94.0, vol_pct=0.01, regime=regime)
+
+# branch -> (strategy, features, state before the call)
+_BRANCHES = {
+    "cooldown": (_S, _f(101.0), EngineState(False, None, _NOW - 10)),
+    "trailing_stop": (_S, _f(110.0), EngineState(True, 130.0, None)),
+    "trailing_update": (_S, _f(121.0), EngineState(True, 120.0, None)),
+    "stop_loss": (_S, _f(90.0, "BEAR"), EngineState(False, None, None)),
+    # profit lock above the TP threshold, otherwise trailing activates first
+    "take_profit": (replace(_S, profit_lock_pct=0.5), _f(112.0), EngineState(False, None, None)),
+    "hold": (_S, _f(101.0), EngineState(False, None, None)),
+}
+
+def decide_cases(quick: bool) -> Iterator[Lazy]:
+    for branch, (s, f, st) in _BRANCHES.items():
+        name = f"decide.scalar[{branch}]"
+        # decide mutates the state: every call starts from a fresh copy
+        yield name, lambda name=name, s=s, f=f, st=st: Case(name, lambda: decide(_NOW, _H, s, f, replace(st)))
+
+    n = 100 if quick else 1000
+    name = f"decide.batch[holdings={n}]"
+
+    def batch(name=name):
+        rng = np.random.default_rng(7)
+        entry = rng.uniform(80.0, 130.0, n)
+        active = rng.random(n) < 0.3
+        anchor = np.where(active, entry * 1.2, np.nan)
+        lat = np.where(rng.random(n) < 0.1, _NOW - 10, 0)
+        f = _f(110.0)
+        return Case(name, lambda: decide_batch(_NOW, "BENCH", _S, f, entry, active, anchor, lat))
+
+    yield name, batch
+
+# -------- repo (SQLite) --------
+def repo_cases(quick: bool) -> Iterator[Lazy]:
+    for n in (100,) if quick else (100, 1000):
+        name = f"repo.load_tick_snapshot[holdings={n}]"
+
+        def snapshot(name=name, n=n):
+            db = BenchDB(n)
+
+            def load():
+                with db.Session() as s:
+                    Repo(s).load_tick_snapshot()
+
+            return Case(name, load, teardown=db.close)
+
+        yield name, snapshot
+
+        name = f"repo.flush_tick[states={n},alerts={n // 10}]"
+
+        def flush(name=name, n=n):
+            db = BenchDB(n)
+            with db.Session() as s:
+                ids = list(Repo(s).load_tick_snapshot().states)
+            bucket_now = [_NOW]
+
+            def write():
+                # every state dirty + an alert for 1 in 10 holdings, in a new bucket each call
+                bucket_now[0] += 300
+                states = {hid: EngineState(True, 100.0 + (hid % 7), bucket_now[0]) for hid in ids}
+                alerts = [PendingAlert(hid, SignalKind.TRAILING_UPDATE, "bench", bucket_now[0]) for hid in ids[::10]]
+                with db.Session() as s:
+                    Repo(s).flush_tick(states, alerts)
+
+            return Case(name, write, teardown=db.close)
+
+        yield name, flush
+
+        # a day of alert history, 1 in 10 holdings alerting every bucket
+        name = f"repo.recent_alert_keys[alerts={288 * len(range(0, n, 10))}]"
+
+        def recent(name=name, n=n):
+            db = BenchDB(n)
+            with db.Session() as s:
+                ids = list(Repo(s).load_tick_snapshot().states)
+                rows = [
+                    PendingAlert(hid, SignalKind.TRAILING_UPDATE, "bench", _NOW - k * 300)
+                    for k in range(288)
+                    for hid in ids[::10]
+                ]
+                Repo(s).flush_tick({}, rows)
+
+            def keys():
+                with db.Session() as s:
+                    Repo(s).recent_alert_keys(_NOW - 3600)
+
+            return Case(name, keys, teardown=db.close)
+
+        yield name, recent
+
+# -------- full worker tick --------
+def tick_cases(quick: bool) -> Iterator[Lazy]:
+    # "tick" runs the production path (async session); "tick_sync" the blocking Session path
+    for n in (10, 100) if quick else (10, 100, 1000):
+        for variant in ("tick", "tick_sync"):
+            name = f"worker.{variant}[assets={n},holdings={n}]"
+
+            def build(name=name, n=n, variant=variant):
+                db = BenchDB(n)
+                w = Worker(session_factory=db.AsyncSession if variant == "tick" else db.Session)
+                w.providers.providers = {"BINANCE": FakeProvider("BINANCE")}
+                w.providers.order = ["BINANCE"]
+                # the sender task isn't running: only enqueueing counts, as in a real tick
+                w.outbox = AlertQueue(NullNotifier())
+                loop = asyncio.new_event_loop()
+
+                def tick():
+                    w.providers.cache.clear()  # fetch every tick (PRICE_CACHE_TTL_SEC would serve repeats)
+                    loop.run_until_complete(w.tick())
+
+                def teardown():
+                    loop.run_until_complete(db.async_engine.dispose())
+                    loop.close()
+                    db.close()
+
+                return Case(name, tick, max_number=200, teardown=teardown)
+
+            yield name, build
+
+GROUPS = {
+    "features": features_cases,
+    "decide": decide_cases,
+    "repo": repo_cases,
+    "tick": tick_cases,
+}
@@ -0,0 +1,95 @@
+import os
+import random
+import tempfile
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.persistence.db import create_schema
+from app.domain.models import Asset, Holding, Strategy
+from app.providers.base import PricePoint
+from app.providers.candles import CandleBuffer
+
+class FakeProvider:
+    # in-process upstream: a seeded random walk per symbol and one more closed candle per
+    # call, so the worker goes through the same incremental feature path as with live ticks
+    def __init__(self, name: str = "BINANCE", history: int = 300, seed: int = 7):
+        self.name = name
+        self.history = history
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._bufs: dict[str, CandleBuffer] = {}
+
+    def _next(self, symbol: str) -> PricePoint:
+        buf = self._bufs.get(symbol)
+        if buf is None:
+            buf = self._bufs[symbol] = CandleBuffer(maxlen=self.history)
+            px, candles = 100.0, []
+            for i in range(self.history):
+                px *= 1.0 + self._rng.gauss(0.0, 0.01)
+                candles.append((i * buf.interval_sec, px))
+            buf.seed(candles)
+        closes = buf.closes()
+        last = closes[-1] * (1.0 + self._rng.gauss(0.0, 0.01))
+        buf.merge([(buf.last_open_ts + buf.interval_sec, last)])
+        return PricePoint(last=last, ohlcv_close=buf.closes(), source=self.name, seq=buf.appended)
+
+    async def get_pricepoint(self, asset: dict) -> PricePoint:
+        self.calls += 1
+        return self._next(asset["symbol"])
+
+    async def get_pricepoints(self, assets: list[dict], out: dict[str, PricePoint] | None = None) -> dict[str, PricePoint]:
+        self.calls += 1
+        out = {} if out is None else out
+        out.update((a["symbol"], self._next(a["symbol"])) for a in assets)
+        return out
+
+class NullNotifier:
+    # looks enabled to AlertQueue (so put() does its real work) but never touches the network
+    chat_id = "bench"
+    enabled = True
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, text: str, chat_id: str | None = None) -> None:
+        self.sent += 1
+
+class BenchDB:
+    # throwaway SQLite file with `assets` enabled assets and `holdings_per_asset` holdings each
+    def __init__(self, assets: int, holdings_per_asset: int = 1, seed: int = 7):
+        fd, self.path = tempfile.mkstemp(prefix="bench-", suffix=".db")
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        create_schema(self.engine)
+        self.Session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        # what the worker uses in production; dispose it (await) on the loop that used it
+        self.async_engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+        self.AsyncSession = async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+        self.symbols = [f"B{i:05d}" for i in range(assets)]
+
+        rng = random.Random(seed)
+        with self.engine.begin() as conn:
+            conn.execute(insert(Asset), [{"symbol": s, "enabled": True, "binance_symbol": f"{s}USDT"} for s in self.symbols])
+            conn.execute(insert(Strategy), [{"symbol": s} for s in self.symbols])
+            conn.execute(
+                insert(Holding),
+                [
+                    # entries spread around the start price so every decide branch shows up
+                    {"symbol": s, "entry": 100.0 * rng.uniform(0.85, 1.15), "invested_amount": 1000.0}
+                    for s in self.symbols
+                    for _ in range(holdings_per_asset)
+                ],
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO engine_state (holding_id, trailing_active) SELECT id, 0 FROM holdings"
+            )
+        self.holdings = assets * holdings_per_asset
+
+    def close(self) -> None:
+        self.engine.dispose()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
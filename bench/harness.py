@@ -0,0 +1,105 @@
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+@dataclass
+class Case:
+    name: str  # "<group>.<what>[params]", stable across runs (it is the baseline key)
+    fn: Callable[[], object]
+    # per-case cap on one timed sample; slow cases (a 1000-asset tick) run once per sample
+    max_number: int = 1_000_000
+    teardown: Callable[[], None] | None = None
+
+@dataclass
+class Result:
+    name: str
+    samples_ms: list[float] = field(default_factory=list)  # per-op time of each sample
+    number: int = 1  # ops per sample
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.samples_ms)
+
+    @property
+    def min_ms(self) -> float:
+        return min(self.samples_ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "median_ms": round(self.median_ms, 6),
+            "min_ms": round(self.min_ms, 6),
+            "max_ms": round(max(self.samples_ms), 6),
+            "samples": len(self.samples_ms),
+            "number": self.number,
+        }
+
+def measure(case: Case, repeat: int = 7, target_sec: float = 0.1) -> Result:
+    # timeit-style: calibrate how many calls make a ~target_sec sample, then take `repeat`
+    # samples and keep the per-call time of each (median is what gets compared)
+    fn = case.fn
+    fn()  # warm-up (imports, caches, first-tick seeding)
+    number = 1
+    while number < case.max_number:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= target_sec:
+            break
+        number *= 2
+    number = min(number, case.max_number)
+
+    res = Result(name=case.name, number=number)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            res.samples_ms.append((time.perf_counter() - t0) * 1000 / number)
+            gc.collect()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return res
+
+def environment() -> dict:
+    import numpy
+    import sqlalchemy
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": int(time.time()),
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> tuple[list[dict], list[dict]]:
+    # (rows for every case present in both files, regressions among them); a case regresses
+    # when its median got slower than baseline by more than `threshold` (0.15 == +15%)
+    rows, regressions = [], []
+    base = baseline.get("results", {})
+    for name, cur in current.get("results", {}).items():
+        old = base.get(name)
+        if old is None:
+            continue
+        ratio = cur["median_ms"] / old["median_ms"] if old["median_ms"] > 0 else 1.0
+        row = {"name": name, "baseline_ms": old["median_ms"], "current_ms": cur["median_ms"], "ratio": round(ratio, 3)}
+        rows.append(row)
+        if ratio > 1.0 + threshold:
+            regressions.append(row)
+    return rows, regressions
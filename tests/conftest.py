@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.persistence import db as db_mod
+
+@pytest.fixture
+def api(monkeypatch):
+    # TestClient for the FastAPI app on a throwaway SQLite file: the sync engine (init_db)
+    # and the async sessions the routes open both point at it
+    fd, path = tempfile.mkstemp(prefix="api-", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    db_mod.create_schema(engine)
+    # NullPool: no aiosqlite connection outlives the TestClient's event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(db_mod, "_engine", engine)
+    monkeypatch.setattr(db_mod, "_async_sessions", async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False))
+
+    from fastapi.testclient import TestClient
+    from app.api.cache import cache
+    from app.main import app
+
+    cache.clear()
+    client = TestClient(app)
+    client.engine = engine
+    try:
+        yield client
+    finally:
+        cache.clear()
+        engine.dispose()
+        os.unlink(path)
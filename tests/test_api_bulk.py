@@ -0,0 +1,151 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.domain.models import Asset, EngineState, Holding, Strategy
+from app.persistence.repo import AsyncRepo
+from app.settings import settings
+
+def _rows(api, model, *cols) -> list[tuple]:
+    with api.engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(select(*(getattr(model, c) for c in cols)).order_by(model.id))]
+
+def test_json_assets_with_per_row_errors(api):
+    body = [
+        {"symbol": "btc", "binance_symbol": "BTCUSDT"},
+        {"symbol": ""},
+        "not an object",
+        {"symbol": "ETH", "enabled": "maybe"},
+        {"symbol": "sol", "enabled": False},
+    ]
+    r = api.post("/assets/bulk", content=json.dumps(body).encode())
+    assert r.status_code == 200
+    out = r.json()
+    assert (out["rows"], out["written"], out["failed"]) == (5, 2, 3)
+    assert [e["row"] for e in out["errors"]] == [2, 3, 4]
+    assert out["errors"][1]["error"] == "expected an object"
+    assert out["errors"][2]["error"].startswith("enabled:")
+    assert "aborted" not in out
+    assert _rows(api, Asset, "symbol", "enabled", "binance_symbol") == [("BTC", True, "BTCUSDT"), ("SOL", False, None)]
+
+def test_csv_holdings_bring_their_engine_state(api):
+    csv = (
+        "﻿symbol,entry,invested_amount\r\n"
+        "btc,100.5,1000\r\n"
+        "\r\n"
+        "ETH,-1,10\r\n"
+        "\"sol\",20,\"5\"\r\n"
+        "DOGE,abc,1\r\n"
+    )
+    r = api.post("/holdings/bulk", content=csv.encode(), headers={"Content-Type": "text/csv"})
+    out = r.json()
+    assert (out["rows"], out["written"], out["failed"]) == (4, 2, 2)
+    assert [e["row"] for e in out["errors"]] == [2, 4]
+    holdings = _rows(api, Holding, "id", "symbol", "entry", "invested_amount")
+    assert [h[1:] for h in holdings] == [("BTC", 100.5, 1000.0), ("SOL", 20.0, 5.0)]
+    assert sorted(r[0] for r in _rows(api, EngineState, "holding_id")) == [h[0] for h in holdings]
+
+def test_csv_quoted_field_across_lines_and_empty_cells(api):
+    csv = 'symbol,binance_symbol,coingecko_id\nBTC,"BTC\nUSDT",\nETH,,ethereum\n'
+    out = api.post("/assets/bulk", content=csv.encode(), headers={"Content-Type": "text/csv"}).json()
+    assert out["written"] == 2 and out["failed"] == 0
+    assert _rows(api, Asset, "symbol", "binance_symbol", "coingecko_id") == [("BTC", "BTC\nUSDT", None), ("ETH", None, "ethereum")]
+
+def test_strategies_upsert_and_later_duplicate_wins(api):
+    body = [
+        {"symbol": "BTC", "sl_pct": 0.1},
+        {"symbol": "ETH"},
+        {"symbol": "btc", "sl_pct": 0.3},
+        {"symbol": "XRP", "sl_pct": 5},
+    ]
+    out = api.put("/strategies/bulk", content=json.dumps(body).encode()).json()
+    assert (out["written"], out["failed"]) == (3, 1)
+    assert out["errors"][0]["row"] == 4
+    assert _rows(api, Strategy, "symbol", "sl_pct") == [("BTC", 0.3), ("ETH", 0.08)]
+
+def test_chunks_commit_separately(api, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_chunk_rows", 2)
+    chunks = []
+    real = AsyncRepo.bulk_create_holdings
+
+    async def write(self, rows):
+        chunks.append([r["entry"] for r in rows])
+        if len(chunks) == 2:
+            raise RuntimeError("disk full\nmore detail")
+        return await real(self, rows)
+
+    monkeypatch.setattr(AsyncRepo, "bulk_create_holdings", write)
+    body = [{"symbol": "BTC", "entry": i, "invested_amount": 1} for i in range(1, 6)]
+    out = api.post("/holdings/bulk", content=json.dumps(body).encode()).json()
+    assert chunks == [[1.0, 2.0], [3.0, 4.0], [5.0]]
+    # the failed chunk loses only its own rows
+    assert (out["written"], out["failed"]) == (3, 2)
+    assert out["errors"] == [
+        {"row": 3, "error": "not written: RuntimeError: disk full"},
+        {"row": 4, "error": "not written: RuntimeError: disk full"},
+    ]
+    assert [r[0] for r in _rows(api, Holding, "entry")] == [1.0, 2.0, 5.0]
+
+def test_repeated_key_flushes_the_chunk_early(api, monkeypatch):
+    chunks = []
+    real = AsyncRepo.bulk_upsert_assets
+
+    async def write(self, rows):
+        chunks.append([r["symbol"] for r in rows])
+        return await real(self, rows)
+
+    monkeypatch.setattr(AsyncRepo, "bulk_upsert_assets", write)
+    body = [{"symbol": "BTC"}, {"symbol": "ETH"}, {"symbol": "btc", "enabled": False}]
+    out = api.post("/assets/bulk", content=json.dumps(body).encode()).json()
+    assert chunks == [["BTC", "ETH"], ["btc"]]
+    assert out["written"] == 3
+    assert _rows(api, Asset, "symbol", "enabled") == [("BTC", False), ("ETH", True)]
+
+@pytest.mark.parametrize("body", [
+    b"",
+    b"   \n",
+    b'{"symbol": "BTC"}',
+    b'[{"symbol": "BTC"',
+    b"\xff\xfe[]",
+])
+def test_unreadable_body_before_any_row_is_a_400(api, body):
+    r = api.post("/assets/bulk", content=body)
+    assert r.status_code == 400
+    assert _rows(api, Asset, "symbol") == []
+
+def test_unterminated_csv_quote_is_a_400(api):
+    r = api.post("/assets/bulk", content=b'symbol\n"BTC\n', headers={"Content-Type": "text/csv"})
+    assert r.status_code == 400
+
+@pytest.mark.parametrize("pieces, error", [
+    ([b'[{"symbol": "BTC"}, {"symbol": "ETH"}] trailing'], "after the closing ]"),
+    ([b'[{"symbol": "BTC"}, {"symbol": "ETH"}]', b" trailing"], "after the closing ]"),
+    ([b'[{"symbol": "BTC"}, {"symbol": "ETH"} {"symbol": "SOL"}]'], "expected ','"),
+    ([b'[{"symbol": "BTC"}, {"symbol": "ETH"}, {"sym'], "invalid JSON"),
+    ([b'[{"symbol": "BTC"}, {"symbol": "ETH"}'], "unterminated JSON array"),
+])
+def test_body_breaking_after_valid_rows_keeps_them(api, pieces, error):
+    # the same whether the rows and the garbage arrive in one chunk or in several
+    r = api.post("/assets/bulk", content=iter(pieces))
+    assert r.status_code == 200
+    out = r.json()
+    assert (out["rows"], out["written"]) == (2, 2)
+    assert error in out["aborted"]
+    assert _rows(api, Asset, "symbol") == [("BTC",), ("ETH",)]
+
+def test_csv_breaking_after_valid_rows_keeps_them(api):
+    r = api.post("/assets/bulk", content=b'symbol\nBTC\nETH\n"SOL\n', headers={"Content-Type": "text/csv"})
+    out = r.json()
+    assert out["written"] == 2
+    assert "unterminated quoted field" in out["aborted"]
+
+def test_upload_too_large(api, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_max_bytes", 32)
+    body = json.dumps([{"symbol": f"S{i}"} for i in range(10)]).encode()
+    assert api.post("/assets/bulk", content=body).status_code == 413
+    assert _rows(api, Asset, "symbol") == []
+
+def test_empty_array_writes_nothing(api):
+    out = api.post("/holdings/bulk", content=b"[]").json()
+    assert out == {"rows": 0, "written": 0, "failed": 0, "errors": []}
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+from app.api.cache import ResponseCache, cache
+from app.domain.models import Asset
+
+def test_etag_and_304(api):
+    api.post("/assets", json={"symbol": "btc", "binance_symbol": "BTCUSDT"})
+    r = api.get("/assets")
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "no-cache"
+    etag = r.headers["etag"]
+    assert [a["symbol"] for a in r.json()] == ["BTC"]
+
+    for inm in (etag, f"W/{etag}", f'"nope", {etag}', "*"):
+        r2 = api.get("/assets", headers={"If-None-Match": inm})
+        assert r2.status_code == 304, inm
+        assert r2.content == b""
+        assert r2.headers["etag"] == etag
+    assert api.get("/assets", headers={"If-None-Match": '"nope"'}).status_code == 200
+
+def test_writes_invalidate_their_resource(api):
+    api.post("/assets", json={"symbol": "BTC"})
+    etag = api.get("/assets").headers["etag"]
+
+    api.post("/assets", json={"symbol": "ETH"})
+    r = api.get("/assets", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert [a["symbol"] for a in r.json()] == ["BTC", "ETH"]
+    assert r.headers["etag"] != etag
+
+    # the same content again renders the same (strong) ETag
+    api.post("/assets", json={"symbol": "ETH"})
+    assert api.get("/assets", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+def test_entries_are_served_from_the_cache(api):
+    api.post("/assets", json={"symbol": "BTC"})
+    first = api.get("/assets").json()
+    # written behind the API's back (another replica, the worker): not seen until the TTL
+    # runs out or a local write bumps the version
+    with api.engine.begin() as conn:
+        conn.execute(insert(Asset), [{"symbol": "SOL", "enabled": True}])
+    assert api.get("/assets").json() == first
+    cache.invalidate("assets")
+    assert [a["symbol"] for a in api.get("/assets").json()] == ["BTC", "SOL"]
+
+def test_ttl_zero_disables_caching(api, monkeypatch):
+    monkeypatch.setattr(cache, "ttl_sec", 0)
+    api.post("/assets", json={"symbol": "BTC"})
+    etag = api.get("/assets").headers["etag"]
+    with api.engine.begin() as conn:
+        conn.execute(insert(Asset), [{"symbol": "SOL", "enabled": True}])
+    r = api.get("/assets", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()) == 2
+
+def test_holdings_are_cached_per_symbol_and_page(api):
+    for sym in ("BTC", "ETH"):
+        api.post("/holdings", json={"symbol": sym, "entry": 100, "invested_amount": 10})
+    btc = api.get("/holdings", params={"symbol": "btc"})
+    assert [h["symbol"] for h in btc.json()] == ["BTC"]
+    assert api.get("/holdings", params={"symbol": " BTC "}).headers["etag"] == btc.headers["etag"]
+    assert len(api.get("/holdings").json()) == 2
+    assert len(api.get("/holdings", params={"limit": 1}).json()) == 1
+
+    api.post("/holdings", json={"symbol": "BTC", "entry": 90, "invested_amount": 5})
+    r = api.get("/holdings", params={"symbol": "BTC"}, headers={"If-None-Match": btc.headers["etag"]})
+    assert r.status_code == 200
+    assert len(r.json()) == 2
+
+def test_strategy_put_and_bulk_invalidate(api):
+    r = api.get("/strategies/btc")
+    assert r.json()["id"] is None  # defaults until a row exists
+    etag = r.headers["etag"]
+
+    r = api.put("/strategies/BTC", json={"sl_pct": 0.05})
+    assert r.status_code == 200
+    r = api.get("/strategies/BTC", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["sl_pct"] == 0.05
+    etag = r.headers["etag"]
+
+    r = api.put("/strategies/bulk", content=b'[{"symbol": "BTC", "sl_pct": 0.2}]')
+    assert r.json()["written"] == 1
+    r = api.get("/strategies/BTC", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["sl_pct"] == 0.2
+
+def test_bulk_invalidates_even_when_every_row_fails(api):
+    api.post("/assets", json={"symbol": "BTC"})
+    etag = api.get("/assets").headers["etag"]
+    r = api.post("/assets/bulk", content=b'[{"symbol": ""}]')
+    assert r.json()["failed"] == 1
+    # nothing changed, so revalidation still answers 304 (after reloading)
+    assert api.get("/assets", headers={"If-None-Match": etag}).status_code == 304
+
+def test_cache_is_bounded():
+    c = ResponseCache(ttl_sec=60, max_entries=2)
+
+    class Req:
+        headers: dict = {}
+
+    async def load():
+        return b"[]", {}
+
+    async def go():
+        for key in ("a", "b", "c"):
+            await c.respond(Req(), "assets", key, load)
+    asyncio.run(go())
+    assert [k for _, k in c._entries] == ["b", "c"]
+
+@pytest.mark.parametrize("inm", [None, ""])
+def test_no_if_none_match_is_a_full_response(api, inm):
+    headers = {} if inm is None else {"If-None-Match": inm}
+    assert api.get("/assets", headers=headers).status_code == 200
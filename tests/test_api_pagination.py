@@ -0,0 +1,111 @@
+import json
+
+from sqlalchemy import delete, insert
+
+from app.api.pagination import NDJSON
+from app.domain.models import Asset, Holding
+from app.settings import settings
+
+def _seed_holdings(api, rows: list[tuple[str, float, float]]) -> list[int]:
+    with api.engine.begin() as conn:
+        res = conn.execute(
+            insert(Holding).returning(Holding.id),
+            [{"symbol": s, "entry": e, "invested_amount": a} for s, e, a in rows],
+        )
+        return sorted(res.scalars())
+
+def _walk(api, url: str, params: dict) -> tuple[list[int], int]:
+    # follows Link: rel="next" to the end; returns the ids seen and the number of requests
+    ids, requests = [], 0
+    r = api.get(url, params=params)
+    while True:
+        requests += 1
+        assert r.status_code == 200
+        ids.extend(x["id"] for x in r.json())
+        link = r.headers.get("link")
+        if not link:
+            return ids, requests
+        assert link.endswith('>; rel="next"')
+        r = api.get(link[1:link.index(">")])
+
+def test_keyset_pages_with_identical_rows(api):
+    # same symbol/entry/amount everywhere: only the id tells rows apart, none may be lost
+    ids = _seed_holdings(api, [("BTC", 100.0, 10.0)] * 7)
+    seen, requests = _walk(api, "/holdings", {"limit": 3})
+    assert seen == ids
+    assert requests == 3  # 3 + 3 + 1, the short page has no Link
+
+def test_full_last_page_links_to_an_empty_one(api):
+    ids = _seed_holdings(api, [("BTC", 100.0, 10.0)] * 6)
+    seen, requests = _walk(api, "/holdings", {"limit": 3})
+    assert seen == ids
+    assert requests == 3
+    r = api.get("/holdings", params={"after_id": ids[-1], "limit": 3})
+    assert r.json() == [] and "link" not in r.headers
+
+def test_pages_keep_the_symbol_filter(api):
+    ids = _seed_holdings(api, [("BTC" if i % 2 else "ETH", 100.0 + i, 1.0) for i in range(10)])
+    with api.engine.connect() as conn:
+        btc = [i for i, s in conn.execute(Holding.__table__.select().with_only_columns(Holding.id, Holding.symbol)) if s == "BTC"]
+    seen, _ = _walk(api, "/holdings", {"symbol": "btc", "limit": 2})
+    assert seen == sorted(btc)
+    assert len(ids) == 10
+
+def test_rows_changing_between_pages(api):
+    ids = _seed_holdings(api, [("BTC", 100.0, 1.0)] * 4)
+    r = api.get("/holdings", params={"limit": 2})
+    first = [h["id"] for h in r.json()]
+    assert first == ids[:2]
+    # a deleted row does not shift the next page, a new one shows up at the end
+    with api.engine.begin() as conn:
+        conn.execute(delete(Holding).where(Holding.id == ids[2]))
+    new = _seed_holdings(api, [("BTC", 100.0, 1.0)])
+    rest, _ = _walk(api, "/holdings", {"after_id": first[-1], "limit": 2})
+    assert rest == [ids[3]] + new
+
+def test_limit_is_capped_and_after_id_alone_pages(api, monkeypatch):
+    monkeypatch.setattr(settings, "api_page_max", 2)
+    ids = _seed_holdings(api, [("BTC", 100.0, 1.0)] * 5)
+    assert len(api.get("/holdings", params={"limit": 50}).json()) == 2
+    r = api.get("/holdings", params={"after_id": 0})
+    assert [h["id"] for h in r.json()] == ids[:2]
+    assert 'limit=2' in r.headers["link"]
+    # no paging params: the whole table as before, no Link
+    r = api.get("/holdings")
+    assert len(r.json()) == 5 and "link" not in r.headers
+
+def test_bad_page_params_are_rejected(api):
+    assert api.get("/holdings", params={"limit": 0}).status_code == 422
+    assert api.get("/assets", params={"after_id": -1}).status_code == 422
+
+def test_asset_pages(api):
+    with api.engine.begin() as conn:
+        conn.execute(insert(Asset), [{"symbol": f"S{i}", "enabled": i % 2 == 0} for i in range(5)])
+    r = api.get("/assets", params={"limit": 2})
+    assert [a["symbol"] for a in r.json()] == ["S0", "S1"]
+    seen, requests = _walk(api, "/assets", {"limit": 2})
+    assert len(seen) == 5 and requests == 3
+
+def _ndjson(api, url: str, params: dict | None = None) -> list[dict]:
+    r = api.get(url, params=params or {}, headers={"Accept": NDJSON})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(NDJSON)
+    assert "etag" not in r.headers  # streamed, never cached
+    assert r.text == "" or r.text.endswith("\n")
+    return [json.loads(line) for line in r.text.splitlines()]
+
+def test_ndjson_streams_every_row_across_chunks(api, monkeypatch):
+    monkeypatch.setattr(settings, "api_stream_chunk", 2)
+    ids = _seed_holdings(api, [("BTC", 100.0, 10.0)] * 5 + [("ETH", 2.5, 1.0)])
+    rows = _ndjson(api, "/holdings")
+    assert [r["id"] for r in rows] == ids
+    assert rows[-1] == {"id": ids[-1], "symbol": "ETH", "entry": 2.5, "invested_amount": 1.0}
+    # filtered and resumed after an id
+    assert [r["id"] for r in _ndjson(api, "/holdings", {"symbol": "btc", "after_id": ids[1]})] == ids[2:5]
+
+def test_ndjson_assets_and_empty_tables(api):
+    assert _ndjson(api, "/holdings") == []
+    with api.engine.begin() as conn:
+        conn.execute(insert(Asset), [{"symbol": "BTC", "enabled": True, "binance_symbol": "BTCUSDT"}])
+    [row] = _ndjson(api, "/assets")
+    assert row["symbol"] == "BTC" and row["binance_symbol"] == "BTCUSDT"
@@ -0,0 +1,106 @@
+import random
+from math import isnan
+
+import numpy as np
+import pytest
+
+from app.engine.decision import EngineState, Holding, Strategy, decide
+from app.engine.decision_batch import decide_batch
+from app.providers.features import Features
+from app.providers.features_batch import FeatureBatch
+
+NOW = 1_700_000_000
+
+def _strategy(rng: random.Random) -> Strategy:
+    return Strategy(
+        base_tp=rng.uniform(0.02, 0.2),
+        sl_pct=rng.uniform(0.02, 0.15),
+        trail_atr_mult=rng.uniform(0.5, 4.0),
+        profit_lock_pct=rng.uniform(0.01, 0.15),
+        cooldown_sec=rng.choice([0, 60, 900]),
+        confirm_regime=rng.random() < 0.5,
+    )
+
+def _features(rng: random.Random, last: float | None = None) -> Features:
+    last = rng.uniform(80, 120) if last is None else last
+    ema_s = last * rng.uniform(0.9, 1.1)
+    return Features(
+        last=last,
+        atr=rng.uniform(0.1, 5.0),
+        ema_short=ema_s,
+        ema_long=ema_s * rng.uniform(0.95, 1.05),
+        vol_pct=rng.uniform(0.0, 0.08),
+        regime=rng.choice(["BULL", "BEAR", "SIDEWAYS"]),
+    )
+
+def _states(rng: random.Random, n: int, last: float) -> list[EngineState]:
+    out = []
+    for _ in range(n):
+        active = rng.random() < 0.4
+        anchor = last * rng.uniform(0.9, 1.2) if active or rng.random() < 0.1 else None
+        lat = rng.choice([None, NOW - 10, NOW - 600, NOW - 5000])
+        out.append(EngineState(trailing_active=active, trailing_anchor=anchor, last_alert_ts=lat))
+    return out
+
+def _check(res, symbols: list[str], s: Strategy, rows: list[Features], entries: list[float], states: list[EngineState]):
+    want_index, want_kinds, want_msgs = [], [], []
+    for i, (sym, f, e, st) in enumerate(zip(symbols, rows, entries, states)):
+        sigs = decide(NOW, Holding(id=i, symbol=sym, entry=e, invested_amount=1000.0), s, f, st)
+        assert len(sigs) <= 1
+        if sigs:
+            want_index.append(i)
+            want_kinds.append(sigs[0].kind)
+            want_msgs.append(sigs[0].message)
+        # decide mutated st: the batch must return the same state
+        assert bool(res.trailing_active[i]) == st.trailing_active, i
+        anchor = float(res.trailing_anchor[i])
+        assert (None if isnan(anchor) else anchor) == st.trailing_anchor, i
+
+    assert [int(i) for i in res.index] == want_index
+    assert [res.kind(j) for j in range(len(res))] == want_kinds
+    assert [res.message(j) for j in range(len(res))] == want_msgs
+
+def _arrays(entries: list[float], states: list[EngineState]) -> dict:
+    return dict(
+        entry=np.array(entries),
+        trailing_active=np.array([st.trailing_active for st in states]),
+        trailing_anchor=np.array([np.nan if st.trailing_anchor is None else st.trailing_anchor for st in states]),
+        last_alert_ts=np.array([st.last_alert_ts or 0 for st in states], dtype=np.int64),
+    )
+
+def _copy(states: list[EngineState]) -> list[EngineState]:
+    return [EngineState(st.trailing_active, st.trailing_anchor, st.last_alert_ts) for st in states]
+
+@pytest.mark.parametrize("seed", range(200))
+def test_decide_batch_matches_decide(seed):
+    rng = random.Random(seed)
+    s = _strategy(rng)
+    f = _features(rng, last=0.0 if seed % 50 == 0 else None)  # no price: nothing fires
+    n = rng.randint(1, 40)
+    entries = [f.last * rng.uniform(0.8, 1.25) if f.last > 0 else 100.0 for _ in range(n)]
+    states = _states(rng, n, f.last or 100.0)
+
+    res = decide_batch(NOW, "BTC", s, f, **_arrays(entries, states))
+    _check(res, ["BTC"] * n, s, [f] * n, entries, _copy(states))
+
+@pytest.mark.parametrize("seed", range(50))
+def test_decide_batch_per_row_features(seed):
+    # FeatureBatch: every holding has its own symbol/features (replay steps all symbols at once)
+    rng = random.Random(1000 + seed)
+    s = _strategy(rng)
+    n = rng.randint(1, 30)
+    rows = [_features(rng, last=rng.choice([0.0, float("nan")]) if rng.random() < 0.1 else None) for _ in range(n)]
+    symbols = [f"S{i}" for i in range(n)]
+    entries = [(f.last if f.last > 0 else 100.0) * rng.uniform(0.8, 1.25) for f in rows]
+    states = _states(rng, n, 100.0)
+    fb = FeatureBatch(
+        last=np.array([f.last for f in rows]),
+        atr=np.array([f.atr for f in rows]),
+        ema_short=np.array([f.ema_short for f in rows]),
+        ema_long=np.array([f.ema_long for f in rows]),
+        vol_pct=np.array([f.vol_pct for f in rows]),
+        regime=np.array([f.regime for f in rows]),
+    )
+
+    res = decide_batch(NOW, symbols, s, fb, **_arrays(entries, states))
+    _check(res, symbols, s, rows, entries, _copy(states))
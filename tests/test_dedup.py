@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app.domain.models import EngineState
+from app.domain.signals import SignalKind
+from app.engine.dedup import AlertDedupIndex
+from app.engine.worker import TickStats, Worker
+from app.persistence.repo import AsyncRepo, PendingAlert, Repo
+from bench.fakes import BenchDB
+
+B = 300
+
+def test_warm_keeps_only_the_live_bucket():
+    idx = AlertDedupIndex(bucket_seconds=B, max_entries=100)
+    now = 10 * B + 17
+    idx.warm([(1, "STOP_LOSS", 9 * B), (2, "STOP_LOSS", 10 * B), (3, SignalKind.TAKE_PROFIT, 10 * B)], now)
+    assert idx.warmed
+    assert len(idx) == 2
+    assert idx.seen(2, "STOP_LOSS", now) is True
+    assert idx.seen(3, "TAKE_PROFIT", now) is True
+    assert idx.seen(1, "STOP_LOSS", now) is False  # older bucket: a new alert is due
+    assert (idx.hits, idx.misses) == (2, 1)
+
+def test_add_then_seen_in_the_same_bucket_only():
+    idx = AlertDedupIndex(bucket_seconds=B, max_entries=100)
+    assert idx.seen(1, SignalKind.STOP_LOSS, 5 * B) is False
+    idx.add(1, SignalKind.STOP_LOSS, 5 * B + 1)
+    assert idx.seen(1, "STOP_LOSS", 5 * B + B - 1) is True
+    assert idx.seen(1, "TAKE_PROFIT", 5 * B) is False
+    assert idx.seen(1, "STOP_LOSS", 6 * B) is False
+
+def test_rolling_the_bucket_evicts_older_keys():
+    idx = AlertDedupIndex(bucket_seconds=B, max_entries=100)
+    idx.add(1, "STOP_LOSS", 5 * B)
+    idx.add(2, "STOP_LOSS", 5 * B)
+    assert len(idx) == 2
+    idx.add(3, "STOP_LOSS", 6 * B)
+    assert len(idx) == 1
+    assert idx.seen(1, "STOP_LOSS", 6 * B) is False
+    assert idx.seen(3, "STOP_LOSS", 6 * B) is True
+
+def test_overflow_makes_misses_unknown_until_the_next_bucket():
+    idx = AlertDedupIndex(bucket_seconds=B, max_entries=2)
+    for hid in (1, 2, 3):
+        idx.add(hid, "STOP_LOSS", 5 * B)
+    assert len(idx) == 2
+    # holding 1 was evicted from the live bucket: a miss proves nothing, ask the DB
+    assert idx.seen(1, "STOP_LOSS", 5 * B) is None
+    assert idx.seen(4, "STOP_LOSS", 5 * B) is None
+    assert idx.seen(3, "STOP_LOSS", 5 * B) is True
+    assert idx.fallbacks == 2
+    # a fresh bucket starts complete again
+    assert idx.seen(1, "STOP_LOSS", 6 * B) is False
+
+def test_warm_past_the_limit_overflows():
+    idx = AlertDedupIndex(bucket_seconds=B, max_entries=2)
+    idx.warm([(hid, "STOP_LOSS", 5 * B) for hid in (1, 2, 3)], 5 * B)
+    assert idx.seen(1, "STOP_LOSS", 5 * B) is None
+    assert idx.seen(2, "STOP_LOSS", 5 * B) is True
+
+# -------- worker: only what flush_tick inserted is sent --------
+class _Outbox:
+    def __init__(self):
+        self.messages = []
+
+    def put(self, text: str) -> None:
+        self.messages.append(text)
+
+@pytest.fixture
+def db():
+    bench = BenchDB(assets=2)
+    yield bench
+    bench.close()
+
+def test_worker_sends_and_stamps_only_inserted_alerts(db):
+    now = int(time.time())
+    worker = Worker(session_factory=db.Session)
+    worker.outbox = _Outbox()
+
+    async def evaluate(repo, now_ts, book, states, f, dirty, alerts):
+        for h in book.holdings:
+            alerts.append(PendingAlert(holding_id=h.id, kind=SignalKind.STOP_LOSS, message=f"sl {h.id}", ts=now_ts))
+            dirty[h.id] = states[h.id]
+
+    worker._evaluate = evaluate
+    with db.Session() as s:
+        # someone else already sent holding 1's alert for this bucket
+        Repo(s).record_alert(1, SignalKind.STOP_LOSS, "earlier", now)
+
+    async def run() -> TickStats:
+        stats = TickStats()
+        with db.Session() as s:
+            repo = AsyncRepo(s)
+            snap = await repo.load_tick_snapshot()
+            await worker._decide_and_flush(repo, now, snap, [None] * len(snap.books), stats)
+        return stats
+
+    stats = asyncio.run(run())
+    assert worker.outbox.messages == ["sl 2"]
+    assert stats.alerts_written == 1
+    # the index learns both keys (holding 1's is in the table too)
+    assert worker.dedup.seen(1, "STOP_LOSS", now) is True
+    assert worker.dedup.seen(2, "STOP_LOSS", now) is True
+    with db.Session() as s:
+        stamped = dict(s.execute(select(EngineState.holding_id, EngineState.last_alert_ts)).all())
+    # the cooldown only starts for the alert this worker actually sent
+    assert stamped == {1: None, 2: now}
+
+    # same bucket again: nothing inserted, nothing sent
+    stats = asyncio.run(run())
+    assert worker.outbox.messages == ["sl 2"]
+    assert stats.alerts_written == 0
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from app.providers.base import PricePoint
+from app.providers.candles import CandleBuffer
+from app.providers.features import Features, FeatureState, compute_features
+
+def _assert_same(got: Features, want: Features) -> None:
+    for name in ("last", "atr", "ema_short", "ema_long", "vol_pct"):
+        assert getattr(got, name) == pytest.approx(getattr(want, name), rel=1e-7, abs=1e-9), name
+    # the regime thresholds are exact comparisons: only check it away from them
+    ratio = want.ema_short / want.ema_long if want.ema_long else 1.0
+    if abs(ratio - 1.001) > 1e-9 and abs(ratio - 0.999) > 1e-9:
+        assert got.regime == want.regime
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_feature_state_matches_compute_features(seed):
+    rng = random.Random(seed)
+    buf = CandleBuffer(maxlen=300)
+    px = 100.0
+    buf.seed((i * buf.interval_sec, px * (1 + 0.01 * i)) for i in range(10))  # cold start: the window grows
+    st = FeatureState()
+    for step in range(3000):
+        r = rng.random()
+        if r < 0.3:
+            # one or more candles closed since the last call
+            for _ in range(rng.randint(1, 3)):
+                px *= 1 + rng.gauss(0, 0.01)
+                buf.merge([(buf.last_open_ts + buf.interval_sec, px)])
+        elif r < 0.31:
+            # re-seed (gap too large for an incremental fetch): appended jumps past the buffer
+            start = buf.last_open_ts + 400 * buf.interval_sec
+            buf.seed((start + i * buf.interval_sec, px * (1 + rng.gauss(0, 0.02))) for i in range(300))
+        else:
+            # live price moves inside the open candle
+            px *= 1 + rng.gauss(0, 0.003)
+            buf.merge([(buf.last_open_ts, px)])
+        last = px * (1 + rng.gauss(0, 0.001))
+        pp = PricePoint(last=last, ohlcv_close=buf.closes(), source="BINANCE", seq=buf.appended)
+        _assert_same(st.update(pp), compute_features(pp.last, pp.ohlcv_close))
+
+def test_feature_state_source_switch_and_empty():
+    st = FeatureState()
+    closes = [100.0 + i for i in range(50)]
+    a = PricePoint(last=150.0, ohlcv_close=closes, source="BINANCE", seq=50)
+    _assert_same(st.update(a), compute_features(a.last, a.ohlcv_close))
+    # another provider's buffer: its seq means nothing here, the state rebuilds
+    b = PricePoint(last=151.0, ohlcv_close=closes[1:] + [151.0], source="COINBASE", seq=51)
+    _assert_same(st.update(b), compute_features(b.last, b.ohlcv_close))
+    empty = PricePoint(last=10.0, ohlcv_close=[], source="BINANCE", seq=0)
+    _assert_same(st.update(empty), compute_features(empty.last, empty.ohlcv_close))
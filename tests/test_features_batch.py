@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.providers.features import compute_features
+from app.providers.features_batch import compute_features_batch, compute_features_series
+
+def _assert_row(fb, i: int, want) -> None:
+    got = fb.row(i)
+    for name in ("last", "atr", "ema_short", "ema_long", "vol_pct"):
+        assert getattr(got, name) == pytest.approx(getattr(want, name), rel=1e-7, abs=1e-9), (i, name)
+    ratio = want.ema_short / want.ema_long if want.ema_long else 1.0
+    if abs(ratio - 1.001) > 1e-9 and abs(ratio - 0.999) > 1e-9:
+        assert got.regime == want.regime, i
+
+def _walk(rng: random.Random, n: int) -> list[float]:
+    px, out = rng.uniform(1, 1000), []
+    for _ in range(n):
+        px *= 1 + rng.gauss(0, 0.02)
+        out.append(px)
+    return out
+
+@pytest.mark.parametrize("seed", range(10))
+def test_batch_matches_scalar_ragged_rows(seed):
+    rng = random.Random(seed)
+    width = rng.choice([1, 2, 15, 300, 450])  # 450: wider than the feature window
+    rows = [_walk(rng, min(width, rng.choice([0, 1, 2, rng.randint(0, width), width]))) for _ in range(30)]
+    lasts = [rng.choice([0.0, -1.0, r[-1] * 1.01 if r else 50.0]) for r in rows]
+    closes = np.full((len(rows), width), np.nan)
+    for i, r in enumerate(rows):
+        if r:
+            closes[i, width - len(r):] = r
+
+    fb = compute_features_batch(closes, np.array(lasts))
+    for i, (r, last) in enumerate(zip(rows, lasts)):
+        _assert_row(fb, i, compute_features(last, r))
+
+    # same rows described by `lengths` (padding left as garbage, not NaN)
+    padded = np.where(np.isnan(closes), 123.0, closes)
+    fb2 = compute_features_batch(padded, np.array(lasts), lengths=np.array([len(r) for r in rows]))
+    for i, (r, last) in enumerate(zip(rows, lasts)):
+        _assert_row(fb2, i, compute_features(last, r))
+
+def test_batch_without_candles():
+    # cold start: no symbol has candles yet
+    lasts = np.array([100.0, 0.0, 5.0])
+    fb = compute_features_batch(np.zeros((3, 0)), lasts)
+    assert len(fb) == 3
+    for i, last in enumerate(lasts):
+        _assert_row(fb, i, compute_features(float(last), []))
+
+    assert len(compute_features_batch(np.zeros((0, 0)), np.zeros(0))) == 0
+    assert len(compute_features_batch(np.zeros((0, 10)), np.zeros(0))) == 0
+
+def test_series_matches_scalar():
+    rng = random.Random(3)
+    closes = _walk(rng, 700)
+    fs = compute_features_series(np.array(closes))
+    for t in list(range(0, 40)) + list(range(290, 310)) + list(range(650, 700)):
+        _assert_row(fs, t, compute_features(closes[t], closes[:t + 1]))
+    assert len(compute_features_series(np.array([]))) == 0
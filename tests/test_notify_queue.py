@@ -0,0 +1,201 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.notify import queue as queue_mod
+from app.notify.queue import AlertQueue, TokenBucket
+from app.notify.telegram import TelegramRateLimited, _retry_after
+from app.settings import settings
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class FakeSender:
+    # records what would have gone to Telegram; `fail` holds exceptions to raise, in order
+    chat_id = "chat"
+    enabled = True
+
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.sent: list[tuple[float, str, str]] = []
+        self.fail: list[Exception] = []
+
+    async def send(self, text: str, chat_id: str | None = None) -> None:
+        if self.fail:
+            raise self.fail.pop(0)
+        self.sent.append((self.clock.now, chat_id, text))
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    # only the queue's monotonic clock is faked (the event loop keeps the real one)
+    monkeypatch.setattr(queue_mod, "time", SimpleNamespace(monotonic=c, perf_counter=time.perf_counter))
+    monkeypatch.setattr(settings, "notify_rate_per_sec", 100.0)
+    monkeypatch.setattr(settings, "notify_burst", 100)
+    monkeypatch.setattr(settings, "notify_chat_rate_per_sec", 1.0)
+    monkeypatch.setattr(settings, "notify_chat_burst", 3)
+    monkeypatch.setattr(settings, "notify_digest_threshold", 5)
+    monkeypatch.setattr(settings, "notify_digest_max", 20)
+    monkeypatch.setattr(settings, "notify_max_attempts", 3)
+    return c
+
+def _drain(q: AlertQueue, clock: Clock, max_steps: int = 1000) -> None:
+    # run()'s loop with the sleeps turned into clock jumps
+    async def go():
+        for _ in range(max_steps):
+            batch = q._next()
+            if batch is None:
+                return
+            if isinstance(batch, float):
+                clock.now += batch
+                continue
+            await q._deliver(batch)
+        raise AssertionError("queue did not drain")
+    asyncio.run(go())
+
+def _http_error(status: int) -> httpx.HTTPStatusError:
+    req = httpx.Request("POST", "https://api.telegram.org/botX/sendMessage")
+    return httpx.HTTPStatusError("boom", request=req, response=httpx.Response(status, request=req))
+
+def test_token_bucket_burst_then_rate(clock):
+    b = TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        assert b.delay() == 0.0
+        b.take()
+    assert b.delay() == pytest.approx(0.5)
+    clock.now += 0.25
+    assert b.delay() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert b.delay() == 0.0
+    # refill never goes past the burst
+    clock.now += 100
+    b.delay()
+    assert b.tokens == 3.0
+
+def test_token_bucket_pause_holds_it_closed(clock):
+    b = TokenBucket(rate=10.0, burst=5)
+    b.pause(4.0)
+    assert b.delay() == pytest.approx(4.0)
+    clock.now += 4.0
+    assert b.delay() == 0.0
+    assert b.tokens == pytest.approx(5.0)
+
+def test_chat_rate_limit_spaces_messages(clock):
+    sender = FakeSender(clock)
+    q = AlertQueue(sender)
+    for i in range(4):
+        q.put(f"a{i}")
+    _drain(q, clock)
+    # burst of 3 right away, the 4th one token (1 s) later
+    assert [round(t - 1000.0, 6) for t, _, _ in sender.sent] == [0.0, 0.0, 0.0, 1.0]
+    assert [text for _, _, text in sender.sent] == ["a0", "a1", "a2", "a3"]
+    assert (q.stats.sent, q.stats.delivered, q.stats.digests) == (4, 4, 0)
+    assert q.depth == 0
+
+def test_backed_up_chat_gets_a_digest(clock):
+    sender = FakeSender(clock)
+    q = AlertQueue(sender)
+    for i in range(12):
+        q.put(f"a{i}")
+    q.put("other", chat_id="second")
+    _drain(q, clock)
+    texts = [text for _, chat, text in sender.sent if chat == "chat"]
+    assert len(texts) == 1
+    assert texts[0] == "Resumen: 12 alertas\n\n" + "\n\n".join(f"a{i}" for i in range(12))
+    # a quiet chat is not folded into anyone's digest
+    assert [text for _, chat, text in sender.sent if chat == "second"] == ["other"]
+    assert (q.stats.sent, q.stats.delivered, q.stats.digests) == (2, 13, 1)
+
+def test_digest_is_capped_at_digest_max(clock, monkeypatch):
+    monkeypatch.setattr(settings, "notify_digest_max", 4)
+    sender = FakeSender(clock)
+    q = AlertQueue(sender)
+    for i in range(9):
+        q.put(f"a{i}")
+    _drain(q, clock)
+    # 9 queued: a digest of 4, then 5 left (still >= threshold) -> 4 more, then the last one alone
+    assert [text.split("\n")[0] for _, _, text in sender.sent] == ["Resumen: 4 alertas", "Resumen: 4 alertas", "a8"]
+
+def test_retry_after_pauses_the_chat_and_keeps_the_alert(clock):
+    sender = FakeSender(clock)
+    sender.fail = [TelegramRateLimited(7.0)]
+    q = AlertQueue(sender)
+    q.put("a0")
+    q.put("a1")
+    _drain(q, clock)
+    assert [text for _, _, text in sender.sent] == ["a0", "a1"]
+    assert sender.sent[0][0] == pytest.approx(1007.0)
+    assert q.stats.rate_limited == 1
+    assert q.stats.retries == 0  # a 429 is not a failed attempt
+    assert q.stats.dropped == 0
+
+def test_client_errors_are_dropped_not_retried(clock):
+    sender = FakeSender(clock)
+    sender.fail = [_http_error(400)]
+    q = AlertQueue(sender)
+    q.put("bad")
+    q.put("good")
+    _drain(q, clock)
+    assert [text for _, _, text in sender.sent] == ["good"]
+    assert q.stats.dropped == 1
+    assert q.stats.retries == 0
+
+def test_server_errors_back_off_then_give_up(clock):
+    sender = FakeSender(clock)
+    sender.fail = [_http_error(502), _http_error(503)]
+    q = AlertQueue(sender)
+    q.put("a0")
+    _drain(q, clock)
+    # retried after 1 s and 2 s of backoff
+    assert [(round(t - 1000.0, 6), text) for t, _, text in sender.sent] == [(3.0, "a0")]
+    assert q.stats.retries == 2
+
+    sender.fail = [_http_error(500)] * 3
+    q.put("a1")
+    _drain(q, clock)
+    assert q.stats.dropped == 1  # NOTIFY_MAX_ATTEMPTS == 3
+    assert len(sender.sent) == 1
+
+def test_put_is_bounded(clock, monkeypatch):
+    monkeypatch.setattr(settings, "notify_queue_max", 3)
+    q = AlertQueue(FakeSender(clock))
+    for i in range(5):
+        q.put(f"a{i}")
+    assert q.depth == 3
+    assert [o.text for o in q._chats["chat"]] == ["a2", "a3", "a4"]
+    assert q.stats.dropped == 2
+
+def test_run_drains_and_join_returns(monkeypatch):
+    monkeypatch.setattr(settings, "notify_chat_burst", 10)
+    sent = []
+
+    class Sender:
+        chat_id, enabled = "chat", True
+
+        async def send(self, text, chat_id=None):
+            sent.append(text)
+
+    async def go():
+        q = AlertQueue(Sender())
+        task = asyncio.create_task(q.run())
+        for i in range(3):
+            q.put(f"a{i}")
+        ok = await q.join(timeout=5)
+        task.cancel()
+        return ok
+
+    assert asyncio.run(go())
+    assert sent == ["a0", "a1", "a2"]
+
+def test_retry_after_parsing():
+    req = httpx.Request("POST", "https://x")
+    assert _retry_after(httpx.Response(429, json={"parameters": {"retry_after": 12}}, request=req)) == 12.0
+    assert _retry_after(httpx.Response(429, headers={"Retry-After": "3"}, request=req)) == 3.0
+    assert _retry_after(httpx.Response(429, request=req)) == 1.0
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect, text
+from sqlalchemy.orm import Session
+
+from app.domain.signals import SignalKind
+from app.persistence import partitions
+from app.persistence.db import create_schema
+from app.persistence.repo import PendingAlert, Repo
+from app.settings import settings
+from bench.fakes import BenchDB
+
+P = 3600  # one partition per hour, so the tests cross boundaries without huge timestamps
+
+@pytest.fixture(autouse=True)
+def _hourly(monkeypatch):
+    monkeypatch.setattr(settings, "alert_partition_sec", P)
+    monkeypatch.setattr(settings, "alert_partitions_ahead", 2)
+    monkeypatch.setattr(settings, "alert_retention_days", 1)
+    monkeypatch.setattr(settings, "alert_retention_mode", "drop")
+
+@pytest.fixture
+def db():
+    bench = BenchDB(assets=2)
+    yield bench
+    bench.close()
+
+def _tables(engine, prefix: str = partitions.PREFIX) -> set[int]:
+    return {int(n[len(prefix):]) for n in inspect(engine).get_table_names() if n.startswith(prefix) and n[len(prefix):].isdigit()}
+
+def _alert(hid: int, ts: int, kind: SignalKind = SignalKind.STOP_LOSS) -> PendingAlert:
+    return PendingAlert(holding_id=hid, kind=kind, message="m", ts=ts)
+
+def _future() -> int:
+    # a partition boundary well past the ones create_schema made (now + ALERT_PARTITIONS_AHEAD)
+    return partitions.start_of(int(time.time())) + 10 * P
+
+def test_flush_creates_partitions_across_a_boundary(db):
+    edge = _future()
+    with db.Session() as s:
+        repo = Repo(s)
+        inserted = repo.flush_tick({}, [_alert(1, edge - 60), _alert(2, edge)])
+        assert inserted == {(1, "STOP_LOSS", edge - 300), (2, "STOP_LOSS", edge)}
+        assert {edge - P, edge} <= _tables(db.engine)
+        keys = repo.recent_alert_keys(edge - 300)
+    assert sorted(keys) == [(1, "STOP_LOSS", edge - 300), (2, "STOP_LOSS", edge)]
+    with db.engine.connect() as conn:
+        assert conn.execute(text(f"SELECT holding_id FROM {partitions.name_of(edge - P)}")).scalars().all() == [1]
+        assert conn.execute(text(f"SELECT holding_id FROM {partitions.name_of(edge)}")).scalars().all() == [2]
+
+def test_should_send_alert_does_not_create_the_partition(db):
+    ts = _future()
+    before = _tables(db.engine)
+    with db.Session() as s:
+        repo = Repo(s)
+        assert repo.should_send_alert(1, SignalKind.STOP_LOSS, ts)
+    assert _tables(db.engine) == before
+
+    with db.Session() as s:
+        repo = Repo(s)
+        assert repo.flush_tick({}, [_alert(1, ts)]) == {(1, "STOP_LOSS", ts)}
+        assert not repo.should_send_alert(1, SignalKind.STOP_LOSS, ts)
+        assert repo.should_send_alert(2, SignalKind.STOP_LOSS, ts)
+        # same bucket again: nothing new to insert (and so nothing to send)
+        assert repo.flush_tick({}, [_alert(1, ts + 10), _alert(2, ts)]) == {(2, "STOP_LOSS", ts)}
+
+def test_should_send_alert_sees_partitions_made_by_another_process(db):
+    ts = _future()
+    with db.engine.begin() as conn:
+        partitions.ensure(conn, [ts])  # no committed(): this process doesn't know about it
+        conn.execute(insert(partitions.table_for(conn, ts)), {"holding_id": 1, "kind": "STOP_LOSS", "bucket": ts, "message": "m"})
+    with db.Session() as s:
+        assert not Repo(s).should_send_alert(1, SignalKind.STOP_LOSS, ts)
+
+def test_prune_keeps_exactly_the_retention_window(db):
+    base = partitions.start_of(int(time.time()))
+    with db.engine.begin() as conn:
+        partitions.ensure(conn, [base - i * P for i in range(1, 31)])
+    now = base + P // 2
+    with db.Session() as s:
+        created, removed = Repo(s).maintain_alert_partitions(now)
+    # a partition goes once it ends before now - 1 day: [base - 24h, base) is still needed
+    assert created == []
+    assert removed == [base - i * P for i in range(30, 24, -1)]
+    assert _tables(db.engine) == {base + i * P for i in range(-24, 3)}
+
+def test_prune_archive_renames_instead_of_dropping(db, monkeypatch):
+    monkeypatch.setattr(settings, "alert_retention_mode", "archive")
+    base = partitions.start_of(int(time.time()))
+    old = base - 30 * P
+    with db.engine.begin() as conn:
+        partitions.ensure(conn, [old])
+    with db.Session() as s:
+        _, removed = Repo(s).maintain_alert_partitions(base)
+    assert removed == [old]
+    assert old not in _tables(db.engine)
+    assert _tables(db.engine, partitions.ARCHIVE_PREFIX) == {old}
+
+def test_maintenance_creates_the_upcoming_partitions(db):
+    ahead = _future()
+    with db.Session() as s:
+        created, _ = Repo(s).maintain_alert_partitions(ahead)
+    assert created == [ahead, ahead + P, ahead + 2 * P]
+    assert {ahead, ahead + P, ahead + 2 * P} <= _tables(db.engine)
+
+def test_adopt_legacy_moves_recent_rows_and_keeps_dedup():
+    fd, path = tempfile.mkstemp(prefix="legacy-", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        now = int(time.time())
+        cur = now - now % 300
+        old = cur - 3 * 86400
+        # pre-partitioning schema: a plain `alerts` table with the dedup key
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE alerts (id INTEGER PRIMARY KEY, holding_id INTEGER NOT NULL, kind VARCHAR(64) NOT NULL, "
+                "bucket INTEGER NOT NULL, message TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, "
+                "CONSTRAINT uq_alert_dedup UNIQUE (holding_id, kind, bucket))"
+            )
+            conn.execute(text("INSERT INTO alerts (id, holding_id, kind, bucket, message) VALUES (:id, :holding_id, :kind, :bucket, :message)"), [
+                {"id": 1, "holding_id": 1, "kind": "STOP_LOSS", "bucket": old, "message": "old"},
+                {"id": 2, "holding_id": 1, "kind": "STOP_LOSS", "bucket": cur - P, "message": "a"},
+                {"id": 3, "holding_id": 2, "kind": "TAKE_PROFIT", "bucket": cur, "message": "b"},
+            ])
+
+        create_schema(engine)
+
+        names = inspect(engine).get_table_names()
+        assert "alerts" not in names and partitions.LEGACY in names
+        with engine.connect() as conn:
+            # everything stays in the legacy table; only the rows within retention are copied
+            assert conn.execute(text(f"SELECT count(*) FROM {partitions.LEGACY}")).scalar() == 3
+            copied = sorted(
+                r for t in partitions.tables_since(conn, 0)
+                for r in conn.execute(text(f"SELECT holding_id, kind, bucket, message FROM {t.name}")).all()
+            )
+        assert copied == [(1, "STOP_LOSS", cur - P, "a"), (2, "TAKE_PROFIT", cur, "b")]
+
+        with Session(engine) as s:
+            repo = Repo(s)
+            assert not repo.should_send_alert(2, SignalKind.TAKE_PROFIT, cur)
+            # the adopted keys still dedup: only the new one is inserted
+            inserted = repo.flush_tick({}, [_alert(2, cur, SignalKind.TAKE_PROFIT), _alert(1, cur)])
+        assert inserted == {(1, "STOP_LOSS", cur)}
+
+        # running the schema setup again (next start) doesn't copy anything twice
+        create_schema(engine)
+        with engine.connect() as conn:
+            total = sum(conn.execute(text(f"SELECT count(*) FROM {t.name}")).scalar() for t in partitions.tables_since(conn, 0))
+        assert total == 3
+    finally:
+        engine.dispose()
+        os.unlink(path)
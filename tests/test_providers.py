@@ -0,0 +1,195 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.providers import health as health_mod
+from app.providers.aggregator import ProviderAggregator
+from app.providers.base import (
+    FetchClock, PricePoint, ProviderUnavailable, RetryBudget, fetch_clock, fetch_timed, gather_limited, retry_budget,
+)
+from app.providers.health import HealthRegistry
+from app.settings import settings
+
+class Upstream:
+    # answers after `delay` seconds, or raises `fail`; reports to the aggregator's health like
+    # the real providers do
+    def __init__(self, name: str, delay: float = 0.0, fail: Exception | None = None):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+        self.health = None
+
+    async def _get(self, asset: dict) -> PricePoint:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail is not None:
+            raise self.fail
+        return PricePoint(last=100.0, ohlcv_close=[99.0, 100.0], source=self.name)
+
+    async def get_pricepoint(self, asset: dict) -> PricePoint:
+        if isinstance(self.fail, ProviderUnavailable):
+            raise self.fail  # skipped before any request goes out
+        self.calls += 1
+        return await self.health.get(self.name).call(self._get(asset))
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    monkeypatch.setattr(settings, "hedge_delay_sec", 0.05)
+    monkeypatch.setattr(settings, "hedge_min_delay_sec", 0.01)
+    monkeypatch.setattr(settings, "asset_timeout_sec", 5.0)
+    monkeypatch.setattr(settings, "provider_adaptive", True)
+    monkeypatch.setattr(settings, "provider_rank_margin", 0.5)
+    monkeypatch.setattr(settings, "health_ewma_alpha", 0.3)
+    monkeypatch.setattr(settings, "cb_fail_threshold", 3)
+    monkeypatch.setattr(settings, "cb_open_seconds", 60)
+
+def _aggregator(*upstreams: Upstream) -> ProviderAggregator:
+    agg = ProviderAggregator()
+    agg.health = HealthRegistry()  # not the process-wide one
+    agg.providers = {u.name: u for u in upstreams}
+    agg.order = [u.name for u in upstreams]
+    for u in upstreams:
+        u.health = agg.health
+    return agg
+
+def _fetch(agg: ProviderAggregator, symbols: list[str], budget: RetryBudget) -> list:
+    async def go():
+        token = retry_budget.set(budget)
+        try:
+            return await asyncio.gather(
+                *(agg._fetch_hedged({"symbol": s}, s, 0) for s in symbols), return_exceptions=True,
+            )
+        finally:
+            retry_budget.reset(token)
+    return asyncio.run(go())
+
+def test_hedge_fires_after_the_delay_and_first_answer_wins():
+    slow, fast = Upstream("A", delay=2.0), Upstream("B", delay=0.01)
+    agg = _aggregator(slow, fast)
+    budget = RetryBudget(limit=5)
+    t0 = time.perf_counter()
+    [pp] = _fetch(agg, ["BTC"], budget)
+    elapsed = time.perf_counter() - t0
+    assert pp.source == "B"
+    assert 0.05 <= elapsed < 1.0  # waited the hedge delay, not the slow provider
+    assert (slow.calls, fast.calls, slow.cancelled) == (1, 1, 1)
+    assert (budget.used, budget.hedges, budget.retries) == (1, 1, 0)
+    assert agg.cache["BTC"].pricepoint is pp
+
+def test_no_hedge_when_the_first_provider_is_fast():
+    a, b = Upstream("A", delay=0.0), Upstream("B")
+    budget = RetryBudget(limit=5)
+    [pp] = _fetch(_aggregator(a, b), ["BTC"], budget)
+    assert pp.source == "A"
+    assert b.calls == 0
+    assert budget.used == 0
+
+def test_failure_falls_back_and_is_charged_as_a_retry():
+    a, b = Upstream("A", fail=RuntimeError("502")), Upstream("B")
+    budget = RetryBudget(limit=5)
+    [pp] = _fetch(_aggregator(a, b), ["BTC"], budget)
+    assert pp.source == "B"
+    assert (budget.used, budget.hedges, budget.retries) == (1, 0, 1)
+
+def test_unavailable_provider_costs_nothing():
+    a, b = Upstream("A", fail=ProviderUnavailable("breaker open")), Upstream("B")
+    budget = RetryBudget(limit=0)
+    [pp] = _fetch(_aggregator(a, b), ["BTC"], budget)
+    assert pp.source == "B"
+    assert budget.used == 0
+
+def test_budget_caps_extra_requests_per_tick():
+    a, b = Upstream("A", fail=RuntimeError("502")), Upstream("B")
+    budget = RetryBudget(limit=2)
+    res = _fetch(_aggregator(a, b), [f"S{i}" for i in range(5)], budget)
+    ok = [r for r in res if isinstance(r, PricePoint)]
+    failed = [r for r in res if isinstance(r, Exception)]
+    # every symbol gets its free first request; only two fallbacks fit in the budget
+    assert (a.calls, b.calls) == (5, 2)
+    assert len(ok) == 2 and len(failed) == 3
+    assert all("retry budget exhausted" in str(e) for e in failed)
+    assert budget.used == budget.retries == 2
+
+def test_exhausted_budget_waits_instead_of_hedging():
+    slow, fast = Upstream("A", delay=0.2), Upstream("B")
+    budget = RetryBudget(limit=0)
+    [pp] = _fetch(_aggregator(slow, fast), ["BTC"], budget)
+    assert pp.source == "A"
+    assert fast.calls == 0
+
+def test_hedge_delay_follows_the_observed_quantile():
+    agg = _aggregator(Upstream("A"))
+    assert agg.hedge_delay("A") == 0.05  # too few samples: HEDGE_DELAY_SEC
+    h = agg.health.get("A")
+    for i in range(100):
+        h.latency.observe(0.001 * (i + 1))
+    assert agg.hedge_delay("A") == pytest.approx(0.096)
+    for _ in range(200):
+        h.latency.observe(0.0001)
+    assert agg.hedge_delay("A") == 0.01  # clamped to HEDGE_MIN_DELAY_SEC
+
+def test_failing_provider_ranks_below_a_healthy_one_and_recovers(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(health_mod, "time", SimpleNamespace(time=lambda: now[0], perf_counter=time.perf_counter))
+    reg = HealthRegistry()
+    order = ["A", "B"]
+    for name in order:
+        reg.get(name).on_success(0.1)
+    assert reg.rank(order) == ["A", "B"]
+
+    for _ in range(3):
+        reg.get("A").on_failure(RuntimeError("502"))
+    assert reg.get("A").state == "open"
+    assert reg.rank(order) == ["B", "A"]
+
+    # breaker closes after CB_OPEN_SECONDS, but A's error rate still makes it the costlier one
+    now[0] += 60
+    assert reg.get("A").state == "half_open"
+    assert reg.rank(order) == ["B", "A"]
+
+    reg.get("A").on_success(0.1)
+    assert reg.get("A").state == "closed"
+    assert reg.rank(order) == ["B", "A"]
+    reg.get("A").on_success(0.1)
+    # error rate back under the margin: configured order again
+    assert reg.rank(order) == ["A", "B"]
+
+def test_slow_provider_is_overtaken_only_past_the_margin():
+    reg = HealthRegistry()
+    reg.get("A").on_success(0.12)
+    reg.get("B").on_success(0.1)
+    assert reg.rank(["A", "B"]) == ["A", "B"]  # within PROVIDER_RANK_MARGIN
+    reg.get("A").on_success(0.5)
+    assert reg.rank(["A", "B"]) == ["B", "A"]
+
+def test_rank_is_the_configured_order_when_not_adaptive(monkeypatch):
+    monkeypatch.setattr(settings, "provider_adaptive", False)
+    reg = HealthRegistry()
+    for _ in range(5):
+        reg.get("A").on_failure(RuntimeError("x"))
+    assert reg.rank(["A", "B"]) == ["A", "B"]
+
+def test_fetch_clock_counts_the_batch_request_and_each_symbol():
+    async def go() -> tuple[FetchClock, float]:
+        clock = FetchClock()
+        token = fetch_clock.set(clock)
+        t0 = time.perf_counter()
+        try:
+            with fetch_timed():  # the batch's one multi-symbol request
+                await asyncio.sleep(0.05)
+            await gather_limited((asyncio.sleep(0.05) for _ in range(4)), limit=4)
+        finally:
+            fetch_clock.reset(token)
+        return clock, time.perf_counter() - t0
+
+    clock, wall = asyncio.run(go())
+    # serial: 0.05 + 4 * 0.05; wall: 0.05 + 0.05
+    assert clock.busy_sec == pytest.approx(0.25, abs=0.04)
+    assert wall < clock.busy_sec - 0.08
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from app.engine.decision import Strategy
+from app.engine.replay import CandleSet, _candle_set, replay
+
+H = 3600
+
+def _strategy(profit_lock_pct: float) -> Strategy:
+    # TP out of reach: positions only leave on STOP_LOSS / TRAILING_STOP
+    return Strategy(
+        base_tp=10.0, sl_pct=0.1, trail_atr_mult=1.0, profit_lock_pct=profit_lock_pct,
+        cooldown_sec=0, confirm_regime=False,
+    )
+
+def _one(closes: list[float], start: int = 0) -> CandleSet:
+    return _candle_set(["A"], [start + np.arange(len(closes), dtype=np.int64) * H], [np.array(closes, dtype=np.float64)])
+
+def _trades(res) -> list[tuple]:
+    return [(t["entry_ts"] // H, t["entry"], t["exit_ts"] and t["exit_ts"] // H, t["exit"], t["exit_kind"]) for t in res.trade_list()]
+
+def _exits(res) -> list[tuple]:
+    return [(e["ts"] // H, e["kind"]) for e in res.timeline() if e["kind"] != "TRAILING_UPDATE"]
+
+# 100..109 then a crash to 80 (<= entry * 0.9) and a slow climb that stays under the EMA
+# support (ema_short - atr ~ 97): every re-entry is stopped out on its first evaluation
+CRASH = [float(x) for x in range(100, 110)] + [80.0, 81.0, 82.0, 83.0, 84.0, 85.0]
+
+def test_stop_loss_with_reentry():
+    res = replay(_one(CRASH), _strategy(profit_lock_pct=10.0), reenter=True)
+    assert _trades(res) == [
+        (0, 100.0, 10, 80.0, "STOP_LOSS"),
+        (11, 81.0, 12, 82.0, "STOP_LOSS"),
+        (13, 83.0, 14, 84.0, "STOP_LOSS"),
+        (15, 85.0, None, 85.0, None),  # opened on the last candle, still open
+    ]
+    assert _exits(res) == [(10, "STOP_LOSS"), (12, "STOP_LOSS"), (14, "STOP_LOSS")]
+
+def test_stop_loss_without_reentry():
+    res = replay(_one(CRASH), _strategy(profit_lock_pct=10.0), reenter=False)
+    assert _trades(res) == [(0, 100.0, 10, 80.0, "STOP_LOSS")]
+    assert _exits(res) == [(10, "STOP_LOSS")]
+
+# +5% at 105 activates trailing; the anchor follows up to 160 and 120 is far below
+# 160 - atr (~6): TRAILING_STOP
+TRAIL = [float(x) for x in range(100, 130)] + [140.0, 150.0, 160.0, 120.0] + [float(x) for x in range(121, 131)]
+
+def test_trailing_stop_without_reentry_leaves_no_phantom_trades():
+    res = replay(_one(TRAIL), _strategy(profit_lock_pct=0.05), reenter=False)
+    assert _trades(res) == [(0, 100.0, 33, 120.0, "TRAILING_STOP")]
+    assert _exits(res) == [(33, "TRAILING_STOP")]
+    # TRAILING_UPDATE from 105 (t=5) to 160 (t=32), nothing once the position is gone
+    updates = [e["ts"] // H for e in res.timeline() if e["kind"] == "TRAILING_UPDATE"]
+    assert updates == list(range(5, 33))
+    assert not np.isnan(res.event_pnl).any()
+    assert not np.isnan(res.trades.entry).any()
+
+def test_trailing_stop_with_reentry():
+    res = replay(_one(TRAIL), _strategy(profit_lock_pct=0.05), reenter=True)
+    assert _trades(res) == [
+        (0, 100.0, 33, 120.0, "TRAILING_STOP"),
+        (34, 121.0, None, 130.0, None),
+    ]
+    # the new position trails again from 128 (+5.8%) on
+    updates = [e["ts"] // H for e in res.timeline() if e["kind"] == "TRAILING_UPDATE"]
+    assert updates == list(range(5, 33)) + [41, 42, 43]
+
+def test_empty_and_ragged_symbols():
+    a = np.array(CRASH)
+    cs = _candle_set(
+        ["A", "EMPTY", "LATE"],
+        [np.arange(len(a), dtype=np.int64) * H, np.zeros(0, dtype=np.int64), (5 + np.arange(3, dtype=np.int64)) * H],
+        [a, np.zeros(0), np.array([50.0, 51.0, 52.0])],
+    )
+    res = replay(cs, _strategy(profit_lock_pct=10.0), reenter=False)
+    assert res.symbols == 3 and res.steps == len(CRASH)
+    by_symbol = {}
+    for t in res.trade_list():
+        by_symbol.setdefault(t["symbol"], []).append(t)
+    assert "EMPTY" not in by_symbol
+    assert [(t["entry_ts"] // H, t["entry"], t["exit_kind"]) for t in by_symbol["LATE"]] == [(5, 50.0, None)]
+    assert by_symbol["LATE"][0]["exit"] == 52.0
+    assert [(t["entry"], t["exit"], t["exit_kind"]) for t in by_symbol["A"]] == [(100.0, 80.0, "STOP_LOSS")]
+
+    empty = replay(_candle_set([], [], []), _strategy(profit_lock_pct=10.0))
+    assert empty.steps == 0 and len(empty.trades) == 0 and empty.summary()["alerts"] == 0
+
+@pytest.mark.parametrize("reenter", [True, False])
+def test_replay_matches_scalar_decide(reenter):
+    # the vectorized replay against a candle-by-candle loop over compute_features + decide
+    from app.engine.decision import EngineState, Holding, decide
+    from app.providers.features import compute_features
+
+    rng = np.random.default_rng(5)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+    s = Strategy(base_tp=0.08, sl_pct=0.05, trail_atr_mult=2.0, profit_lock_pct=0.04, cooldown_sec=0, confirm_regime=True)
+    res = replay(_one(list(closes)), s, reenter=reenter)
+
+    want, pos, can_open = [], None, True
+    for t in range(len(closes)):
+        if pos is None:
+            if can_open:
+                pos = (t, closes[t], EngineState(False, None, None))
+                can_open = reenter
+            continue
+        f = compute_features(float(closes[t]), list(closes[:t + 1]))
+        sigs = decide(t * H, Holding(0, "A", pos[1], 0.0), s, f, pos[2])
+        if sigs and sigs[0].kind in ("TRAILING_STOP", "STOP_LOSS"):
+            want.append((pos[0], pos[1], t, closes[t], str(sigs[0].kind)))
+            pos = None
+    if pos is not None:
+        want.append((pos[0], pos[1], None, closes[-1], None))
+
+    got = _trades(res)
+    assert len(got) == len(want)
+    for g, w in zip(got, want):
+        assert g[0] == w[0] and g[2] == w[2] and g[4] == w[4]
+        assert g[1] == pytest.approx(w[1]) and g[3] == pytest.approx(w[3])
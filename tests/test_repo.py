@@ -0,0 +1,127 @@
+import time
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.domain.models import EngineState, Holding, Strategy
+from app.domain.signals import SignalKind
+from app.engine.decision import EngineState as DState
+from app.persistence.db import DbClock, db_clock
+from app.persistence.repo import PendingAlert, Repo
+from bench.fakes import BenchDB
+
+@pytest.fixture
+def db():
+    bench = BenchDB(assets=4, holdings_per_asset=3)
+    yield bench
+    bench.close()
+
+def _counted(fn):
+    clock = DbClock()
+    token = db_clock.set(clock)
+    try:
+        out = fn()
+    finally:
+        db_clock.reset(token)
+    return out, clock.queries
+
+def _snapshot(bench: BenchDB, **kw):
+    with bench.Session() as s:
+        return _counted(lambda: Repo(s).load_tick_snapshot(**kw))
+
+def test_snapshot_query_count_does_not_grow_with_the_book():
+    small, big = BenchDB(assets=2, holdings_per_asset=1), BenchDB(assets=40, holdings_per_asset=5)
+    try:
+        snap_s, q_small = _snapshot(small)
+        snap_b, q_big = _snapshot(big)
+    finally:
+        small.close()
+        big.close()
+    assert q_small == q_big == 4  # assets, holdings, strategies, states
+    assert len(snap_b.books) == 40
+    assert sum(len(b.holdings) for b in snap_b.books) == len(snap_b.states) == 200
+
+def test_snapshot_narrowed_by_symbols_and_shard(db):
+    snap, _ = _snapshot(db, symbols=db.symbols[:2])
+    assert [b.asset["symbol"] for b in snap.books] == db.symbols[:2]
+    snap, queries = _snapshot(db, owns=lambda sym: sym == db.symbols[3])
+    assert [b.asset["symbol"] for b in snap.books] == [db.symbols[3]]
+    assert set(snap.states) == {h.id for h in snap.books[0].holdings}
+    assert queries == 5  # + the enabled symbols to filter by ownership
+
+def test_snapshot_creates_missing_strategies_and_states(db):
+    with db.engine.begin() as conn:
+        gone = conn.execute(select(Holding.id).where(Holding.symbol == db.symbols[1])).scalars().all()
+        conn.execute(delete(EngineState).where(EngineState.holding_id.in_(gone)))
+        conn.execute(delete(Strategy).where(Strategy.symbol == db.symbols[2]))
+
+    snap, queries = _snapshot(db)
+    assert queries == 4 + 2  # one bulk INSERT each
+    assert set(snap.states) == {h.id for b in snap.books for h in b.holdings}
+    for hid in gone:
+        assert snap.states[hid] == DState(trailing_active=False, trailing_anchor=None, last_alert_ts=None)
+    # created with the column defaults, like the ones the bench seeded
+    assert snap.books[2].asset["symbol"] == db.symbols[2]
+    assert snap.books[2].strategy == snap.books[0].strategy
+
+    with db.Session() as s:
+        assert set(s.execute(select(EngineState.holding_id)).scalars()) >= set(gone)
+        assert s.execute(select(Strategy.id).where(Strategy.symbol == db.symbols[2])).first() is not None
+    # and from now on it's back to the plain reads
+    _, queries = _snapshot(db)
+    assert queries == 4
+
+def _state_rows(bench: BenchDB) -> dict[int, tuple]:
+    with bench.Session() as s:
+        return {
+            r.holding_id: (r.trailing_active, r.trailing_anchor, r.last_alert_ts)
+            for r in s.execute(select(EngineState.holding_id, EngineState.trailing_active, EngineState.trailing_anchor, EngineState.last_alert_ts))
+        }
+
+def test_flush_writes_only_the_dirty_states(db):
+    before = _state_rows(db)
+    snap, _ = _snapshot(db)
+    dirty = {2: snap.states[2], 5: snap.states[5]}
+    dirty[2].trailing_active, dirty[2].trailing_anchor = True, 101.5
+    dirty[5].trailing_anchor = 99.0
+    # changed in memory but not passed to the flush: must not be written
+    snap.states[7].trailing_active = True
+
+    with db.Session() as s:
+        inserted, queries = _counted(lambda: Repo(s).flush_tick(dirty, []))
+    assert inserted == set()
+    assert queries == 1  # one executemany UPDATE
+
+    after = _state_rows(db)
+    assert after[2] == (True, 101.5, None)
+    assert after[5] == (False, 99.0, None)
+    assert {k: v for k, v in after.items() if k not in (2, 5)} == {k: v for k, v in before.items() if k not in (2, 5)}
+
+def test_second_flush_of_a_bucket_returns_only_the_new_keys(db):
+    now = int(time.time())
+    bucket = now - now % 300
+    sl, tp = SignalKind.STOP_LOSS, SignalKind.TAKE_PROFIT
+
+    def alert(hid, kind, ts=now):
+        return PendingAlert(holding_id=hid, kind=kind, message=f"{kind} {hid}", ts=ts)
+
+    with db.Session() as s:
+        repo = Repo(s)
+        first = repo.flush_tick({}, [alert(1, sl), alert(2, sl)])
+        second = repo.flush_tick({}, [alert(1, sl, bucket), alert(2, tp), alert(2, sl, bucket + 299), alert(3, sl)])
+    assert first == {(1, "STOP_LOSS", bucket), (2, "STOP_LOSS", bucket)}
+    assert second == {(2, "TAKE_PROFIT", bucket), (3, "STOP_LOSS", bucket)}
+    with db.Session() as s:
+        assert sorted(Repo(s).recent_alert_keys(bucket)) == sorted(first | second)
+
+def test_flush_stamps_last_alert_ts_of_inserted_alerts_only(db):
+    now = int(time.time())
+    snap, _ = _snapshot(db)
+    with db.Session() as s:
+        Repo(s).record_alert(1, SignalKind.STOP_LOSS, "earlier", now)
+    alerts = [PendingAlert(holding_id=h, kind=SignalKind.STOP_LOSS, message="m", ts=now) for h in (1, 2)]
+    with db.Session() as s:
+        Repo(s).flush_tick({1: snap.states[1], 2: snap.states[2]}, alerts)
+    after = _state_rows(db)
+    assert after[1][2] is None
+    assert after[2][2] == now
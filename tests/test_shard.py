@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.domain.models import EngineState, WorkerLease
+from app.domain.signals import SignalKind
+from app.engine.shard import ShardCoordinator, partition_of
+from app.persistence import partitions
+from app.persistence.repo import AsyncRepo, LeaseLost, PendingAlert, Repo
+from bench.fakes import BenchDB
+
+TTL = 30
+T0 = 1_700_000_000
+
+@pytest.fixture
+def db():
+    bench = BenchDB(assets=8)
+    yield bench
+    bench.close()
+
+def _sync(bench: BenchDB, coord: ShardCoordinator, now_ts: int) -> dict[int, int]:
+    async def run():
+        with bench.Session() as s:
+            await coord.sync(AsyncRepo(s), now_ts)
+    asyncio.run(run())
+    return dict(coord.leases)
+
+def _owners(bench: BenchDB) -> dict[int, str | None]:
+    with bench.Session() as s:
+        return dict(s.execute(select(WorkerLease.partition, WorkerLease.owner)).all())
+
+def _alerts(bench: BenchDB) -> int:
+    with bench.Session() as s:
+        conn = s.connection()
+        return sum(s.execute(select(func.count()).select_from(t)).scalar_one() for t in partitions.tables_since(conn, 0))
+
+def test_partition_of_is_stable():
+    assert partition_of("BTC", 64) == partition_of("BTC", 64)
+    assert {partition_of(f"S{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+def test_takeover_after_expiry_fences_the_old_owner(db):
+    a = ShardCoordinator("A", partitions=4, lease_ttl=TTL)
+    b = ShardCoordinator("B", partitions=4, lease_ttl=TTL)
+
+    assert _sync(db, a, T0) == {0: 1, 1: 1, 2: 1, 3: 1}
+    # B joins while A's leases are live: nothing to claim yet
+    assert _sync(db, b, T0 + 5) == {}
+    assert set(_owners(db).values()) == {"A"}
+
+    # A computes a tick and then stalls past its TTL; B claims every expired partition
+    fence = a.fence(T0 + 6)
+    assert _sync(db, b, T0 + 6 + TTL + 5) == {0: 2, 1: 2, 2: 2, 3: 2}
+    assert set(_owners(db).values()) == {"B"}
+
+    with db.Session() as s:
+        snap = Repo(s).load_tick_snapshot(owns=a.owns)
+    hid = snap.books[0].holdings[0].id
+    st = snap.states[hid]
+    st.trailing_active, st.trailing_anchor = True, 123.0
+    alert = PendingAlert(holding_id=hid, kind=SignalKind.STOP_LOSS, message="sl", ts=T0 + 6)
+
+    with db.Session() as s:
+        with pytest.raises(LeaseLost):
+            Repo(s).flush_tick({hid: st}, [alert], fence=fence)
+
+    # nothing from A's stale tick made it: no state change, no alert row, B still owns all
+    with db.Session() as s:
+        row = s.execute(select(EngineState.trailing_active, EngineState.trailing_anchor).where(EngineState.holding_id == hid)).one()
+    assert tuple(row) == (False, None)
+    assert _alerts(db) == 0
+    assert set(_owners(db).values()) == {"B"}
+
+    # the new owner's fenced flush goes through
+    with db.Session() as s:
+        inserted = Repo(s).flush_tick({hid: st}, [alert], fence=b.fence(T0 + 6 + TTL + 5))
+    assert inserted == {(hid, "STOP_LOSS", alert.ts - alert.ts % 300)}
+    assert _alerts(db) == 1
+
+def test_a_reclaimed_partition_does_not_accept_the_old_epoch(db):
+    a = ShardCoordinator("A", partitions=2, lease_ttl=TTL)
+    b = ShardCoordinator("B", partitions=2, lease_ttl=TTL)
+    _sync(db, a, T0)
+    stale = a.fence(T0)
+    _sync(db, b, T0 + TTL + 1)
+    # A comes back after B died: it holds the partitions again, but with a new epoch
+    assert _sync(db, a, T0 + 3 * TTL) == {0: 3, 1: 3}
+    with db.Session() as s:
+        with pytest.raises(LeaseLost):
+            Repo(s).flush_tick({}, [PendingAlert(holding_id=1, kind=SignalKind.STOP_LOSS, message="sl", ts=T0)], fence=stale)
+    with db.Session() as s:
+        Repo(s).flush_tick({}, [PendingAlert(holding_id=1, kind=SignalKind.STOP_LOSS, message="sl", ts=T0)], fence=a.fence(T0 + 3 * TTL))
+    assert _alerts(db) == 1
+
+def test_leases_rebalance_when_a_worker_joins(db):
+    a = ShardCoordinator("A", partitions=4, lease_ttl=TTL)
+    b = ShardCoordinator("B", partitions=4, lease_ttl=TTL)
+    _sync(db, a, T0)
+    _sync(db, b, T0 + 1)
+    # A sees two live workers and gives back its surplus, which B picks up
+    assert sorted(_sync(db, a, T0 + 2)) == [0, 1]
+    assert sorted(_sync(db, b, T0 + 3)) == [2, 3]
+    assert {s for s in (f"B{i:05d}" for i in range(8)) if a.owns(s)}.isdisjoint(
+        {s for s in (f"B{i:05d}" for i in range(8)) if b.owns(s)}
+    )
+
+def test_release_hands_partitions_over_immediately(db):
+    a = ShardCoordinator("A", partitions=2, lease_ttl=TTL)
+    b = ShardCoordinator("B", partitions=2, lease_ttl=TTL)
+    _sync(db, a, T0)
+    with db.Session() as s:
+        a.release(Repo(s))
+    assert a.leases == {}
+    assert _sync(db, b, T0 + 1) == {0: 2, 1: 2}
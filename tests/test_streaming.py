@@ -0,0 +1,187 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+from app.settings import settings
+from app.engine.stream import StreamRunner
+from app.engine.worker import TickStats
+from app.providers.streaming import BinanceStream
+
+ASSETS = [
+    {"symbol": "BTC", "binance_symbol": "BTCUSDT"},
+    {"symbol": "ETH", "binance_symbol": "ethusdt"},
+    {"symbol": "SOL"},  # not on the stream
+]
+
+def _ticker(symbol: str, price: float) -> str:
+    return json.dumps({"e": "24hrMiniTicker", "s": symbol, "c": str(price)})
+
+class FakeFeed:
+    # local stand-in for the Binance WebSocket: records every connection's subscribe
+    # messages and runs `script(ws, n)` on connection n (0-based)
+    def __init__(self, script):
+        self.script = script
+        self.connections: list[list[dict]] = []
+        self.connected_at: list[float] = []
+        self.closed_at: list[float] = []
+
+    async def handler(self, ws) -> None:
+        n = len(self.connections)
+        subs: list[dict] = []
+        self.connections.append(subs)
+        self.connected_at.append(time.monotonic())
+        try:
+            subs.append(json.loads(await ws.recv()))
+            await self.script(ws, n)
+        finally:
+            self.closed_at.append(time.monotonic())
+
+class FakeWorker:
+    def __init__(self):
+        self.batches: list[dict[str, float]] = []
+
+    async def evaluate_prices(self, prices: dict[str, float]) -> TickStats:
+        self.batches.append(dict(prices))
+        return TickStats()
+
+async def _until(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+async def _serve(feed: FakeFeed, body) -> None:
+    async with websockets.serve(feed.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        await body(f"ws://127.0.0.1:{port}")
+
+@pytest.fixture(autouse=True)
+def fast_stream(monkeypatch):
+    monkeypatch.setattr(settings, "stream_heartbeat_sec", 0.5)
+    monkeypatch.setattr(settings, "stream_backoff_max_sec", 0.2)
+    monkeypatch.setattr(settings, "stream_min_move_pct", 0.001)
+
+def test_subscribe_and_evaluate_on_price_moves():
+    async def script(ws, n):
+        await ws.send(json.dumps({"result": None, "id": 1}))
+        await ws.send(_ticker("BTCUSDT", 100.0))
+        await asyncio.sleep(0.1)
+        await ws.send(_ticker("BTCUSDT", 100.05))  # 0.05% < STREAM_MIN_MOVE_PCT: no evaluation
+        await ws.send(_ticker("ETHUSDT", 0))  # ignored
+        await ws.send(_ticker("XRPUSDT", 1.0))  # not subscribed
+        await asyncio.sleep(0.1)
+        await ws.send(_ticker("BTCUSDT", 101.0))
+        await ws.send(_ticker("ETHUSDT", 2000.0))
+        await ws.wait_closed()
+
+    feed = FakeFeed(script)
+    worker = FakeWorker()
+
+    async def body(url):
+        runner = StreamRunner(worker, streams=[])
+        stream = BinanceStream(url, runner.on_price)
+        runner.streams = [stream]
+        runner.refresh(ASSETS)
+        task = asyncio.ensure_future(runner.run())
+        try:
+            await _until(lambda: any("ETH" in b for b in worker.batches))
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(_serve(feed, body))
+
+    assert feed.connections[0] == [
+        {"method": "SUBSCRIBE", "params": ["btcusdt@miniTicker", "ethusdt@miniTicker"], "id": 1},
+    ]
+    evaluated = [(sym, px) for b in worker.batches for sym, px in b.items()]
+    assert evaluated[0] == ("BTC", 100.0)
+    assert ("BTC", 100.05) not in evaluated
+    assert ("BTC", 101.0) in evaluated and ("ETH", 2000.0) in evaluated
+    assert all(sym in ("BTC", "ETH") for sym, _ in evaluated)
+
+def test_reconnects_with_backoff_and_resubscribes_after_drop():
+    async def script(ws, n):
+        await ws.send(_ticker("BTCUSDT", 100.0 + n))
+        if n == 0:
+            return  # server drops the connection
+        await ws.wait_closed()
+
+    feed = FakeFeed(script)
+    prices: list[tuple[str, float]] = []
+
+    async def body(url):
+        stream = BinanceStream(url, lambda sym, px: prices.append((sym, px)))
+        stream.set_assets(ASSETS)
+        task = asyncio.ensure_future(stream.run())
+        try:
+            await _until(lambda: ("BTC", 101.0) in prices)
+            assert stream.connected
+            assert stream.reconnects == 1
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(_serve(feed, body))
+
+    assert len(feed.connections) == 2
+    assert feed.connections[1] == feed.connections[0]  # same subscription after the reconnect
+    # first retry waits 0.5 * 2**1 capped at STREAM_BACKOFF_MAX_SEC, jittered down to half
+    assert feed.connected_at[1] - feed.closed_at[0] >= settings.stream_backoff_max_sec / 2 * 0.9
+
+def test_heartbeat_watchdog_forces_reconnect():
+    async def script(ws, n):
+        if n > 0:
+            await ws.send(_ticker("BTCUSDT", 100.0))
+        await ws.wait_closed()  # connection 0 stays open but silent
+
+    feed = FakeFeed(script)
+    prices: list[tuple[str, float]] = []
+
+    async def body(url):
+        stream = BinanceStream(url, lambda sym, px: prices.append((sym, px)))
+        stream.set_assets(ASSETS)
+        task = asyncio.ensure_future(stream.run())
+        t0 = time.monotonic()
+        try:
+            await _until(lambda: prices)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        # the client gave up on the silent connection only after the heartbeat
+        assert time.monotonic() - t0 >= settings.stream_heartbeat_sec
+
+    asyncio.run(_serve(feed, body))
+
+    assert len(feed.connections) >= 2
+    assert feed.connections[1] == feed.connections[0]
+    assert prices[0] == ("BTC", 100.0)
+
+def test_asset_change_resubscribes_without_backoff():
+    async def script(ws, n):
+        await ws.wait_closed()
+
+    feed = FakeFeed(script)
+
+    async def body(url):
+        stream = BinanceStream(url, lambda sym, px: None)
+        stream.set_assets(ASSETS[:1])
+        task = asyncio.ensure_future(stream.run())
+        try:
+            await _until(lambda: feed.connections and feed.connections[0])
+            stream.set_assets(ASSETS)
+            await _until(lambda: len(feed.connections) == 2 and feed.connections[1])
+            assert stream.reconnects == 0
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(_serve(feed, body))
+
+    assert feed.connections[0][0]["params"] == ["btcusdt@miniTicker"]
+    assert feed.connections[1][0]["params"] == ["btcusdt@miniTicker", "ethusdt@miniTicker"]